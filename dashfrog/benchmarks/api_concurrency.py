@@ -0,0 +1,96 @@
+"""
+Benchmark API request throughput as queries in flight grow.
+
+Each request runs one query taking `--latency` seconds in Postgres, from an async route:
+    - sync: through a sync `Session`, which blocks the event loop until the query returns (previous behaviour)
+    - async: through an `AsyncSession` on the async engine, other requests proceed while the query runs
+
+Requests are sent in-process through the ASGI app, so only the database access pattern differs.
+The async engine's pool (DASHFROG_API_DB_POOL_SIZE + DASHFROG_API_DB_MAX_OVERFLOW) caps the queries in flight.
+
+Usage (against the database configured by the DASHFROG_POSTGRES_* variables):
+    python benchmarks/api_concurrency.py --requests 200 --latency 0.01 --concurrency 1 4 16 64
+"""
+
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI
+import httpx
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from dashfrog import get_dashfrog_instance, setup
+from dashfrog.config import Config
+
+QUERY = text("SELECT 1 FROM pg_sleep(:latency)")
+
+
+def make_app(latency: float) -> FastAPI:
+    app = FastAPI()
+    dashfrog = get_dashfrog_instance()
+
+    @app.get("/sync")
+    async def sync_query() -> int:
+        with Session(dashfrog.db_engine) as session:
+            return session.execute(QUERY, {"latency": latency}).scalar_one()
+
+    @app.get("/async")
+    async def async_query() -> int:
+        async with AsyncSession(dashfrog.async_db_engine) as session:
+            return (await session.execute(QUERY, {"latency": latency})).scalar_one()
+
+    return app
+
+
+async def requests_per_second(client: httpx.AsyncClient, path: str, requests: int, concurrency: int) -> float:
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            response = await client.get(path)
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - started)
+
+
+async def run(requests: int, latency: float, levels: list[int]) -> None:
+    dashfrog = get_dashfrog_instance()
+    transport = httpx.ASGITransport(app=make_app(latency))
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://dashfrog") as client:
+            # Open the pools' connections before measuring
+            await requests_per_second(client, "/sync", max(levels), max(levels))
+            await requests_per_second(client, "/async", max(levels), max(levels))
+
+            print(f"{'in flight':>10} {'sync req/s':>12} {'async req/s':>12}")
+            for concurrency in levels:
+                sync_rps = await requests_per_second(client, "/sync", requests, concurrency)
+                async_rps = await requests_per_second(client, "/async", requests, concurrency)
+                print(f"{concurrency:>10} {sync_rps:>12.0f} {async_rps:>12.0f}")
+    finally:
+        await dashfrog.close_async_db_engine()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="Number of requests per route and level")
+    parser.add_argument("--latency", type=float, default=0.01, help="Seconds each query spends in Postgres")
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 4, 16, 64], help="Numbers of requests in flight"
+    )
+    args = parser.parse_args()
+
+    setup(Config())
+    try:
+        asyncio.run(run(args.requests, args.latency, args.concurrency))
+    finally:
+        get_dashfrog_instance().db_engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark the per-step overhead of building flow events.
+
+Compares, for a step writing its START and SUCCESS events plus one flow-level event:
+    - baggage: re-parse the baggage, the flow id and the group id on every event (previous behaviour)
+    - context: read the precomputed `FlowContext` of the current context
+
+Event writes themselves are left out, so only the SDK overhead is measured. No database needed.
+
+Usage:
+    python benchmarks/flow_context.py --steps 100000 --labels 5
+"""
+
+import argparse
+import time
+
+from dashfrog.constants import BAGGAGE_FLOW_LABEL_NAME, BAGGAGE_STEP_LABEL_NAME, TENANT_LABEL_NAME
+from dashfrog.context import FlowContext, get_flow_context, use_flow_context
+from dashfrog.utils import generate_flow_group_id, get_flow_id, get_labels_from_baggage, write_to_baggage
+
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+
+
+def baggage_step_event(event_name: str) -> dict:
+    flow_id = get_flow_id()
+    event_labels = get_labels_from_baggage(
+        mandatory_labels=[BAGGAGE_FLOW_LABEL_NAME, BAGGAGE_STEP_LABEL_NAME, TENANT_LABEL_NAME]
+    )
+    flow_name = event_labels.pop(BAGGAGE_FLOW_LABEL_NAME)
+    tenant = event_labels.pop(TENANT_LABEL_NAME)
+    step_name = event_labels.pop(BAGGAGE_STEP_LABEL_NAME)
+    return dict(
+        flow_id=flow_id,
+        event_name=event_name,
+        tenant=tenant,
+        group_id=generate_flow_group_id(flow_name, tenant, **event_labels),
+        flow_metadata={BAGGAGE_FLOW_LABEL_NAME: flow_name, BAGGAGE_STEP_LABEL_NAME: step_name},
+        labels=event_labels,
+    )
+
+
+def baggage_flow_event(event_name: str) -> dict:
+    flow_id = get_flow_id()
+    event_labels = get_labels_from_baggage(mandatory_labels=[BAGGAGE_FLOW_LABEL_NAME, TENANT_LABEL_NAME])
+    flow_name = event_labels.pop(BAGGAGE_FLOW_LABEL_NAME)
+    tenant = event_labels.pop(TENANT_LABEL_NAME)
+    event_labels.pop(BAGGAGE_STEP_LABEL_NAME, None)
+    return dict(
+        flow_id=flow_id,
+        event_name=event_name,
+        tenant=tenant,
+        group_id=generate_flow_group_id(flow_name, tenant, **event_labels),
+        flow_metadata={BAGGAGE_FLOW_LABEL_NAME: flow_name},
+        labels=event_labels,
+    )
+
+
+def run_baggage(steps: int) -> None:
+    for _ in range(steps):
+        with write_to_baggage({BAGGAGE_STEP_LABEL_NAME: "step"}):
+            baggage_step_event("step_start")
+            baggage_flow_event("custom_event")
+            baggage_step_event("step_success")
+
+
+def run_context(steps: int) -> None:
+    for _ in range(steps):
+        with write_to_baggage({BAGGAGE_STEP_LABEL_NAME: "step"}):
+            with use_flow_context(get_flow_context().with_step("step")):
+                get_flow_context(with_step=True).step_event("step_start")
+                get_flow_context().flow_event("custom_event")
+                get_flow_context(with_step=True).step_event("step_success")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=100_000)
+    parser.add_argument("--labels", type=int, default=5, help="Number of flow labels")
+    args = parser.parse_args()
+
+    trace.set_tracer_provider(TracerProvider())
+    tracer = trace.get_tracer("dashfrog-benchmark")
+    labels = {f"label_{i}": f"value_{i}" for i in range(args.labels)}
+
+    with tracer.start_as_current_span("flow.benchmark") as span:
+        flow_context = FlowContext.create(span.get_span_context().trace_id, "benchmark", "acme", labels)
+        with (
+            write_to_baggage({BAGGAGE_FLOW_LABEL_NAME: "benchmark", TENANT_LABEL_NAME: "acme", **labels}),
+            use_flow_context(flow_context),
+        ):
+            for name, run in [("baggage", run_baggage), ("context", run_context)]:
+                start = time.perf_counter()
+                run(args.steps)
+                elapsed = time.perf_counter() - start
+                print(f"{name:<8} {elapsed / args.steps * 1e6:8.2f} µs/step")
+
+
+if __name__ == "__main__":
+    main()
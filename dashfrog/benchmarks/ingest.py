@@ -0,0 +1,121 @@
+"""
+Benchmark flow event ingestion paths.
+
+Compares rows/second for:
+    - per-row insert, one transaction per event (the default `sync` write mode)
+    - multi-row `insert().values(batch)`
+    - `COPY` through `dashfrog.ingest.bulk_write`
+    - the same, notifying the upserted flow runs (`DASHFROG_FLOW_RUN_NOTIFICATIONS`), from
+      `--writers` concurrent writers, as notifying commits are serialized by Postgres
+
+Usage (against the database configured by the DASHFROG_POSTGRES_* variables):
+    python benchmarks/ingest.py --rows 20000
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import time
+import uuid
+
+from sqlalchemy import create_engine, delete, insert
+
+from dashfrog.config import Config
+from dashfrog.ingest import bulk_write, flow_event_values, insert_event, write_dictionaries
+from dashfrog.migrations import run_migrations
+from dashfrog.models import FlowEvent, FlowGroup, FlowRun
+
+BENCHMARK_TENANT = "dashfrog-benchmark"
+
+
+def make_events(count: int) -> list[dict]:
+    start = datetime.now()
+    events = []
+    for i in range(count):
+        flow_id = str(uuid.uuid4().int)
+        events.append(
+            dict(
+                flow_id=flow_id,
+                event_name="flow_start" if i % 2 == 0 else "flow_success",
+                event_dt=start + timedelta(milliseconds=i),
+                labels={"region": "eu-west", "customer_tier": "premium"},
+                group_id=f"benchmark_flow$$tenant={BENCHMARK_TENANT}$$region=eu-west$$customer_tier=premium",
+                tenant=BENCHMARK_TENANT,
+                flow_metadata={"flow_name": "benchmark_flow"},
+            )
+        )
+    return events
+
+
+def per_row_insert(engine, events: list[dict]) -> None:
+    for event in events:
+        insert_event(event, engine)
+
+
+def multi_row_insert(engine, events: list[dict], batch_size: int) -> None:
+    for i in range(0, len(events), batch_size):
+        batch = events[i : i + batch_size]
+        with engine.begin() as conn:
+            write_dictionaries(conn, batch)
+            conn.execute(insert(FlowEvent).values([flow_event_values(event) for event in batch]))
+
+
+def copy(engine, events: list[dict], batch_size: int, notify_runs: bool = False) -> None:
+    for i in range(0, len(events), batch_size):
+        bulk_write(events[i : i + batch_size], engine, notify_runs=notify_runs)
+
+
+def concurrent_copy(engine, events: list[dict], batch_size: int, writers: int, notify_runs: bool) -> None:
+    with ThreadPoolExecutor(writers) as executor:
+        for future in [
+            executor.submit(copy, engine, events[i::writers], batch_size, notify_runs) for i in range(writers)
+        ]:
+            future.result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20_000, help="Number of events per method")
+    parser.add_argument("--batch-size", type=int, default=500, help="Events per batch for batched methods")
+    parser.add_argument("--writers", type=int, default=4, help="Concurrent writers for the concurrent methods")
+    args = parser.parse_args()
+
+    c = Config()
+    engine = create_engine(
+        f"postgresql://{c.postgres_user}:{c.postgres_password}@{c.postgres_host}:{c.postgres_port}/{c.postgres_dbname}",
+        pool_size=args.writers,
+    )
+    run_migrations(engine)
+
+    methods = {
+        # Per-row inserts are slow, keep the run short
+        "per-row insert": (lambda events: per_row_insert(engine, events), max(args.rows // 10, 1)),
+        "multi-row insert": (lambda events: multi_row_insert(engine, events, args.batch_size), args.rows),
+        "copy": (lambda events: copy(engine, events, args.batch_size), args.rows),
+        "concurrent copy": (
+            lambda events: concurrent_copy(engine, events, args.batch_size, args.writers, notify_runs=False),
+            args.rows,
+        ),
+        "concurrent notify": (
+            lambda events: concurrent_copy(engine, events, args.batch_size, args.writers, notify_runs=True),
+            args.rows,
+        ),
+    }
+
+    try:
+        for name, (method, rows) in methods.items():
+            events = make_events(rows)
+            started = time.perf_counter()
+            method(events)
+            elapsed = time.perf_counter() - started
+            print(f"{name:>18}: {rows:>8} rows in {elapsed:7.2f}s -> {rows / elapsed:>10.0f} rows/s")
+    finally:
+        with engine.begin() as conn:
+            conn.execute(delete(FlowEvent).where(FlowEvent.tenant == BENCHMARK_TENANT))
+            conn.execute(delete(FlowRun).where(FlowRun.tenant == BENCHMARK_TENANT))
+            conn.execute(delete(FlowGroup).where(FlowGroup.tenant == BENCHMARK_TENANT))
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
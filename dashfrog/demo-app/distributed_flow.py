@@ -20,11 +20,11 @@ with_fastapi(app)
 
 @app.get("/import/{customer_id}")
 async def import_csv_route(customer_id: str):
-    with step.start("validate"):
+    async with step.astart("validate"):
         validate_csv()
 
     # Step 3: Process
-    with step.start("process"):
+    async with step.astart("process"):
         process_csv()
 
 
@@ -27,9 +27,9 @@ Usage:
 
 # Core setup and configuration
 # Submodules (users import from these)
-from . import flow, metrics, migrations, models, step
+from . import flow, ingest, metrics, migrations, models, step
 from .config import Config
-from .dashfrog import Dashfrog, get_dashfrog_instance, setup
+from .dashfrog import Dashfrog, flush, get_dashfrog_instance, setup
 
 # Instrumentation helpers (optional convenience)
 with_fastapi = Dashfrog.with_fastapi
@@ -42,11 +42,13 @@ with_aws_lambda = Dashfrog.with_aws_lambda
 __all__ = [
     # Setup
     "setup",
+    "flush",
     "get_dashfrog_instance",
     "Config",
     "Dashfrog",
     # Submodules
     "flow",
+    "ingest",
     "step",
     "models",
     "migrations",
@@ -68,7 +68,7 @@ def run_migrations_online() -> None:
             with context.begin_transaction():
                 context.run_migrations()
     else:
-        context.configure(connection=connectable, target_metadata=target_metadata)
+        context.configure(connection=connectable, target_metadata=target_metadata, transaction_per_migration=True)
 
         with context.begin_transaction():
             context.run_migrations()
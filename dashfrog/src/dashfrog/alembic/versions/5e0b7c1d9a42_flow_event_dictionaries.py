@@ -0,0 +1,105 @@
+"""flow event dictionaries
+
+Revision ID: 5e0b7c1d9a42
+Revises: b1446e5041c9
+Create Date: 2026-10-17 10:12:41.208514
+
+"""
+
+from hashlib import blake2b
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "5e0b7c1d9a42"
+down_revision: Union[str, None] = "b1446e5041c9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+
+def _hash_key(value: str) -> int:
+    # Frozen copy of `dashfrog.ingest._hash_key`, ids must match the ones computed by the SDK
+    return int.from_bytes(blake2b(value.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+def _label_set_key(labels: dict) -> int:
+    return _hash_key(json.dumps(labels, sort_keys=True, separators=(",", ":")))
+
+
+def upgrade() -> None:
+    label_set = op.create_table(
+        "label_set",
+        sa.Column("id", sa.BigInteger(), autoincrement=False, nullable=False),
+        sa.Column("labels", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    flow_group = op.create_table(
+        "flow_group",
+        sa.Column("id", sa.BigInteger(), autoincrement=False, nullable=False),
+        sa.Column("group_id", sa.String(), nullable=False),
+        sa.Column("flow_name", sa.String(), nullable=False),
+        sa.Column("tenant", sa.String(), nullable=False),
+        sa.Column("label_set_id", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.add_column("flow_event", sa.Column("flow_group_id", sa.BigInteger(), nullable=True))
+    op.add_column("flow_event", sa.Column("label_set_id", sa.BigInteger(), nullable=True))
+
+    # Backfill the dictionaries from the distinct values, ids are computed like the SDK does
+    conn = op.get_bind()
+    label_sets = [
+        dict(id=_label_set_key(labels), labels=labels)
+        for labels in conn.execute(sa.text("SELECT DISTINCT labels FROM flow_event")).scalars()
+    ]
+    flow_groups = [
+        dict(
+            id=_hash_key(group_id),
+            group_id=group_id,
+            flow_name=flow_name or "",
+            tenant=tenant,
+            label_set_id=_label_set_key(labels),
+        )
+        for group_id, flow_name, tenant, labels in conn.execute(
+            sa.text(
+                "SELECT DISTINCT ON (group_id) group_id, flow_metadata->>'flow_name', tenant, labels "
+                "FROM flow_event ORDER BY group_id, event_dt"
+            )
+        )
+    ]
+    for i in range(0, len(label_sets), BATCH_SIZE):
+        op.bulk_insert(label_set, label_sets[i : i + BATCH_SIZE])
+    for i in range(0, len(flow_groups), BATCH_SIZE):
+        op.bulk_insert(flow_group, flow_groups[i : i + BATCH_SIZE])
+
+    op.execute(
+        "UPDATE flow_event SET flow_group_id = flow_group.id, label_set_id = label_set.id "
+        "FROM flow_group, label_set "
+        "WHERE flow_event.group_id = flow_group.group_id AND flow_event.labels = label_set.labels"
+    )
+
+    op.alter_column("flow_event", "flow_group_id", nullable=False)
+    op.alter_column("flow_event", "label_set_id", nullable=False)
+    op.drop_column("flow_event", "group_id")
+    op.drop_column("flow_event", "labels")
+
+
+def downgrade() -> None:
+    op.add_column("flow_event", sa.Column("labels", postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+    op.add_column("flow_event", sa.Column("group_id", sa.String(), nullable=True))
+    op.execute(
+        "UPDATE flow_event SET group_id = flow_group.group_id, labels = label_set.labels "
+        "FROM flow_group, label_set "
+        "WHERE flow_event.flow_group_id = flow_group.id AND flow_event.label_set_id = label_set.id"
+    )
+    op.alter_column("flow_event", "labels", nullable=False)
+    op.alter_column("flow_event", "group_id", nullable=False)
+    op.drop_column("flow_event", "label_set_id")
+    op.drop_column("flow_event", "flow_group_id")
+    op.drop_table("flow_group")
+    op.drop_table("label_set")
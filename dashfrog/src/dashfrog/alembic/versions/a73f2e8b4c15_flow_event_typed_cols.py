@@ -0,0 +1,115 @@
+"""flow event typed cols
+
+Revision ID: a73f2e8b4c15
+Revises: 5e0b7c1d9a42
+Create Date: 2026-10-17 11:02:17.734120
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "a73f2e8b4c15"
+down_revision: Union[str, None] = "5e0b7c1d9a42"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Frozen copy of `dashfrog.constants.EventKind`
+EVENT_KINDS = {
+    "flow_start": 1,
+    "flow_success": 2,
+    "flow_fail": 3,
+    "step_start": 4,
+    "step_success": 5,
+    "step_fail": 6,
+}
+EVENT_KIND_CUSTOM = 7
+
+
+def upgrade() -> None:
+    # flow_id held the decimal string of the 128-bit trace id
+    op.execute("""
+        CREATE FUNCTION pg_temp.decimal_to_uuid(value text) RETURNS uuid AS $$
+        DECLARE
+            n numeric;
+            hex text := '';
+        BEGIN
+            IF value !~ '^[0-9]+$' THEN
+                RETURN md5(value)::uuid;
+            END IF;
+            n := value::numeric;
+            WHILE n > 0 LOOP
+                hex := substr('0123456789abcdef', (n % 16)::int + 1, 1) || hex;
+                n := div(n, 16);
+            END LOOP;
+            RETURN lpad(hex, 32, '0')::uuid;
+        END
+        $$ LANGUAGE plpgsql IMMUTABLE
+    """)
+
+    op.add_column("flow_event", sa.Column("event_kind", sa.SmallInteger(), nullable=True))
+    op.add_column("flow_event", sa.Column("flow_name", sa.String(), nullable=True))
+    op.add_column("flow_event", sa.Column("step_name", sa.String(), nullable=True))
+    op.alter_column("flow_event", "event_name", nullable=True)
+
+    kind_cases = " ".join(f"WHEN '{name}' THEN {kind}" for name, kind in EVENT_KINDS.items())
+    op.execute(f"""
+        UPDATE flow_event SET
+            event_kind = CASE event_name {kind_cases} ELSE {EVENT_KIND_CUSTOM} END,
+            event_name = CASE WHEN event_name IN ({", ".join(f"'{name}'" for name in EVENT_KINDS)}) THEN NULL
+                ELSE event_name END,
+            flow_name = coalesce(flow_metadata->>'flow_name', ''),
+            step_name = flow_metadata->>'step_name'
+    """)
+    op.alter_column(
+        "flow_event",
+        "flow_id",
+        type_=sa.UUID(),
+        existing_nullable=False,
+        postgresql_using="pg_temp.decimal_to_uuid(flow_id)",
+    )
+
+    op.alter_column("flow_event", "event_kind", nullable=False)
+    op.alter_column("flow_event", "flow_name", nullable=False)
+    op.drop_column("flow_event", "flow_metadata")
+
+
+def downgrade() -> None:
+    op.execute("""
+        CREATE FUNCTION pg_temp.uuid_to_decimal(value uuid) RETURNS text AS $$
+        DECLARE
+            hex text := replace(value::text, '-', '');
+            n numeric := 0;
+        BEGIN
+            FOR i IN 1..32 LOOP
+                n := n * 16 + (strpos('0123456789abcdef', substr(hex, i, 1)) - 1);
+            END LOOP;
+            RETURN n::text;
+        END
+        $$ LANGUAGE plpgsql IMMUTABLE
+    """)
+
+    op.add_column("flow_event", sa.Column("flow_metadata", postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+    kind_cases = " ".join(f"WHEN {kind} THEN '{name}'" for name, kind in EVENT_KINDS.items())
+    op.execute(f"""
+        UPDATE flow_event SET
+            event_name = CASE event_kind {kind_cases} ELSE event_name END,
+            flow_metadata = jsonb_strip_nulls(jsonb_build_object('flow_name', flow_name, 'step_name', step_name))
+    """)
+    op.alter_column(
+        "flow_event",
+        "flow_id",
+        type_=sa.String(),
+        existing_nullable=False,
+        postgresql_using="pg_temp.uuid_to_decimal(flow_id)",
+    )
+
+    op.alter_column("flow_event", "flow_metadata", nullable=False)
+    op.alter_column("flow_event", "event_name", nullable=False)
+    op.drop_column("flow_event", "step_name")
+    op.drop_column("flow_event", "flow_name")
+    op.drop_column("flow_event", "event_kind")
@@ -0,0 +1,62 @@
+"""flow filter dictionaries
+
+Revision ID: a8e51c6f3b92
+Revises: f5c82d1b7e40
+Create Date: 2026-10-17 18:05:41.572910
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "a8e51c6f3b92"
+down_revision: Union[str, None] = "f5c82d1b7e40"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "flow_label_value",
+        sa.Column("flow_name", sa.String(), nullable=False),
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("value", sa.String(), nullable=False),
+        sa.Column("last_seen", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("flow_name", "key", "value"),
+    )
+    op.create_index("ix_flow_label_value_last_seen", "flow_label_value", ["last_seen"], unique=False)
+    op.create_table(
+        "tenant",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("last_seen", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+    op.create_index("ix_tenant_last_seen", "tenant", ["last_seen"], unique=False)
+
+    # Backfill from the runs, one row each, rather than from the events
+    op.execute("""
+        INSERT INTO flow_label_value (flow_name, key, value, last_seen)
+        SELECT flow_run.flow_name, kv.key, kv.value, max(flow_run.started_at)
+        FROM flow_run
+        JOIN label_set ON label_set.id = flow_run.label_set_id,
+            LATERAL jsonb_each_text(label_set.labels) AS kv(key, value)
+        WHERE flow_run.started_at IS NOT NULL AND kv.value IS NOT NULL
+        GROUP BY 1, 2, 3
+    """)
+    op.execute("""
+        INSERT INTO tenant (name, last_seen)
+        SELECT tenant, max(greatest(started_at, ended_at))
+        FROM flow_run
+        WHERE coalesce(started_at, ended_at) IS NOT NULL
+        GROUP BY 1
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tenant_last_seen", table_name="tenant")
+    op.drop_table("tenant")
+    op.drop_index("ix_flow_label_value_last_seen", table_name="flow_label_value")
+    op.drop_table("flow_label_value")
@@ -0,0 +1,63 @@
+"""flow run
+
+Revision ID: c2d84f1e6b37
+Revises: a73f2e8b4c15
+Create Date: 2026-10-17 12:26:03.481902
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "c2d84f1e6b37"
+down_revision: Union[str, None] = "a73f2e8b4c15"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "flow_run",
+        sa.Column("flow_id", sa.UUID(), nullable=False),
+        sa.Column("flow_group_id", sa.BigInteger(), nullable=False),
+        sa.Column("label_set_id", sa.BigInteger(), nullable=False),
+        sa.Column("tenant", sa.String(), nullable=False),
+        sa.Column("flow_name", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("ended_at", sa.DateTime(), nullable=True),
+        sa.Column("duration", sa.Interval(), sa.Computed("ended_at - started_at"), nullable=True),
+        sa.PrimaryKeyConstraint("flow_id", "flow_group_id"),
+    )
+
+    # Backfill from the flow lifecycle events (event kinds: 1 start, 2 success, 3 fail), one run per flow
+    # group of a trace, which also determines its label set, tenant and flow name
+    op.execute("""
+        INSERT INTO flow_run (flow_id, flow_group_id, label_set_id, tenant, flow_name, status, started_at, ended_at)
+        SELECT
+            flow_id,
+            flow_group_id,
+            min(label_set_id),
+            min(tenant),
+            min(flow_name),
+            CASE (array_agg(event_kind ORDER BY event_dt DESC) FILTER (WHERE event_kind IN (2, 3)))[1]
+                WHEN 2 THEN 'success'
+                WHEN 3 THEN 'failure'
+                ELSE 'running'
+            END,
+            min(event_dt) FILTER (WHERE event_kind = 1),
+            max(event_dt) FILTER (WHERE event_kind IN (2, 3))
+        FROM flow_event
+        WHERE event_kind IN (1, 2, 3)
+        GROUP BY flow_id, flow_group_id
+    """)
+
+    op.create_index("ix_flow_run_tenant_started_at", "flow_run", ["tenant", "started_at"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_flow_run_tenant_started_at", table_name="flow_run")
+    op.drop_table("flow_run")
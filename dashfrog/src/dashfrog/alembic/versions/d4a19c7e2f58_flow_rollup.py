@@ -0,0 +1,60 @@
+"""flow rollup
+
+Revision ID: d4a19c7e2f58
+Revises: c2d84f1e6b37
+Create Date: 2026-10-17 13:41:52.106338
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "d4a19c7e2f58"
+down_revision: Union[str, None] = "c2d84f1e6b37"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "flow_run",
+        sa.Column("updated_at", sa.DateTime(), server_default=sa.text("timezone('utc', now())"), nullable=False),
+    )
+    op.create_index("ix_flow_run_updated_at", "flow_run", ["updated_at"], unique=False)
+    op.create_index("ix_flow_run_flow_group_id_started_at", "flow_run", ["flow_group_id", "started_at"], unique=False)
+
+    # Existing runs are rolled up by the first refresh, as they are all newer than its missing watermark
+    op.create_table(
+        "flow_rollup",
+        sa.Column("resolution", sa.String(), nullable=False),
+        sa.Column("bucket", sa.DateTime(), nullable=False),
+        sa.Column("flow_group_id", sa.BigInteger(), nullable=False),
+        sa.Column("run_count", sa.BigInteger(), nullable=False),
+        sa.Column("success_count", sa.BigInteger(), nullable=False),
+        sa.Column("failed_count", sa.BigInteger(), nullable=False),
+        sa.Column("duration_count", sa.BigInteger(), nullable=False),
+        sa.Column("duration_sum", sa.Interval(), nullable=False),
+        sa.Column("duration_min", sa.Interval(), nullable=True),
+        sa.Column("duration_max", sa.Interval(), nullable=True),
+        sa.Column("last_started_at", sa.DateTime(), nullable=False),
+        sa.Column("duration_sketch", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.PrimaryKeyConstraint("resolution", "bucket", "flow_group_id"),
+    )
+    op.create_table(
+        "flow_rollup_state",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("watermark", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("flow_rollup_state")
+    op.drop_table("flow_rollup")
+    op.drop_index("ix_flow_run_flow_group_id_started_at", table_name="flow_run")
+    op.drop_index("ix_flow_run_updated_at", table_name="flow_run")
+    op.drop_column("flow_run", "updated_at")
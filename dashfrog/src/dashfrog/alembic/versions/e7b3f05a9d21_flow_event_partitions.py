@@ -0,0 +1,100 @@
+"""flow event partitions
+
+Revision ID: e7b3f05a9d21
+Revises: d4a19c7e2f58
+Create Date: 2026-10-17 15:08:44.512907
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "e7b3f05a9d21"
+down_revision: Union[str, None] = "d4a19c7e2f58"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Days after the migration to create partitions for, as `dashfrog.partitions.maintain_partitions` does
+PREMAKE_DAYS = 7
+
+COLUMNS = "id, flow_id, event_kind, event_name, event_dt, flow_group_id, label_set_id, tenant, flow_name, step_name"
+
+
+def flow_event_table(name: str, **kwargs) -> None:
+    op.create_table(
+        name,
+        sa.Column("id", sa.BigInteger(), server_default=sa.text("nextval('flow_event_id_seq')"), nullable=False),
+        sa.Column("flow_id", sa.UUID(), nullable=False),
+        sa.Column("event_kind", sa.SmallInteger(), nullable=False),
+        sa.Column("event_name", sa.String(), nullable=True),
+        sa.Column("event_dt", sa.DateTime(), server_default=sa.text("now()"), nullable=False),
+        sa.Column("flow_group_id", sa.BigInteger(), nullable=False),
+        sa.Column("label_set_id", sa.BigInteger(), nullable=False),
+        sa.Column("tenant", sa.String(), nullable=False),
+        sa.Column("flow_name", sa.String(), nullable=False),
+        sa.Column("step_name", sa.String(), nullable=True),
+        **kwargs,
+    )
+
+
+def upgrade() -> None:
+    # Keep the id sequence, and free the names of the table and its index and primary key
+    op.execute("ALTER SEQUENCE flow_event_id_seq OWNED BY NONE")
+    op.rename_table("flow_event", "flow_event_unpartitioned")
+    op.execute(
+        "ALTER TABLE flow_event_unpartitioned RENAME CONSTRAINT flow_event_pkey TO flow_event_unpartitioned_pkey"
+    )
+    op.drop_index("ix_flow_event_event_dt_brin", table_name="flow_event_unpartitioned", postgresql_using="brin")
+
+    # The partition key must be part of the primary key
+    flow_event_table(
+        "flow_event",
+        sa.PrimaryKeyConstraint("id", "event_dt"),
+        postgresql_partition_by="RANGE (event_dt)",
+    )
+    op.execute("ALTER SEQUENCE flow_event_id_seq OWNED BY flow_event.id")
+    op.execute("CREATE TABLE flow_event_default PARTITION OF flow_event DEFAULT")
+
+    # One partition per day of the existing events, up to the coming days
+    op.execute(f"""
+        DO $$
+        DECLARE
+            day date;
+        BEGIN
+            FOR day IN
+                SELECT generate_series(
+                    coalesce((SELECT min(event_dt) FROM flow_event_unpartitioned)::date, (timezone('utc', now()))::date),
+                    (timezone('utc', now()))::date + {PREMAKE_DAYS},
+                    interval '1 day'
+                )::date
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF flow_event FOR VALUES FROM (%L) TO (%L)',
+                    'flow_event_p' || to_char(day, 'YYYYMMDD'), day, day + 1
+                );
+            END LOOP;
+        END
+        $$
+    """)
+
+    op.execute(f"INSERT INTO flow_event ({COLUMNS}) SELECT {COLUMNS} FROM flow_event_unpartitioned")
+    op.drop_table("flow_event_unpartitioned")
+    op.create_index("ix_flow_event_event_dt_brin", "flow_event", ["event_dt"], unique=False, postgresql_using="brin")
+
+
+def downgrade() -> None:
+    op.execute("ALTER SEQUENCE flow_event_id_seq OWNED BY NONE")
+    op.rename_table("flow_event", "flow_event_partitioned")
+    op.execute("ALTER TABLE flow_event_partitioned RENAME CONSTRAINT flow_event_pkey TO flow_event_partitioned_pkey")
+    op.drop_index("ix_flow_event_event_dt_brin", table_name="flow_event_partitioned", postgresql_using="brin")
+
+    flow_event_table("flow_event", sa.PrimaryKeyConstraint("id"))
+    op.execute("ALTER SEQUENCE flow_event_id_seq OWNED BY flow_event.id")
+    op.execute(f"INSERT INTO flow_event ({COLUMNS}) SELECT {COLUMNS} FROM flow_event_partitioned")
+
+    # Dropping the partitioned table drops its partitions
+    op.drop_table("flow_event_partitioned")
+    op.create_index("ix_flow_event_event_dt_brin", "flow_event", ["event_dt"], unique=False, postgresql_using="brin")
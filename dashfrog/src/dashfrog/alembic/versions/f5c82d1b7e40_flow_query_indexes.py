@@ -0,0 +1,73 @@
+"""flow query indexes
+
+Revision ID: f5c82d1b7e40
+Revises: e7b3f05a9d21
+Create Date: 2026-10-17 16:22:09.318455
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "f5c82d1b7e40"
+down_revision: Union[str, None] = "e7b3f05a9d21"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Frozen copy of `dashfrog.partitions._MAINTENANCE_LOCK_KEY`
+PARTITION_MAINTENANCE_LOCK_KEY = 0x64667032
+
+FLOW_EVENT_INDEXES = {
+    "ix_flow_event_tenant_event_dt": ("tenant", "event_dt"),
+    "ix_flow_event_tenant_flow_name_event_dt": ("tenant", "flow_name", "event_dt"),
+    "ix_flow_event_flow_id_event_dt": ("flow_id", "event_dt"),
+}
+
+# Indexes of unpartitioned tables: name, table and definition
+INDEXES = (
+    ("ix_flow_run_tenant_flow_name_started_at", "flow_run", "(tenant, flow_name, started_at)"),
+    ("ix_flow_group_tenant_flow_name", "flow_group", "(tenant, flow_name)"),
+    ("ix_label_set_labels", "label_set", "USING gin (labels jsonb_path_ops)"),
+)
+
+
+def upgrade() -> None:
+    # Built without blocking writes, outside of a transaction. An interrupted build leaves an
+    # invalid index behind, drop it before running the migration again.
+    with op.get_context().autocommit_block():
+        for name, table, definition in INDEXES:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {definition}")
+
+        # Partitioned tables can't be indexed concurrently: create invalid indexes on the parent only,
+        # index each partition concurrently, and attach their indexes to validate the parent's.
+        # Partition maintenance is skipped while the lock is held, later partitions get indexes from the parent.
+        conn = op.get_bind()
+        conn.execute(sa.text("SELECT pg_advisory_lock(:key)"), {"key": PARTITION_MAINTENANCE_LOCK_KEY})
+        try:
+            for name, columns in FLOW_EVENT_INDEXES.items():
+                op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY flow_event ({', '.join(columns)})")
+
+            partitions = conn.execute(
+                sa.text("SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = 'flow_event'::regclass")
+            ).scalars()
+            for partition in list(partitions):
+                for name, columns in FLOW_EVENT_INDEXES.items():
+                    partition_index = f"{partition}_{'_'.join(columns)}_idx"
+                    op.execute(
+                        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition_index} "
+                        f"ON {partition} ({', '.join(columns)})"
+                    )
+                    op.execute(f"ALTER INDEX {name} ATTACH PARTITION {partition_index}")
+        finally:
+            conn.execute(sa.text("SELECT pg_advisory_unlock(:key)"), {"key": PARTITION_MAINTENANCE_LOCK_KEY})
+
+
+def downgrade() -> None:
+    # Dropping the index of the partitioned table drops the indexes of its partitions
+    for name in FLOW_EVENT_INDEXES:
+        op.drop_index(name, table_name="flow_event")
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
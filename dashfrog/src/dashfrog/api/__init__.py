@@ -1,24 +1,58 @@
 """FastAPI application for DashFrog SDK."""
 
 from contextlib import asynccontextmanager
+from datetime import timedelta
 from pathlib import Path
 
 from fastapi import FastAPI
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 
-from dashfrog import Config, setup
+from dashfrog import Config, get_dashfrog_instance, setup
 from dashfrog.api import auth_router, comment, flow, metrics, notebook
+from dashfrog.api.label_catalog import close_label_catalog, open_label_catalog
+from dashfrog.api.notifications import close_notification_hub, open_notification_hub
+from dashfrog.api.prometheus import close_prometheus_client, open_prometheus_client
+from dashfrog.partitions import PartitionMaintainer
+from dashfrog.rollups import RollupMaintainer
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for startup and shutdown events."""
-    # Startup: Initialize DashFrog
-    setup(Config(), run_migrations=True)
+    # Startup: Initialize DashFrog, and keep the flow event partitions and rollups maintained
+    config = Config()
+    setup(config, run_migrations=True)
+    dashfrog = get_dashfrog_instance()
+    engine = dashfrog.db_engine
+    maintainers: list[PartitionMaintainer | RollupMaintainer] = []
+    if config.partition_maintenance_interval > 0:
+        maintainers.append(
+            PartitionMaintainer(
+                engine,
+                interval=config.partition_maintenance_interval,
+                premake_days=config.event_partition_premake_days,
+                retention_days=config.event_retention_days,
+                expired_action=config.event_retention_action,
+            )
+        )
+    if config.rollup_interval > 0:
+        maintainers.append(
+            RollupMaintainer(engine, interval=config.rollup_interval, lag=timedelta(seconds=config.rollup_lag))
+        )
+    for maintainer in maintainers:
+        maintainer.start()
+    open_prometheus_client(config)
+    open_label_catalog(config)
+    open_notification_hub(dashfrog.async_db_engine)
     yield
-    # Shutdown: cleanup if needed
-    pass
+    # Shutdown: stop the maintenance, and close the connections of the API queries
+    for maintainer in maintainers:
+        maintainer.stop()
+    await close_notification_hub()
+    await close_label_catalog()
+    await close_prometheus_client()
+    await dashfrog.close_async_db_engine()
 
 
 app = FastAPI(
@@ -0,0 +1,77 @@
+"""Metric and flow definitions, cached in memory until an app registers a new one."""
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dashfrog import get_dashfrog_instance
+from dashfrog.constants import CATALOG_CHANNEL
+from dashfrog.models import (
+    Flow,
+    Metric as MetricModel,
+)
+
+from .notifications import NotificationHub, get_notification_hub
+
+
+class DefinitionCatalog:
+    """
+    Metric and flow definitions, read from the database once per catalog version.
+
+    `register_flow` and `register_metric` notify the catalog channel, and every notification, or
+    reconnection of the notification hub, bumps the version. Definitions are only cached while the hub
+    is connected, so none can be missed.
+    """
+
+    def __init__(self, hub: NotificationHub | None):
+        self.hub = hub
+        self.version = 0
+        self._metrics: dict[str, MetricModel] | None = None
+        self._flows: list[Flow] | None = None
+        if hub is not None:
+            hub.subscribe(CATALOG_CHANNEL, self.invalidate)
+            hub.on_connect(self.invalidate)
+
+    def invalidate(self, payload: str = "") -> None:
+        self.version += 1
+        self._metrics = None
+        self._flows = None
+
+    @property
+    def _cached(self) -> bool:
+        return self.hub is not None and self.hub.connected
+
+    async def metrics(self) -> dict[str, MetricModel]:
+        """Registered metrics, by name."""
+        if self._metrics is not None and self._cached:
+            return self._metrics
+
+        version = self.version
+        async with AsyncSession(get_dashfrog_instance().async_db_engine) as session:
+            metrics = {metric.name: metric for metric in await session.scalars(select(MetricModel))}
+        if self._cached and version == self.version:
+            self._metrics = metrics
+        return metrics
+
+    async def flows(self) -> list[Flow]:
+        """Registered flows, by name order."""
+        if self._flows is not None and self._cached:
+            return self._flows
+
+        version = self.version
+        async with AsyncSession(get_dashfrog_instance().async_db_engine) as session:
+            flows = list(await session.scalars(select(Flow).order_by(Flow.name)))
+        if self._cached and version == self.version:
+            self._flows = flows
+        return flows
+
+
+_catalog: DefinitionCatalog | None = None
+
+
+def get_catalog() -> DefinitionCatalog:
+    """The definition catalog, invalidated by the notification hub of the API server."""
+    global _catalog
+    hub = get_notification_hub()
+    if _catalog is None or _catalog.hub is not hub:
+        _catalog = DefinitionCatalog(hub)
+    return _catalog
@@ -6,13 +6,13 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials
 from pydantic import BaseModel
 from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import delete
 
 from dashfrog.api.schemas import CommentResponse, CreateCommentRequest
 from dashfrog.dashfrog import get_dashfrog_instance
 from dashfrog.models import Comment, Notebook
-from dashfrog.utils import get_time_range_from_time_window
+from dashfrog.utils import get_time_range_from_time_window, naive_utc
 
 from .auth import security, verify_token, verify_token_string
 
@@ -41,7 +41,7 @@ async def get_comments(
     - Direct time range queries (start/end) require authentication
     """
     start, end = request.start, request.end
-    with Session(get_dashfrog_instance().db_engine) as session:
+    async with AsyncSession(get_dashfrog_instance().async_db_engine) as session:
         # Check if user is authenticated
         is_authenticated = False
         if credentials is not None:
@@ -54,9 +54,9 @@ async def get_comments(
         # Determine the time range
         if request.notebook_id is not None:
             # Fetch notebook and extract time window
-            notebook = session.execute(
+            notebook = (await session.execute(
                 select(Notebook).where(Notebook.id == request.notebook_id)
-            ).scalar_one_or_none()
+            )).scalar_one_or_none()
 
             if notebook is None:
                 raise HTTPException(status_code=404, detail="Notebook not found")
@@ -91,13 +91,16 @@ async def get_comments(
                     headers={"WWW-Authenticate": "Bearer"},
                 )
 
+        # Comments are stored as naive UTC
+        start, end = naive_utc(start), naive_utc(end)
+
         # Find comments that overlap with the given date range
-        comments = session.execute(
+        comments = (await session.scalars(
             select(Comment).where(
                 Comment.start <= end,
                 Comment.end >= start
             ).order_by(Comment.start.desc())
-        ).scalars().all()
+        )).all()
 
         return [
             CommentResponse(
@@ -117,16 +120,16 @@ async def create_comment(
     auth: Annotated[None, Depends(verify_token)]
 ) -> CommentResponse:
     """Create a new comment."""
-    with Session(get_dashfrog_instance().db_engine) as session:
+    async with AsyncSession(get_dashfrog_instance().async_db_engine) as session:
         comment = Comment(
             emoji=request.emoji,
             title=request.title,
-            start=request.start,
-            end=request.end,
+            start=naive_utc(request.start),
+            end=naive_utc(request.end),
         )
         session.add(comment)
-        session.commit()
-        session.refresh(comment)
+        await session.commit()
+        await session.refresh(comment)
 
         return CommentResponse(
             id=comment.id,
@@ -143,13 +146,13 @@ async def update_comment(
     auth: Annotated[None, Depends(verify_token)]
 ) -> None:
     """Update a comment."""
-    with Session(get_dashfrog_instance().db_engine) as session:
-        comment = session.execute(select(Comment).where(Comment.id == comment_id)).scalar_one()
+    async with AsyncSession(get_dashfrog_instance().async_db_engine) as session:
+        comment = (await session.execute(select(Comment).where(Comment.id == comment_id))).scalar_one()
         comment.emoji = request.emoji
         comment.title = request.title
-        comment.start = request.start
-        comment.end = request.end
-        session.commit()
+        comment.start = naive_utc(request.start)
+        comment.end = naive_utc(request.end)
+        await session.commit()
 
 @router.delete("/{comment_id}") 
 async def delete_comment(
@@ -157,6 +160,6 @@ async def delete_comment(
     auth: Annotated[None, Depends(verify_token)]
 ) -> None:
     """Delete a comment."""
-    with Session(get_dashfrog_instance().db_engine) as session:
-        session.execute(delete(Comment).where(Comment.id == comment_id))
-        session.commit()
\ No newline at end of file
+    async with AsyncSession(get_dashfrog_instance().async_db_engine) as session:
+        await session.execute(delete(Comment).where(Comment.id == comment_id))
+        await session.commit()
\ No newline at end of file
@@ -0,0 +1,48 @@
+"""Compile flow label filters into index-friendly SQL, or evaluate them in memory."""
+
+from sqlalchemy import ColumnElement, CompoundSelect, Select, intersect, select, union_all
+
+from dashfrog.models import LabelSet
+
+from .schemas import LabelFilter
+
+
+def label_set_filter(label_set_id: ColumnElement, label_filters: list[LabelFilter]) -> ColumnElement[bool]:
+    """
+    Restrict rows to the label sets matching every filter.
+
+    A label set matches a filter when it has the label with that value, or does not have the label.
+    Filters are evaluated once per distinct label set instead of once per row.
+    """
+    return label_set_id.in_(matching_label_sets(label_filters))
+
+
+def matching_label_sets(label_filters: list[LabelFilter]) -> Select | CompoundSelect:
+    """
+    Ids of the label sets matching every filter.
+
+    Each filter selects the label sets containing its label value, which are found with the GIN index
+    on `label_set.labels`, plus the disjoint label sets without its label, and filters are intersected.
+    Label values are strings, so containment is equivalent to comparing the label's text value.
+    """
+    if not label_filters:
+        return select(LabelSet.id)
+
+    per_filter = [
+        union_all(
+            select(LabelSet.id).where(LabelSet.labels.contains({label_filter.label: label_filter.value})),
+            select(LabelSet.id).where(~LabelSet.labels.has_key(label_filter.label)),
+        )
+        for label_filter in label_filters
+    ]
+    return per_filter[0] if len(per_filter) == 1 else intersect(*per_filter)
+
+
+def labels_match(labels: dict[str, str], label_filters: list[LabelFilter]) -> bool:
+    """Whether a label set matches every filter, as `label_set_filter` evaluates it in the database."""
+    return all(labels.get(f.label, f.value) == f.value for f in label_filters)
+
+
+def label_filters_key(label_filters: list[LabelFilter]) -> tuple[tuple[str, str], ...]:
+    """Hashable form of label filters, the same whatever their order."""
+    return tuple(sorted((f.label, f.value) for f in label_filters))
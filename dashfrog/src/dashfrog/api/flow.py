@@ -1,32 +1,35 @@
 """Flow API routes."""
 
-from datetime import datetime, timedelta
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from hashlib import blake2b
 from itertools import groupby
-from typing import Annotated
+import json
+from typing import Annotated, TypeVar
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials
 from pydantic import BaseModel, Field
-from sqlalchemy import and_, func, or_, select
+from sqlalchemy import Row, Select, and_, exists, func, or_, select, true, tuple_, union_all
 from sqlalchemy.exc import NoResultFound
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 
 from dashfrog import get_dashfrog_instance
-from dashfrog.constants import (
-    BAGGAGE_FLOW_LABEL_NAME,
-    BAGGAGE_STEP_LABEL_NAME,
-    DEFAULT_THRESHOLD_DAYS,
-    EVENT_FLOW_FAIL,
-    EVENT_FLOW_START,
-    EVENT_FLOW_SUCCESS,
-    EVENT_STEP_FAIL,
-    EVENT_STEP_START,
-    EVENT_STEP_SUCCESS,
-)
-from dashfrog.models import Flow, FlowEvent, Notebook
+from dashfrog.constants import DEFAULT_THRESHOLD_DAYS, EventKind
+from dashfrog.models import FlowEvent, FlowGroup, FlowLabelValue, FlowRollup, FlowRun, LabelSet, Notebook, Tenant
+from dashfrog.rollups import decompose_window, get_watermark
+from dashfrog.utils import naive_utc
 
 from .auth import security, verify_has_access_to_notebook, verify_token
+from .catalog import get_catalog
+from .filters import label_filters_key, label_set_filter
+from .flow_runs import Resync, get_flow_run_feed
+from .ndjson import accepts_ndjson, ndjson_response
+from .result_cache import CacheStats, ResultCache, get_flow_query_cache, round_window
 from .schemas import (
     BlockFilters,
     FlowHistory,
@@ -36,115 +39,191 @@ from .schemas import (
     Label,
     LabelFilter,
 )
+from .sse import SSE_KEEPALIVE, sse_event, sse_response
+
+T = TypeVar("T")
 
 router = APIRouter(prefix="/api/flows", tags=["flows"])
 
+# Runs read from the database at once when building histories, and maximum page size
+HISTORY_PAGE_SIZE = 500
+HISTORY_MAX_LIMIT = 1000
+
+# Response header of the cursor of flow searches
+SEARCH_CURSOR_HEADER = "X-DashFrog-Cursor"
+
+# Seconds without run changes before a keepalive is sent on flow streams
+STREAM_KEEPALIVE_INTERVAL = 15.0
+
+
+def flow_summary_query(
+    tenant: str,
+    start: datetime,
+    end: datetime,
+    flow_name: str | None,
+    label_filters: list[LabelFilter] | None,
+    watermark: datetime | None,
+    flow_group_ids: Select | None = None,
+) -> Select:
+    """
+    Flow summary query with stats and latest run info, for the runs started in `[start, end]`.
+
+    The part of the window aligned on rollup buckets before `watermark` is read from the flow rollups,
+    and only its edges from the flow runs. With `flow_group_ids`, only the summaries of these groups are computed.
+    """
+    start, end = naive_utc(start), naive_utc(end)
+
+    # Flow groups matching the tenant, flow name and labels
+    group_filters = [FlowGroup.tenant == tenant]
+    run_filters = [FlowRun.tenant == tenant]
+    if flow_name is not None:
+        group_filters.append(FlowGroup.flow_name == flow_name)
+        run_filters.append(FlowRun.flow_name == flow_name)
+    if label_filters:
+        group_filters.append(label_set_filter(FlowGroup.label_set_id, label_filters))
+        run_filters.append(label_set_filter(FlowRun.label_set_id, label_filters))
+    if flow_group_ids is not None:
+        group_filters.append(FlowGroup.id.in_(flow_group_ids))
+        run_filters.append(FlowRun.flow_group_id.in_(flow_group_ids))
+    group_ids = select(FlowGroup.id).where(*group_filters)
+
+    segments = decompose_window(start, end, watermark)
+    if segments[-1][0] is not None:
+        # The window end is inclusive, runs started right at it are not in the rollups
+        segments.append((None, end, end))
+
+    # Stats of every segment, rolled up buckets as they are, raw runs aggregated per flow group
+    segment_stats = []
+    for i, (resolution, segment_start, segment_end) in enumerate(segments):
+        if resolution is not None:
+            segment_stats.append(
+                select(
+                    FlowRollup.flow_group_id,
+                    FlowRollup.run_count,
+                    FlowRollup.success_count,
+                    FlowRollup.failed_count,
+                    FlowRollup.duration_count,
+                    FlowRollup.duration_sum,
+                    FlowRollup.duration_min,
+                    FlowRollup.duration_max,
+                    FlowRollup.last_started_at,
+                ).where(
+                    FlowRollup.resolution == resolution,
+                    FlowRollup.bucket >= segment_start,
+                    FlowRollup.bucket < segment_end,
+                    FlowRollup.flow_group_id.in_(group_ids),
+                )
+            )
+            continue
+
+        is_last = i == len(segments) - 1
+        segment_stats.append(
+            select(
+                FlowRun.flow_group_id,
+                func.count(),
+                func.count().filter(FlowRun.status == "success"),
+                func.count().filter(FlowRun.status == "failure"),
+                func.count(FlowRun.duration),
+                func.coalesce(func.sum(FlowRun.duration), timedelta(0)),
+                func.min(FlowRun.duration),
+                func.max(FlowRun.duration),
+                func.max(FlowRun.started_at),
+            )
+            .where(
+                *run_filters,
+                FlowRun.started_at >= segment_start,
+                FlowRun.started_at <= segment_end if is_last else FlowRun.started_at < segment_end,
+            )
+            .group_by(FlowRun.flow_group_id)
+        )
+    segment_stats = union_all(*segment_stats).subquery("segment_stats")
 
-def flow_generator(session: Session, base_filters: list):
-    """Generate a flow summary query with stats and latest run info."""
-    # CTE 1: flow_stats - aggregate metrics per flow
+    # CTE 1: flow_stats - aggregate metrics per flow group
+    duration_count = func.sum(segment_stats.c.duration_count)
+    avg_duration = func.sum(segment_stats.c.duration_sum) / func.nullif(duration_count, 0)
     flow_stats = (
         select(
-            FlowEvent.group_id,
-            func.count(FlowEvent.flow_id).filter(FlowEvent.event_name == EVENT_FLOW_START).label("runCount"),
-            func.count(FlowEvent.flow_id).filter(FlowEvent.event_name == EVENT_FLOW_SUCCESS).label("successCount"),
-            func.count(FlowEvent.flow_id).filter(FlowEvent.event_name == EVENT_FLOW_FAIL).label("failedCount"),
-            func.max(FlowEvent.event_dt).filter(FlowEvent.event_name == EVENT_FLOW_START).label("lastRunStartedAt"),
-        )
-        .where(and_(*base_filters))
-        .group_by(FlowEvent.group_id)
+            segment_stats.c.flow_group_id,
+            func.sum(segment_stats.c.run_count).label("runCount"),
+            func.sum(segment_stats.c.success_count).label("successCount"),
+            func.sum(segment_stats.c.failed_count).label("failedCount"),
+            func.max(segment_stats.c.last_started_at).label("lastRunStartedAt"),
+            avg_duration.label("avgDuration"),
+            func.max(segment_stats.c.duration_max).label("maxDuration"),
+            func.min(segment_stats.c.duration_min).label("minDuration"),
+        ).group_by(segment_stats.c.flow_group_id)
     ).cte("flow_stats")
 
-    # CTE 2: latest_run - most recent event per flow name
+    # latest_run - most recent run of each flow group
     latest_run = (
         select(
-            FlowEvent.group_id,
-            FlowEvent.event_name.label("lastRunEventType"),
-            FlowEvent.labels,
-            FlowEvent.flow_metadata.label("lastRunFlowMetadata"),
-            FlowEvent.event_dt.label("lastRunEventDt"),
+            FlowRun.status.label("lastRunStatus"),
+            FlowRun.ended_at.label("lastRunEndedAt"),
         )
-        .where(and_(*base_filters))
-        .distinct(FlowEvent.group_id)
-        .order_by(
-            FlowEvent.group_id,
-            FlowEvent.event_dt.desc(),
+        .where(
+            FlowRun.flow_group_id == flow_stats.c.flow_group_id,
+            FlowRun.started_at == flow_stats.c.lastRunStartedAt,
         )
-    ).cte("latest_run")
-
-    # ct3: start and end times for each flow_id
-    flow_start_end_subquery = (
-        select(
-            FlowEvent.flow_id,
-            FlowEvent.group_id,
-            func.min(FlowEvent.event_dt).filter(FlowEvent.event_name == EVENT_FLOW_START).label("startTime"),
-            func.max(FlowEvent.event_dt)
-            .filter(FlowEvent.event_name.in_([EVENT_FLOW_SUCCESS, EVENT_FLOW_FAIL]))
-            .label("endTime"),
-        )
-        .where(and_(*base_filters))
-        .group_by(FlowEvent.flow_id, FlowEvent.group_id)
-    ).subquery()
-    flow_duration_cte = (
-        select(
-            flow_start_end_subquery.c.group_id,
-            func.avg(flow_start_end_subquery.c.endTime - flow_start_end_subquery.c.startTime).label("avgDuration"),
-            func.max(flow_start_end_subquery.c.endTime - flow_start_end_subquery.c.startTime).label("maxDuration"),
-            func.min(flow_start_end_subquery.c.endTime - flow_start_end_subquery.c.startTime).label("minDuration"),
-        )
-        .select_from(flow_start_end_subquery)
-        .where(flow_start_end_subquery.c.endTime.isnot(None))
-        .group_by(flow_start_end_subquery.c.group_id)
-        .cte("flow_duration")
+        .limit(1)
+        .lateral("latest_run")
     )
 
-    # Main query: join all CTEs
-    query = (
+    # Main query: join the latest runs, and resolve the group id and labels from the dictionaries
+    return (
         select(
-            flow_stats.c.group_id,
+            FlowGroup.group_id,
+            FlowGroup.flow_name,
             flow_stats.c.runCount,
             flow_stats.c.successCount,
             flow_stats.c.failedCount,
             flow_stats.c.lastRunStartedAt,
-            latest_run.c.labels,
-            latest_run.c.lastRunFlowMetadata,
-            latest_run.c.lastRunEventType,
-            latest_run.c.lastRunEventDt,
-            flow_duration_cte.c.avgDuration,
-            flow_duration_cte.c.maxDuration,
-            flow_duration_cte.c.minDuration,
+            LabelSet.labels,
+            latest_run.c.lastRunStatus,
+            latest_run.c.lastRunEndedAt,
+            flow_stats.c.avgDuration,
+            flow_stats.c.maxDuration,
+            flow_stats.c.minDuration,
         )
         .select_from(flow_stats)
-        .join(latest_run, flow_stats.c.group_id == latest_run.c.group_id)
-        .join(flow_duration_cte, flow_stats.c.group_id == flow_duration_cte.c.group_id)
+        .join(latest_run, true())
+        .join(FlowGroup, flow_stats.c.flow_group_id == FlowGroup.id)
+        .join(LabelSet, FlowGroup.label_set_id == LabelSet.id)
     )
 
-    result = session.execute(query)
+
+async def flow_generator(
+    session: AsyncSession,
+    tenant: str,
+    start: datetime,
+    end: datetime,
+    flow_name: str | None = None,
+    label_filters: list[LabelFilter] | None = None,
+    flow_group_ids: Select | None = None,
+):
+    """Generate the flow summaries, with stats and latest run info, for the runs started in `[start, end]`."""
+    watermark = await (await session.connection()).run_sync(get_watermark)
+    result = await session.execute(
+        flow_summary_query(tenant, start, end, flow_name, label_filters, watermark, flow_group_ids)
+    )
     for (
         group_id,
+        name,
         runCount,
         successCount,
         failedCount,
         lastRunStartedAt,
         labels,
-        lastRunFlowMetadata,
-        lastRunEventType,
-        lastRunEventDt,
+        lastRunStatus,
+        lastRunEndedAt,
         avgDuration,
         maxDuration,
         minDuration,
     ) in result:
-        flow_name = lastRunFlowMetadata.get(BAGGAGE_FLOW_LABEL_NAME)
-        lastRunEndedAt = None if lastRunEventType not in (EVENT_FLOW_SUCCESS, EVENT_FLOW_FAIL) else lastRunEventDt
         yield FlowResponse(
             groupId=group_id,
-            name=flow_name,
+            name=name,
             labels=labels,
-            lastRunStatus="success"
-            if lastRunEventType == EVENT_FLOW_SUCCESS
-            else "failure"
-            if lastRunEventType == EVENT_FLOW_FAIL
-            else "running",
+            lastRunStatus=lastRunStatus,
             lastRunStartedAt=lastRunStartedAt,
             lastRunEndedAt=lastRunEndedAt,
             runCount=runCount,
@@ -160,6 +239,355 @@ def flow_generator(session: Session, base_filters: list):
         )
 
 
+async def flow_summaries(
+    engine: AsyncEngine,
+    tenant: str,
+    start: datetime,
+    end: datetime,
+    flow_name: str | None = None,
+    label_filters: list[LabelFilter] | None = None,
+) -> list[FlowResponse]:
+    """The flow summaries of `flow_generator`, read from their own session so that several can run concurrently."""
+    async with AsyncSession(engine) as session:
+        return [flow async for flow in flow_generator(session, tenant, start, end, flow_name, label_filters)]
+
+
+def history_steps(events: list) -> list[FlowHistoryStep]:
+    """Build the steps of a flow run from its step events, ordered by time."""
+    step_events = [
+        e for e in events if e.event_kind in (EventKind.STEP_START, EventKind.STEP_SUCCESS, EventKind.STEP_FAIL)
+    ]
+    steps: list[FlowHistoryStep] = []
+
+    # Group step events by step_name
+    for step_name, step_events_iter in groupby(step_events, key=lambda e: e.step_name or ""):
+        if not step_name:
+            continue
+
+        step_events_list = list(step_events_iter)
+        try:
+            step_start = next(e for e in step_events_list if e.event_kind == EventKind.STEP_START)
+        except StopIteration:
+            continue
+
+        step_end = next(
+            (e for e in step_events_list if e.event_kind in [EventKind.STEP_SUCCESS, EventKind.STEP_FAIL]),
+            None,
+        )
+
+        step_status, step_end_time = "running", None
+        if step_end:
+            step_status = "success" if step_end.event_kind == EventKind.STEP_SUCCESS else "failure"
+            step_end_time = step_end.event_dt
+
+        steps.append(
+            FlowHistoryStep(
+                name=step_name,
+                startTime=step_start.event_dt,
+                endTime=step_end_time,
+                status=step_status,
+            )
+        )
+    return steps
+
+
+def history_runs_query(
+    tenant: str,
+    flow_name: str,
+    start: datetime,
+    end: datetime,
+    label_filters: list[LabelFilter],
+    after: tuple[datetime, UUID, int] | None = None,
+) -> Select:
+    """Query of the runs started in `[start, end]`, latest first, and after the `after` keyset if any."""
+    start, end = naive_utc(start), naive_utc(end)
+
+    # Build run filter conditions (runs started in the time range + labels + flow name)
+    run_filters = [
+        FlowRun.started_at >= start,
+        FlowRun.started_at <= end,
+        FlowRun.flow_name == flow_name,
+        FlowRun.tenant == tenant,
+    ]
+
+    # Add label filters: either label key is not in the list or the value matches
+    if label_filters:
+        run_filters.append(label_set_filter(FlowRun.label_set_id, label_filters))
+
+    # Resume after the last run of the previous page
+    if after is not None:
+        run_filters.append(tuple_(FlowRun.started_at, FlowRun.flow_id, FlowRun.flow_group_id) < tuple_(*after))
+
+    return (
+        select(
+            FlowRun.flow_id,
+            FlowRun.flow_group_id,
+            FlowGroup.group_id,
+            FlowRun.started_at,
+            FlowRun.ended_at,
+            FlowRun.status,
+            LabelSet.labels,
+        )
+        .join(FlowGroup, FlowRun.flow_group_id == FlowGroup.id)
+        .join(LabelSet, FlowRun.label_set_id == LabelSet.id)
+        .where(and_(*run_filters))
+        .order_by(FlowRun.started_at.desc(), FlowRun.flow_id.desc(), FlowRun.flow_group_id.desc())
+    )
+
+
+def history_events_query(
+    tenant: str, flow_name: str, runs: list[tuple[UUID, int]], start: datetime, end: datetime
+) -> Select:
+    """Query of the step and custom events of runs in `[start, end]`, the flow start and end are already in the runs.
+
+    Runs are given by their `(flow_id, flow_group_id)` key, as other flows of the same trace share their flow id.
+    """
+    # Compare naive timestamps, so flow events are pruned to the partitions of the window
+    start, end = naive_utc(start), naive_utc(end)
+    return (
+        select(
+            FlowEvent.flow_id,
+            FlowEvent.flow_group_id,
+            FlowEvent.event_kind,
+            FlowEvent.event_name,
+            FlowEvent.step_name,
+            FlowEvent.event_dt,
+        )
+        .where(
+            FlowEvent.tenant == tenant,
+            FlowEvent.flow_name == flow_name,
+            FlowEvent.flow_id.in_({flow_id for flow_id, _ in runs}),
+            tuple_(FlowEvent.flow_id, FlowEvent.flow_group_id).in_(runs),
+            FlowEvent.event_kind.not_in([EventKind.FLOW_START, EventKind.FLOW_SUCCESS, EventKind.FLOW_FAIL]),
+            FlowEvent.event_dt >= start,
+            FlowEvent.event_dt <= end,
+        )
+        .order_by(FlowEvent.flow_id, FlowEvent.flow_group_id, FlowEvent.event_dt.asc())
+    )
+
+
+async def history_page(
+    session: AsyncSession, runs: Sequence[Row], tenant: str, flow_name: str, start: datetime, end: datetime
+) -> list[FlowHistory]:
+    """Build the history of a page of runs of `flow_name`, reading the events of the whole page at once."""
+    if not runs:
+        return []
+
+    run_keys = [(run.flow_id, run.flow_group_id) for run in runs]
+    events = await session.execute(history_events_query(tenant, flow_name, run_keys, start, end))
+    events_by_run = {
+        run_key: list(run_events) for run_key, run_events in groupby(events, key=lambda e: (e.flow_id, e.flow_group_id))
+    }
+
+    flow_histories: list[FlowHistory] = []
+    for run in runs:
+        events_list = events_by_run.get((run.flow_id, run.flow_group_id), [])
+        flow_histories.append(
+            FlowHistory(
+                flowId=str(run.flow_id.int),
+                groupId=run.group_id,
+                startTime=run.started_at,
+                endTime=run.ended_at,
+                status=run.status,
+                events=[
+                    FlowHistoryEvent(
+                        eventName=e.event_name,
+                        eventDt=e.event_dt,
+                    )
+                    for e in events_list
+                    if e.event_kind == EventKind.CUSTOM and e.event_name is not None
+                ],
+                steps=history_steps(events_list),
+                labels=run.labels,
+            )
+        )
+    return flow_histories
+
+
+async def iter_flow_history(
+    session: AsyncSession, runs_query: Select, tenant: str, flow_name: str, start: datetime, end: datetime
+) -> AsyncIterator[FlowHistory]:
+    """Yield the history of every run of `runs_query`, read from a server-side cursor one page at a time."""
+    runs = await session.stream(runs_query.execution_options(yield_per=HISTORY_PAGE_SIZE))
+    async for page in runs.partitions():
+        for flow_history in await history_page(session, page, tenant, flow_name, start, end):
+            yield flow_history
+
+
+def encode_history_cursor(started_at: datetime, flow_id: UUID, flow_group_id: int) -> str:
+    """Opaque cursor resuming the history after the given run."""
+    return urlsafe_b64encode(f"{started_at.isoformat()}|{flow_id.hex}|{flow_group_id}".encode()).decode()
+
+
+def decode_history_cursor(cursor: str) -> tuple[datetime, UUID, int]:
+    """Keyset of the run a history cursor resumes after."""
+    try:
+        started_at, flow_id, flow_group_id = urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(started_at), UUID(hex=flow_id), int(flow_group_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid history cursor")
+
+
+def changed_flow_groups_query(
+    tenant: str,
+    start: datetime,
+    end: datetime,
+    flow_name: str | None,
+    label_filters: list[LabelFilter],
+    since: datetime,
+) -> Select:
+    """Ids of the flow groups with runs started in `[start, end]` upserted since `since`."""
+    start, end = naive_utc(start), naive_utc(end)
+    run_filters = [
+        FlowRun.tenant == tenant,
+        FlowRun.updated_at >= since,
+        FlowRun.started_at >= start,
+        FlowRun.started_at <= end,
+    ]
+    if flow_name is not None:
+        run_filters.append(FlowRun.flow_name == flow_name)
+    if label_filters:
+        run_filters.append(label_set_filter(FlowRun.label_set_id, label_filters))
+    return select(FlowRun.flow_group_id.distinct()).where(*run_filters)
+
+
+def _search_fingerprint(request: "FlowSearchRequest") -> str:
+    """Digest of the tenant, window, flow name and labels of a search, which its cursor is only valid for."""
+    search = [
+        request.tenant,
+        naive_utc(request.start).isoformat(),
+        naive_utc(request.end).isoformat(),
+        request.flow_name,
+        sorted((label.label, label.value) for label in request.labels),
+    ]
+    return blake2b(json.dumps(search).encode(), digest_size=8).hexdigest()
+
+
+def encode_search_cursor(watermark: datetime, request: "FlowSearchRequest") -> str:
+    """Opaque cursor of the runs upserted before `watermark`, for the same search as `request`."""
+    return urlsafe_b64encode(f"{watermark.isoformat()}|{_search_fingerprint(request)}".encode()).decode()
+
+
+def decode_search_cursor(cursor: str, request: "FlowSearchRequest") -> datetime:
+    """Watermark of a search cursor, which must come from the same search as `request`."""
+    try:
+        watermark, fingerprint = urlsafe_b64decode(cursor.encode()).decode().split("|")
+        watermark = datetime.fromisoformat(watermark)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid search cursor")
+    if fingerprint != _search_fingerprint(request):
+        raise HTTPException(status_code=400, detail="Search cursor of another tenant, window, flow or labels")
+    return watermark
+
+
+async def get_notebook(notebook_id: UUID) -> Notebook:
+    """Notebook a flow query is made for, 404 if it doesn't exist."""
+    async with AsyncSession(get_dashfrog_instance().async_db_engine) as session:
+        try:
+            return (await session.execute(select(Notebook).where(Notebook.id == notebook_id))).scalar_one()
+        except NoResultFound:
+            raise HTTPException(status_code=404, detail=f"Notebook {notebook_id} not found")
+
+
+def window_edges_query(
+    tenant: str,
+    flow_name: str | None,
+    label_filters: list[LabelFilter],
+    start: datetime,
+    end: datetime,
+    widened_start: datetime,
+    widened_end: datetime,
+    events: bool = False,
+) -> Select:
+    """
+    Query of whether runs started in `[widened_start, start)` or `(end, widened_end]`, the edges the window
+    `[start, end]` gains when widened, and with `events`, whether flow events happened in them.
+    """
+    start, end = naive_utc(start), naive_utc(end)
+    widened_start, widened_end = naive_utc(widened_start), naive_utc(widened_end)
+    edges = []
+    for model, dt in [(FlowRun, FlowRun.started_at)] + ([(FlowEvent, FlowEvent.event_dt)] if events else []):
+        filters = [model.tenant == tenant]
+        if flow_name is not None:
+            filters.append(model.flow_name == flow_name)
+        if label_filters:
+            filters.append(label_set_filter(model.label_set_id, label_filters))
+        edges.append(exists().where(*filters, dt >= widened_start, dt < start))
+        edges.append(exists().where(*filters, dt > end, dt <= widened_end))
+    return select(or_(*edges))
+
+
+async def cached_flow_query(
+    cache: ResultCache,
+    key: tuple,
+    start: datetime,
+    end: datetime,
+    edges_query: Callable[[datetime, datetime, datetime, datetime], Select],
+    query: Callable[[datetime, datetime], Awaitable[T]],
+    items: Callable[[T], int],
+) -> T:
+    """
+    Result of the flow `query` of the window `[start, end]`, cached under `key` and the window.
+
+    Windows of the same cache buckets share the result of their widened window when `edges_query` finds
+    nothing in its first and last buckets, as it is then the same as theirs. The check runs with the shared
+    query and its outcome is cached with the result, so cache hits run no query. Otherwise the result is
+    cached by the exact window.
+    """
+    dashfrog = get_dashfrog_instance()
+    bucket = dashfrog.config.flow_query_cache_bucket
+    widened_start, widened_end = round_window(start, end, bucket)
+    # Widening any window of these buckets only adds their first and last buckets
+    edges = edges_query(
+        widened_start + timedelta(seconds=bucket), widened_end - timedelta(seconds=bucket), widened_start, widened_end
+    )
+
+    async def has_edges() -> bool:
+        async with AsyncSession(dashfrog.async_db_engine) as session:
+            return bool(await session.scalar(edges))
+
+    async def widened() -> T | None:
+        if await has_edges():
+            return None
+        result = await query(widened_start, widened_end)
+        # Runs written in the edges while the query ran may be in its result
+        return None if await has_edges() else result
+
+    widened_key = (*key, "widened", naive_utc(widened_start), naive_utc(widened_end))
+    result = await cache.get(widened_key, widened, items=lambda result: 0 if result is None else items(result))
+    if result is not None:
+        return result
+    return await cache.get((*key, naive_utc(start), naive_utc(end)), partial(query, start, end), items)
+
+
+async def flow_search(
+    engine: AsyncEngine,
+    lag: timedelta,
+    tenant: str,
+    start: datetime,
+    end: datetime,
+    flow_name: str | None,
+    label_filters: list[LabelFilter],
+    since: datetime | None,
+) -> tuple[datetime, list[FlowResponse]]:
+    """
+    Flow summaries of a search, with the watermark of the runs they cover, read from their own session.
+
+    With `since`, only the summaries of the flow groups with runs upserted since are computed.
+    """
+    async with AsyncSession(engine) as session:
+        # Runs upserted before the watermark are committed, unless their transaction lasts longer than the lag
+        watermark = await session.scalar(select(func.timezone("utc", func.now()) - lag))
+        assert watermark is not None
+        flow_group_ids = None
+        if since is not None:
+            flow_group_ids = changed_flow_groups_query(tenant, start, end, flow_name, label_filters, since)
+        flows = [
+            flow async for flow in flow_generator(session, tenant, start, end, flow_name, label_filters, flow_group_ids)
+        ]
+        return watermark, flows
+
+
 class FlowSearchRequest(BaseModel):
     """Request body for searching/listing flows."""
 
@@ -169,6 +597,9 @@ class FlowSearchRequest(BaseModel):
     end: datetime = Field(..., description="End datetime for filtering flow events")
     labels: list[LabelFilter] = Field(default_factory=list, description="Label filters as key-value pairs")
     tenant: str = Field(..., description="Tenant for filtering flow events")
+    since: str | None = Field(
+        None, description="Cursor of a previous identical search, to only return the flow groups changed since"
+    )
 
 
 class FlowDetailRequest(BaseModel):
@@ -180,14 +611,25 @@ class FlowDetailRequest(BaseModel):
     end: datetime = Field(..., description="End datetime for filtering flow events")
     labels: list[LabelFilter] = Field(default_factory=list, description="Label filters as key-value pairs")
     tenant: str = Field(..., description="Tenant for filtering flow events")
+    limit: int | None = Field(
+        None, ge=1, le=HISTORY_MAX_LIMIT, description="Maximum number of runs to return, all of them if not set"
+    )
+    after: str | None = Field(None, description="Cursor of the page to return, from the previous page's nextCursor")
 
 
 @router.post("/search", response_model=list[FlowResponse])
 async def search_flows(
-    request: FlowSearchRequest, credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(security)] = None
+    request: FlowSearchRequest,
+    response: Response,
+    credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(security)] = None,
 ) -> list[FlowResponse]:
     """Search/list flows with optional label filters.
 
+    The `X-DashFrog-Cursor` response header is a high-watermark of the runs the summaries include.
+    Pass it as `since` to the same search to only get the summaries of the flow groups with runs
+    upserted since, and merge them into the previous ones: the cost of such a refresh is
+    proportional to the activity since the cursor, not to the window.
+
     Args:
         request: Search request containing datetime range and optional label filters
 
@@ -203,59 +645,110 @@ async def search_flows(
         }
     """
     dashfrog = get_dashfrog_instance()
+    notebook = await get_notebook(request.notebook_id)
+    verify_has_access_to_notebook(
+        credentials,
+        notebook,
+        request.tenant,
+        request.start,
+        request.end,
+        flow_filter=BlockFilters(
+            names=[] if request.flow_name is None else [request.flow_name], filters=request.labels
+        ),
+    )
 
-    # Build base filter conditions (time range + labels)
-    base_filters = [
-        FlowEvent.event_dt >= request.start,
-        FlowEvent.event_dt <= request.end,
-        FlowEvent.tenant == request.tenant,
-    ]
-
-    if request.flow_name is not None:
-        base_filters.append(FlowEvent.flow_metadata["flow_name"].astext == request.flow_name)
-
-    # Add label filters
-    for label_filter in request.labels:
-        base_filters.append(
-            or_(
-                FlowEvent.labels[label_filter.label].astext == label_filter.value,
-                FlowEvent.labels[label_filter.label].is_(None),
-            )
-        )
-
-    with Session(dashfrog.db_engine) as session:
-        try:
-            notebook = session.execute(select(Notebook).where(Notebook.id == request.notebook_id)).scalar_one()
-        except NoResultFound:
-            raise HTTPException(status_code=404, detail=f"Notebook {request.notebook_id} not found")
-        verify_has_access_to_notebook(
-            credentials,
-            notebook,
-            request.tenant,
-            request.start,
-            request.end,
-            flow_filter=BlockFilters(
-                names=[] if request.flow_name is None else [request.flow_name], filters=request.labels
-            ),
+    since = decode_search_cursor(request.since, request) if request.since is not None else None
+    search = partial(
+        flow_search,
+        dashfrog.async_db_engine,
+        timedelta(seconds=dashfrog.config.rollup_lag),
+        request.tenant,
+        flow_name=request.flow_name,
+        label_filters=request.labels,
+        since=since,
+    )
+    cache = get_flow_query_cache()
+    # Delta searches are specific to their client
+    if cache is None or since is not None:
+        watermark, flows = await search(request.start, request.end)
+    else:
+        key = ("search", request.tenant, request.flow_name, label_filters_key(request.labels))
+        edges_query = partial(window_edges_query, request.tenant, request.flow_name, request.labels)
+        watermark, flows = await cached_flow_query(
+            cache, key, request.start, request.end, edges_query, search, items=lambda result: len(result[1])
         )
-
-        return list(flow_generator(session, base_filters))
+    # The cursor is of the exact window, which the next search of the client has
+    response.headers[SEARCH_CURSOR_HEADER] = encode_search_cursor(watermark, request)
+    return flows
 
 
 class FlowHistoryResponse(BaseModel):
     """Response for getting flow history."""
 
     history: list[FlowHistory]
+    nextCursor: str | None = Field(None, description="Cursor of the next page, None on the last page")
+
+
+async def flow_history_items(
+    session: AsyncSession, runs_query: Select, request: FlowDetailRequest
+) -> AsyncIterator[FlowHistory | str]:
+    """Yield the runs of a history request, then the cursor of the next page if there is one."""
+    if request.limit is None:
+        async for flow_history in iter_flow_history(
+            session, runs_query, request.tenant, request.flow_name, request.start, request.end
+        ):
+            yield flow_history
+        return
+
+    # One more run than the page tells whether there is a next page
+    runs = (await session.execute(runs_query.limit(request.limit + 1))).all()
+    page = runs[: request.limit]
+    for flow_history in await history_page(
+        session, page, request.tenant, request.flow_name, request.start, request.end
+    ):
+        yield flow_history
+    if len(runs) > request.limit:
+        yield encode_history_cursor(page[-1].started_at, page[-1].flow_id, page[-1].flow_group_id)
+
+
+async def stream_flow_history(
+    engine: AsyncEngine, runs_query: Select, request: FlowDetailRequest
+) -> AsyncIterator[BaseModel | dict]:
+    """NDJSON lines of a history request, read from their own session as the response is streamed."""
+    async with AsyncSession(engine) as session:
+        async for item in flow_history_items(session, runs_query, request):
+            yield {"nextCursor": item} if isinstance(item, str) else item
+
+
+async def flow_history(engine: AsyncEngine, runs_query: Select, request: FlowDetailRequest) -> FlowHistoryResponse:
+    """History of a request, read from its own session."""
+    history: list[FlowHistory] = []
+    next_cursor = None
+    async with AsyncSession(engine) as session:
+        async for item in flow_history_items(session, runs_query, request):
+            if isinstance(item, str):
+                next_cursor = item
+            else:
+                history.append(item)
+    return FlowHistoryResponse(history=history, nextCursor=next_cursor)
 
 
 @router.post("/history", response_model=FlowHistoryResponse)
 async def get_flow_history(
-    request: FlowDetailRequest, credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(security)] = None
-) -> FlowHistoryResponse:
+    request: FlowDetailRequest,
+    credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(security)] = None,
+    accept: Annotated[str | None, Header()] = None,
+) -> FlowHistoryResponse | StreamingResponse:
     """Get detailed flow information with run history.
 
+    Runs are returned latest first. With `limit`, they are paginated: pass the response's
+    `nextCursor` as `after` to get the next page.
+
+    With `Accept: application/x-ndjson`, runs are streamed one per line as they are read, and
+    when there is a next page, the last line is `{"nextCursor": ...}`.
+
     Args:
-        request: Request containing flow name, datetime range, and optional label filters
+        request: Request containing flow name, datetime range, and optional label filters and pagination
 
     Example request body:
         {
@@ -264,186 +757,143 @@ async def get_flow_history(
             "end": "2024-01-31T23:59:59Z",
             "labels": [
                 {"label": "environment", "value": "production"}
-            ]
+            ],
+            "limit": 100
         }
     """
     dashfrog = get_dashfrog_instance()
+    notebook = await get_notebook(request.notebook_id)
+    verify_has_access_to_notebook(
+        credentials,
+        notebook,
+        request.tenant,
+        request.start,
+        request.end,
+        flow_filter=BlockFilters(names=[request.flow_name], filters=request.labels),
+    )
 
-    # Build base filter conditions (time range + labels + flow name)
-    base_filters = [
-        FlowEvent.event_dt >= request.start,
-        FlowEvent.event_dt <= request.end,
-        FlowEvent.flow_metadata["flow_name"].astext == request.flow_name,
-        FlowEvent.tenant == request.tenant,
-    ]
-
-    # Add label filters
-    for label_filter in request.labels:
-        # either label key is not in the list or the value matches
-        base_filters.append(
-            or_(
-                FlowEvent.labels[label_filter.label].astext == label_filter.value,
-                FlowEvent.labels[label_filter.label].is_(None),
-            )
+    after = decode_history_cursor(request.after) if request.after else None
+    cache = get_flow_query_cache()
+    # Streamed histories are too large to be worth caching
+    if cache is None or accepts_ndjson(accept):
+        runs_query = history_runs_query(
+            request.tenant, request.flow_name, request.start, request.end, request.labels, after
+        )
+        if accepts_ndjson(accept):
+            return ndjson_response(stream_flow_history(dashfrog.async_db_engine, runs_query, request))
+        return await flow_history(dashfrog.async_db_engine, runs_query, request)
+
+    async def history(start: datetime, end: datetime) -> FlowHistoryResponse:
+        runs_query = history_runs_query(request.tenant, request.flow_name, start, end, request.labels, after)
+        return await flow_history(
+            dashfrog.async_db_engine, runs_query, request.model_copy(update={"start": start, "end": end})
         )
 
-    # Get all flow runs with their events
+    key = (
+        "history",
+        request.tenant,
+        request.flow_name,
+        label_filters_key(request.labels),
+        request.limit,
+        request.after,
+    )
+    # Histories also hold the events of their runs in the window
+    edges_query = partial(window_edges_query, request.tenant, request.flow_name, request.labels, events=True)
+    return await cached_flow_query(
+        cache, key, request.start, request.end, edges_query, history, items=lambda result: len(result.history)
+    )
 
-    with Session(dashfrog.db_engine) as session:
-        try:
-            notebook = session.execute(select(Notebook).where(Notebook.id == request.notebook_id)).scalar_one()
-        except NoResultFound:
-            raise HTTPException(status_code=404, detail=f"Notebook {request.notebook_id} not found")
-        verify_has_access_to_notebook(
-            credentials,
-            notebook,
-            request.tenant,
-            request.start,
-            request.end,
-            flow_filter=BlockFilters(names=[request.flow_name], filters=request.labels),
-        )
 
-        history_query = (
-            select(FlowEvent).where(and_(*base_filters)).order_by(FlowEvent.flow_id, FlowEvent.event_dt.asc())
-        )
-        # Get all events grouped by flow_id
-        history_result = session.execute(history_query).scalars()
-
-        flow_histories: list[FlowHistory] = []
-        for (flow_id, group_id), events_iter in groupby(history_result, key=lambda e: (e.flow_id, e.group_id)):
-            events_list = list(events_iter)
-
-            # Find start and end times
-            try:
-                start_event = next(e for e in events_list if e.event_name == EVENT_FLOW_START)
-            except StopIteration:
-                continue
-
-            end_event = next(
-                (e for e in events_list if e.event_name in [EVENT_FLOW_SUCCESS, EVENT_FLOW_FAIL]),
-                None,
-            )
+class FlowStreamRequest(BaseModel):
+    """Request body for streaming flow run changes."""
 
-            # Determine status
-            if end_event:
-                status = "success" if end_event.event_name == EVENT_FLOW_SUCCESS else "failure"
-                end_time = end_event.event_dt
+    notebook_id: UUID
+    flow_name: str | None = Field(None, description="Name of the flow to stream the runs of, all flows if not set")
+    labels: list[LabelFilter] = Field(default_factory=list, description="Label filters as key-value pairs")
+    tenant: str = Field(..., description="Tenant of the flow runs")
+
+
+async def flow_run_events(request: FlowStreamRequest) -> AsyncIterator[bytes]:
+    """Server-sent events of the run changes matching a stream request, until the client disconnects."""
+    feed = get_flow_run_feed()
+    assert feed is not None
+    async with feed.subscribe(
+        request.tenant, request.flow_name, request.labels, idle=STREAM_KEEPALIVE_INTERVAL
+    ) as changes:
+        async for item in changes:
+            if isinstance(item, Resync):
+                yield sse_event("resync", {})
+            elif item:
+                yield sse_event("runs", item)
             else:
-                status = "running"
-                end_time = None
-
-            # Build events list
-            history_events = [
-                FlowHistoryEvent(
-                    eventName=e.event_name,
-                    eventDt=e.event_dt,
-                )
-                for e in events_list
-                if e.event_name
-                not in (
-                    EVENT_FLOW_START,
-                    EVENT_FLOW_SUCCESS,
-                    EVENT_FLOW_FAIL,
-                    EVENT_STEP_START,
-                    EVENT_STEP_SUCCESS,
-                    EVENT_STEP_FAIL,
-                )
-            ]
+                yield SSE_KEEPALIVE
 
-            # Build steps list from step events
-            step_events = [e for e in events_list if e.event_name.startswith("step_")]
-            steps: list[FlowHistoryStep] = []
-
-            # Group step events by step_name
-            for step_name, step_events_iter in groupby(
-                step_events, key=lambda e: e.flow_metadata.get(BAGGAGE_STEP_LABEL_NAME, "")
-            ):
-                if not step_name:
-                    continue
-
-                step_events_list = list(step_events_iter)
-                try:
-                    step_start = next(e for e in step_events_list if e.event_name == EVENT_STEP_START)
-                except StopIteration:
-                    continue
-
-                step_end = next(
-                    (e for e in step_events_list if e.event_name in [EVENT_STEP_SUCCESS, EVENT_STEP_FAIL]),
-                    None,
-                )
 
-                step_status, step_end_time = "running", None
-                if step_end:
-                    step_status = "success" if step_end.event_name == EVENT_STEP_SUCCESS else "failure"
-                    step_end_time = step_end.event_dt
-
-                steps.append(
-                    FlowHistoryStep(
-                        name=step_name,
-                        startTime=step_start.event_dt,
-                        endTime=step_end_time,
-                        status=step_status,
-                    )
-                )
+@router.post("/stream")
+async def stream_flows(
+    request: FlowStreamRequest, credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(security)] = None
+) -> StreamingResponse:
+    """Stream the changes of the flow runs matching a tenant, flow and labels, as server-sent events.
 
-            flow_histories.append(
-                FlowHistory(
-                    flowId=flow_id,
-                    groupId=group_id,
-                    startTime=start_event.event_dt,
-                    endTime=end_time,
-                    status=status,
-                    events=history_events,
-                    steps=steps,
-                    labels=start_event.labels,
-                )
-            )
+    Each `runs` event holds the runs started or ended by an ingestion batch, as they are after it,
+    for the client to apply to the results of `/search` and `/history`. A `resync` event tells that
+    changes may have been missed, and that the client has to search again. Open the stream before
+    searching, so that no change falls in between.
 
-        return FlowHistoryResponse(history=sorted(flow_histories, key=lambda x: x.startTime, reverse=True))
+    Example request body:
+        {
+            "tenant": "acme-corp",
+            "notebook_id": "123e4567-e89b-12d3-a456-426614174000",
+            "flow_name": "process_order",
+            "labels": [
+                {"label": "environment", "value": "production"}
+            ]
+        }
+    """
+    if get_flow_run_feed() is None:
+        raise HTTPException(status_code=503, detail="Flow run notifications are disabled or not listened to")
+
+    notebook = await get_notebook(request.notebook_id)
+    now = datetime.now(timezone.utc)
+    verify_has_access_to_notebook(
+        credentials,
+        notebook,
+        request.tenant,
+        now,
+        now,
+        flow_filter=BlockFilters(
+            names=[] if request.flow_name is None else [request.flow_name], filters=request.labels
+        ),
+    )
+    return sse_response(flow_run_events(request))
 
 
 @router.get("/labels", response_model=list[Label])
 async def get_all_flow_labels(auth: Annotated[None, Depends(verify_token)]) -> list[Label]:
-    """Fetch all flow labels and their values from the database."""
-    from sqlalchemy import text
-
+    """Fetch the flow labels and their values seen recently, from the dictionary maintained at ingestion."""
     dashfrog = get_dashfrog_instance()
-
-    with dashfrog.db_engine.connect() as conn:
-        query = text("""
-            SELECT kv.key AS label_key,
-                kv.value AS label_value
-            FROM flow_event,
-                LATERAL jsonb_each_text(labels) AS kv(key, value)
-            WHERE event_name = :event_name
-            AND event_dt >= :threshold_dt
-            GROUP BY kv.key, kv.value
-            ORDER BY kv.key
-        """)
-        result = groupby(
-            conn.execute(
-                query,
-                {
-                    "event_name": EVENT_FLOW_START,
-                    "threshold_dt": datetime.now() - timedelta(days=DEFAULT_THRESHOLD_DAYS),
-                },
-            ).fetchall(),
-            key=lambda x: x[0],
+    async with AsyncSession(dashfrog.async_db_engine) as session:
+        rows = await session.execute(
+            select(FlowLabelValue.key, FlowLabelValue.value)
+            .where(FlowLabelValue.last_seen >= datetime.now() - timedelta(days=DEFAULT_THRESHOLD_DAYS))
+            .distinct()
+            .order_by(FlowLabelValue.key, FlowLabelValue.value)
         )
-        return [Label(label=label, values=sorted(v[1] for v in values)) for label, values in result]
+        return [
+            Label(label=label, values=[value for _, value in values])
+            for label, values in groupby(rows.all(), key=lambda row: row.key)
+        ]
 
 
 @router.get("/tenants", response_model=list[str])
 async def get_all_flow_tenants(auth: Annotated[None, Depends(verify_token)]) -> list[str]:
-    """Fetch all flow tenants from the database."""
+    """Fetch the flow tenants seen recently, from the dictionary maintained at ingestion."""
     dashfrog = get_dashfrog_instance()
-    with Session(dashfrog.db_engine) as session:
+    async with AsyncSession(dashfrog.async_db_engine) as session:
         return list(
-            session.execute(
-                select(FlowEvent.tenant.distinct()).where(
-                    FlowEvent.event_dt >= datetime.now() - timedelta(days=DEFAULT_THRESHOLD_DAYS)
-                )
-            ).scalars()
+            await session.scalars(
+                select(Tenant.name).where(Tenant.last_seen >= datetime.now() - timedelta(days=DEFAULT_THRESHOLD_DAYS))
+            )
         )
 
 
@@ -454,10 +904,16 @@ class FlowStaticResponse(BaseModel):
     labels: list[str]
 
 
+@router.get("/cache", response_model=CacheStats)
+async def get_flow_query_cache_stats(auth: Annotated[None, Depends(verify_token)]) -> CacheStats:
+    """Hit, miss and coalesced query counters of the cache of flow searches and histories."""
+    cache = get_flow_query_cache()
+    if cache is None:
+        raise HTTPException(status_code=404, detail="The flow query cache is disabled")
+    return cache.stats()
+
+
 @router.get("/", response_model=list[FlowStaticResponse])
 async def get_all_flows(auth: Annotated[None, Depends(verify_token)]) -> list[FlowStaticResponse]:
-    """Fetch all flows from the database."""
-    dashfrog = get_dashfrog_instance()
-    with Session(dashfrog.db_engine) as session:
-        flows = session.execute(select(Flow).order_by(Flow.name)).scalars()
-        return [FlowStaticResponse(name=flow.name, labels=flow.labels) for flow in flows]
+    """Fetch all flows, from the catalog."""
+    return [FlowStaticResponse(name=flow.name, labels=flow.labels) for flow in await get_catalog().flows()]
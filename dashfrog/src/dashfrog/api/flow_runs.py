@@ -0,0 +1,201 @@
+"""Live feed of the flow runs changed at ingestion, from their Postgres notifications."""
+
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from datetime import datetime
+import json
+from logging import exception
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dashfrog import get_dashfrog_instance
+from dashfrog.constants import FLOW_RUN_CHANNEL
+from dashfrog.models import FlowGroup, LabelSet
+
+from .filters import labels_match
+from .notifications import NotificationHub, get_notification_hub
+from .schemas import FlowRunChange, LabelFilter
+
+# Changes queued for a subscriber that doesn't keep up, before it has to resync
+SUBSCRIPTION_QUEUE_SIZE = 1000
+
+# Group ids and label sets known to the feed, cleared when they grow past `_KNOWN_KEYS_MAX`
+_KNOWN_KEYS_MAX = 100_000
+
+
+class Resync:
+    """Queued for a subscriber instead of changes that may have been missed."""
+
+
+RESYNC = Resync()
+
+
+class _RunNotification:
+    """A flow run of a notification, with its flow group and label set still dictionary-encoded."""
+
+    __slots__ = ("flow_id", "flow_group_id", "label_set_id", "tenant", "flow_name", "status", "started_at", "ended_at")
+
+    def __init__(self, run: list):
+        flow_id, self.flow_group_id, self.label_set_id, self.tenant, self.flow_name, self.status = run[:6]
+        self.flow_id = UUID(hex=flow_id)
+        self.started_at = datetime.fromisoformat(run[6]) if run[6] is not None else None
+        self.ended_at = datetime.fromisoformat(run[7]) if run[7] is not None else None
+
+
+class _Subscription:
+    def __init__(self, tenant: str, flow_name: str | None):
+        self.tenant = tenant
+        self.flow_name = flow_name
+        self.queue: asyncio.Queue[list[_RunNotification] | Resync] = asyncio.Queue(SUBSCRIPTION_QUEUE_SIZE)
+
+    def put(self, item: list[_RunNotification] | Resync) -> None:
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Drop what the subscriber didn't read yet, it has to resync anyway
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+
+class FlowRunFeed:
+    """
+    Fan the flow run notifications of the hub out to subscribers, filtered by tenant, flow and labels.
+
+    Notifications sent while the hub was disconnected are lost, so subscribers are told to resync
+    whenever it reconnects, as well as when they fall `SUBSCRIPTION_QUEUE_SIZE` notifications behind.
+    """
+
+    def __init__(self, hub: NotificationHub):
+        self.hub = hub
+        self._subscriptions: set[_Subscription] = set()
+        self._group_ids: dict[int, str] = {}
+        self._label_sets: dict[int, dict[str, str]] = {}
+        hub.subscribe(FLOW_RUN_CHANNEL, self._publish)
+        hub.on_connect(self._resync)
+
+    @asynccontextmanager
+    async def subscribe(
+        self,
+        tenant: str,
+        flow_name: str | None = None,
+        label_filters: list[LabelFilter] | None = None,
+        idle: float | None = None,
+    ) -> AsyncIterator[AsyncIterator[list[FlowRunChange] | Resync]]:
+        """
+        Changes of the runs matching the filters, in batches as they were notified, or `RESYNC`.
+
+        With `idle`, an empty batch is yielded after `idle` seconds without changes.
+        """
+        subscription = _Subscription(tenant, flow_name)
+        self._subscriptions.add(subscription)
+        try:
+            yield self._changes(subscription, label_filters or [], idle)
+        finally:
+            self._subscriptions.discard(subscription)
+
+    async def _changes(
+        self, subscription: _Subscription, label_filters: list[LabelFilter], idle: float | None
+    ) -> AsyncIterator[list[FlowRunChange] | Resync]:
+        while True:
+            try:
+                item = await asyncio.wait_for(subscription.queue.get(), idle)
+            except asyncio.TimeoutError:
+                yield []
+                continue
+            if isinstance(item, Resync):
+                yield item
+                continue
+
+            group_ids, label_sets = await self._resolve(item)
+            changes = [
+                FlowRunChange(
+                    flowId=str(run.flow_id.int),
+                    groupId=group_id,
+                    name=run.flow_name,
+                    labels=labels,
+                    status=run.status,
+                    startTime=run.started_at,
+                    endTime=run.ended_at,
+                )
+                for run in item
+                if (group_id := group_ids.get(run.flow_group_id)) is not None
+                and (labels := label_sets.get(run.label_set_id)) is not None
+                and labels_match(labels, label_filters)
+            ]
+            if changes:
+                yield changes
+
+    async def _resolve(self, runs: list[_RunNotification]) -> tuple[dict[int, str], dict[int, dict[str, str]]]:
+        """Group ids and label sets of `runs`, read from the database when not known yet, they never change."""
+        group_ids = {
+            run.flow_group_id: self._group_ids[run.flow_group_id]
+            for run in runs
+            if run.flow_group_id in self._group_ids
+        }
+        label_sets = {
+            run.label_set_id: self._label_sets[run.label_set_id] for run in runs if run.label_set_id in self._label_sets
+        }
+        missing_groups = {run.flow_group_id for run in runs} - group_ids.keys()
+        missing_label_sets = {run.label_set_id for run in runs} - label_sets.keys()
+        if not missing_groups and not missing_label_sets:
+            return group_ids, label_sets
+
+        async with AsyncSession(get_dashfrog_instance().async_db_engine) as session:
+            if missing_groups:
+                groups = await session.execute(
+                    select(FlowGroup.id, FlowGroup.group_id).where(FlowGroup.id.in_(missing_groups))
+                )
+                group_ids.update(groups.tuples())
+            if missing_label_sets:
+                rows = await session.execute(
+                    select(LabelSet.id, LabelSet.labels).where(LabelSet.id.in_(missing_label_sets))
+                )
+                label_sets.update(rows.tuples())
+
+        for known, resolved in ((self._group_ids, group_ids), (self._label_sets, label_sets)):
+            if len(known) + len(resolved) > _KNOWN_KEYS_MAX:
+                known.clear()
+            known.update(resolved)
+        return group_ids, label_sets
+
+    def _publish(self, payload: str) -> None:
+        try:
+            runs = [_RunNotification(run) for run in json.loads(payload)]
+        except (ValueError, TypeError):
+            exception("DashFrog received an invalid flow run notification")
+            return
+
+        for subscription in self._subscriptions:
+            matching = [
+                run
+                for run in runs
+                if run.tenant == subscription.tenant
+                and (subscription.flow_name is None or run.flow_name == subscription.flow_name)
+            ]
+            if matching:
+                subscription.put(matching)
+
+    def _resync(self) -> None:
+        for subscription in self._subscriptions:
+            subscription.put(RESYNC)
+
+
+_feed: FlowRunFeed | None = None
+
+
+def get_flow_run_feed() -> FlowRunFeed | None:
+    """
+    The flow run feed of the notification hub of the API server, None if it isn't listening, or if
+    flow run notifications are disabled.
+    """
+    global _feed
+    hub = get_notification_hub()
+    if hub is None or not get_dashfrog_instance().config.flow_run_notifications:
+        return None
+    if _feed is None or _feed.hub is not hub:
+        _feed = FlowRunFeed(hub)
+    return _feed
@@ -0,0 +1,123 @@
+"""In-memory catalog of the metric labels and their values, refreshed in the background."""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from logging import exception
+import time
+
+from dashfrog import get_dashfrog_instance
+from dashfrog.config import Config
+
+from .catalog import get_catalog
+from .prometheus import PrometheusClient, get_prometheus_client
+from .schemas import Label
+
+
+async def fetch_label_values(
+    client: PrometheusClient, metric_labels: dict[str, list[str]], start: datetime | None = None
+) -> list[Label]:
+    """
+    Values of the registered labels, in the series of the metrics registering them since `start`.
+
+    Each label's values are asked to Prometheus separately and concurrently, restricted to its metrics.
+    """
+    metrics_by_label: dict[str, set[str]] = {}
+    for name, labels in metric_labels.items():
+        for label in [*labels, "tenant"]:
+            metrics_by_label.setdefault(label, set()).add(name)
+
+    labels = sorted(metrics_by_label)
+    values = await asyncio.gather(
+        *(
+            client.label_values(label, [f"dashfrog_{name}" for name in sorted(metrics_by_label[label])], start)
+            for label in labels
+        )
+    )
+    return [Label(label=label, values=sorted(label_values)) for label, label_values in zip(labels, values)]
+
+
+class MetricLabelCatalog:
+    """
+    Metric labels and their values, refreshed every `interval` seconds.
+
+    Once started, an asyncio task refreshes the catalog and reads answer from memory. Otherwise, reads
+    refresh it when it is older than `interval`. With `lookback`, only the values of series seen during
+    the last `lookback` are kept.
+    """
+
+    def __init__(self, interval: float = 60.0, lookback: timedelta | None = None):
+        self.interval = interval
+        self.lookback = lookback
+        self._labels: list[Label] | None = None
+        self._refreshed_at = 0.0
+        self._task: asyncio.Task | None = None
+
+    @classmethod
+    def from_config(cls, config: Config) -> "MetricLabelCatalog":
+        lookback = config.metric_label_lookback
+        return cls(
+            interval=config.metric_label_refresh_interval,
+            lookback=timedelta(seconds=lookback) if lookback is not None else None,
+        )
+
+    async def labels(self) -> list[Label]:
+        """The catalog, refreshed first if it is empty, or stale and not refreshed in the background."""
+        stale = self._task is None and time.monotonic() - self._refreshed_at >= self.interval
+        if self._labels is None or stale:
+            await self.refresh()
+        assert self._labels is not None
+        return self._labels
+
+    async def refresh(self) -> None:
+        metric_labels = {name: metric.labels for name, metric in (await get_catalog().metrics()).items()}
+        start = datetime.now(timezone.utc) - self.lookback if self.lookback is not None else None
+        self._labels = await fetch_label_values(get_prometheus_client(), metric_labels, start)
+        self._refreshed_at = time.monotonic()
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="dashfrog-metric-label-catalog")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                exception("DashFrog failed to refresh the metric label catalog")
+            await asyncio.sleep(self.interval)
+
+
+_catalog: MetricLabelCatalog | None = None
+
+
+def open_label_catalog(config: Config) -> MetricLabelCatalog:
+    """Create the shared label catalog, refreshed in the background unless its interval is 0."""
+    global _catalog
+    _catalog = MetricLabelCatalog.from_config(config)
+    if _catalog.interval > 0:
+        _catalog.start()
+    return _catalog
+
+
+async def close_label_catalog() -> None:
+    """Stop refreshing the shared label catalog."""
+    global _catalog
+    if _catalog is not None:
+        await _catalog.stop()
+        _catalog = None
+
+
+def get_label_catalog() -> MetricLabelCatalog:
+    """The shared label catalog, refreshed on read if the API server didn't open it."""
+    global _catalog
+    if _catalog is None:
+        _catalog = MetricLabelCatalog.from_config(get_dashfrog_instance().config)
+    return _catalog
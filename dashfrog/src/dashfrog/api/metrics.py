@@ -1,15 +1,17 @@
 """Metrics API routes."""
 
+from collections.abc import Iterator
 from datetime import datetime
+from itertools import chain
 from typing import Annotated, Any, Literal
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials
 from pydantic import BaseModel
-import requests
 from sqlalchemy import select
 from sqlalchemy.exc import NoResultFound
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from dashfrog import get_dashfrog_instance
 from dashfrog.models import (
@@ -18,6 +20,11 @@ from dashfrog.models import (
 )
 
 from .auth import security, verify_has_access_to_notebook, verify_token, verify_token_string
+from .catalog import get_catalog
+from .label_catalog import get_label_catalog
+from .ndjson import accepts_ndjson, ndjson_response
+from .prometheus import get_prometheus_client
+from .query_frontend import get_range_query_frontend
 from .schemas import (
     BlockFilters,
     DataPoint,
@@ -108,88 +115,92 @@ async def search_metrics(auth: Annotated[None, Depends(verify_token)]) -> list[M
     Returns only metrics that have ALL the specified labels.
     If labels is empty, returns all metrics.
     """
-    dashfrog = get_dashfrog_instance()
     metrics: list[MetricResponse] = []
 
-    with Session(dashfrog.db_engine) as session:
-        result = session.execute(select(MetricModel)).scalars()
-
-        for metric in result:
-            if metric.type == "counter":
-                # Rates
-                metrics.append(
-                    MetricResponse(
-                        id=metric.name,
-                        prometheusName=metric.name,
-                        prettyName=f"{metric.pretty_name} rate",
-                        type="rate",
-                        unit=metric.unit,
-                        labels=metric.labels,
-                        groupBy=["sum"],
-                        timeAggregation=["avg", "min", "max"],
-                    )
+    for metric in (await get_catalog().metrics()).values():
+        if metric.type == "counter":
+            # Rates
+            metrics.append(
+                MetricResponse(
+                    id=metric.name,
+                    prometheusName=metric.name,
+                    prettyName=f"{metric.pretty_name} rate",
+                    type="rate",
+                    unit=metric.unit,
+                    labels=metric.labels,
+                    groupBy=["sum"],
+                    timeAggregation=["avg", "min", "max"],
                 )
-                # Increase
-                metrics.append(
-                    MetricResponse(
-                        id=f"{metric.name}-increase",
-                        prometheusName=metric.name,
-                        prettyName=f"{metric.pretty_name} increase",
-                        type="increase",
-                        unit=metric.unit,
-                        labels=metric.labels,
-                        groupBy=["sum"],
-                        timeAggregation=["last"],
-                    )
+            )
+            # Increase
+            metrics.append(
+                MetricResponse(
+                    id=f"{metric.name}-increase",
+                    prometheusName=metric.name,
+                    prettyName=f"{metric.pretty_name} increase",
+                    type="increase",
+                    unit=metric.unit,
+                    labels=metric.labels,
+                    groupBy=["sum"],
+                    timeAggregation=["last"],
                 )
-                # Ratio
-                metrics.append(
-                    MetricResponse(
-                        id=f"{metric.name}-ratio",
-                        prometheusName=metric.name,
-                        prettyName=f"{metric.pretty_name} % ratio",
-                        type="ratio",
-                        unit="percent",
-                        labels=metric.labels,
-                        groupBy=["sum"],
-                        timeAggregation=["avg", "min", "max"],
-                    )
+            )
+            # Ratio
+            metrics.append(
+                MetricResponse(
+                    id=f"{metric.name}-ratio",
+                    prometheusName=metric.name,
+                    prettyName=f"{metric.pretty_name} % ratio",
+                    type="ratio",
+                    unit="percent",
+                    labels=metric.labels,
+                    groupBy=["sum"],
+                    timeAggregation=["avg", "min", "max"],
                 )
+            )
 
-            elif metric.type == "histogram":
-                metrics.append(
-                    MetricResponse(
-                        id=metric.name,
-                        prometheusName=metric.name,
-                        prettyName=f"{metric.pretty_name} percentile",
-                        type="histogram",
-                        unit=metric.unit,
-                        labels=metric.labels,
-                        groupBy=["sum"],
-                        timeAggregation=["last"],
-                    )
+        elif metric.type == "histogram":
+            metrics.append(
+                MetricResponse(
+                    id=metric.name,
+                    prometheusName=metric.name,
+                    prettyName=f"{metric.pretty_name} percentile",
+                    type="histogram",
+                    unit=metric.unit,
+                    labels=metric.labels,
+                    groupBy=["sum"],
+                    timeAggregation=["last"],
                 )
+            )
 
-            else:
-                metrics.append(
-                    MetricResponse(
-                        id=metric.name,
-                        prometheusName=metric.name,
-                        prettyName=metric.pretty_name,
-                        type="gauge",
-                        unit=metric.unit,
-                        labels=metric.labels,
-                        groupBy=[
-                            "avg",
-                            "min",
-                            "max",
-                            "sum",
-                        ],
-                        timeAggregation=["avg", "min", "max"],
-                    )
+        else:
+            metrics.append(
+                MetricResponse(
+                    id=metric.name,
+                    prometheusName=metric.name,
+                    prettyName=metric.pretty_name,
+                    type="gauge",
+                    unit=metric.unit,
+                    labels=metric.labels,
+                    groupBy=[
+                        "avg",
+                        "min",
+                        "max",
+                        "sum",
+                    ],
+                    timeAggregation=["avg", "min", "max"],
                 )
+            )
+
+    return metrics
 
-        return metrics
+
+async def get_metric(name: str) -> MetricModel:
+    """Registered metric, from the catalog."""
+    metric = (await get_catalog().metrics()).get(name)
+    if metric is None:
+        raise HTTPException(status_code=404, detail=f"Metric {name} not found")
+    return metric
 
 
 def get_range_metric_promql(
@@ -258,9 +269,10 @@ def get_instant_metric_promql(
 
 
 def get_metric_name(metric: MetricModel, labels: list[LabelFilter]) -> str:
-    label_filters = [
+    # Sorted, so that equivalent label filters give the same PromQL
+    label_filters = sorted(
         f'{label.label}="{label.value}"' for label in labels if label.label in set(metric.labels) | {"tenant"}
-    ]
+    )
     return f"dashfrog_{metric.name}" if not labels else f"dashfrog_{metric.name}{{{','.join(label_filters)}}}"
 
 
@@ -288,6 +300,38 @@ class InstantResponse(BaseModel):
     scalars: list[InstantMetric]
 
 
+def instant_promql(request: InstantMetricRequest, metric: MetricModel) -> str:
+    """PromQL of an instant metric request."""
+    return get_instant_metric_promql(
+        metric,
+        request.transform,
+        request.transform_metadata,
+        request.time_aggregation,
+        request.group_by,
+        request.group_fn,
+        request.match_operator,
+        request.match_value,
+        request.start_time,
+        request.end_time,
+        request.labels,
+    )
+
+
+def instant_response(request: InstantMetricRequest, metric: MetricModel, result: list[dict]) -> InstantResponse:
+    """Response of an instant metric request, from the result of its Prometheus query."""
+    return InstantResponse(
+        type=metric.type,
+        unit=metric.unit if request.transform != "ratio" else "percent",
+        prettyName=metric.pretty_name,
+        transform=request.transform,
+        scalars=[
+            InstantMetric(labels=item["metric"], value=float(item["value"][1]))
+            for item in result
+            if item["value"][1] != "NaN"
+        ],
+    )
+
+
 @router.post("/instant", response_model=InstantResponse)
 async def get_instant_metric(
     request: InstantMetricRequest, credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(security)] = None
@@ -315,15 +359,10 @@ async def get_instant_metric(
     """
     dashfrog = get_dashfrog_instance()
 
-    # Fetch metric from database
-    with Session(dashfrog.db_engine) as session:
+    metric = await get_metric(request.metric_name)
+    async with AsyncSession(dashfrog.async_db_engine) as session:
         try:
-            metric = session.execute(select(MetricModel).where(MetricModel.name == request.metric_name)).scalar_one()
-        except NoResultFound:
-            raise HTTPException(status_code=404, detail=f"Metric {request.metric_name} not found")
-
-        try:
-            notebook = session.execute(select(Notebook).where(Notebook.id == request.notebook_id)).scalar_one()
+            notebook = (await session.execute(select(Notebook).where(Notebook.id == request.notebook_id))).scalar_one()
         except NoResultFound:
             raise HTTPException(status_code=404, detail=f"Notebook {request.notebook_id} not found")
 
@@ -337,41 +376,9 @@ async def get_instant_metric(
             metric_filter=BlockFilters(names=[request.metric_name], filters=request.labels),
         )
 
-        # Generate PromQL query
-        promql = get_instant_metric_promql(
-            metric,
-            request.transform,
-            request.transform_metadata,
-            request.time_aggregation,
-            request.group_by,
-            request.group_fn,
-            request.match_operator,
-            request.match_value,
-            request.start_time,
-            request.end_time,
-            request.labels,
-        )
-
-        response = requests.get(
-            f"{dashfrog.config.prometheus_endpoint}/api/v1/query",
-            params={"query": promql, "time": request.end_time.timestamp()},
-            timeout=5,
-        )
-
-        if response.status_code != 200:
-            raise HTTPException(status_code=502, detail="Prometheus query failed")
-
-        return InstantResponse(
-            type=metric.type,
-            unit=metric.unit if request.transform != "ratio" else "percent",
-            prettyName=metric.pretty_name,
-            transform=request.transform,
-            scalars=[
-                InstantMetric(labels=item["metric"], value=float(item["value"][1]))
-                for item in response.json()["data"]["result"]
-                if item["value"][1] != "NaN"
-            ],
-        )
+    # Query Prometheus once the database connection is released
+    result = await get_prometheus_client().query(instant_promql(request, metric), request.end_time)
+    return instant_response(request, metric, result)
 
 
 class RangeResponse(BaseModel):
@@ -381,14 +388,60 @@ class RangeResponse(BaseModel):
     series: list[RangeMetric]
 
 
+def range_promql(request: RangeMetricRequest, metric: MetricModel) -> str:
+    """PromQL of a range metric request."""
+    return get_range_metric_promql(
+        metric, request.transform, request.transform_metadata, request.labels, request.group_by, request.group_fn
+    )
+
+
+async def query_range(request: RangeMetricRequest, promql: str) -> list[dict]:
+    """Result of the Prometheus range query of a request, through the range query frontend."""
+    return await get_range_query_frontend().query_range(
+        get_prometheus_client(),
+        promql,
+        request.start_time,
+        request.end_time,
+        get_range_resolution(request.start_time, request.end_time),
+    )
+
+
+def range_response(request: RangeMetricRequest, metric: MetricModel, prom_data: list[dict]) -> RangeResponse:
+    """Response of a range metric request, from the result of its Prometheus query."""
+    return RangeResponse(
+        unit=metric.unit if request.transform != "ratio" else "percent",
+        transform=request.transform,
+        prettyName=metric.pretty_name,
+        series=list(range_series(metric, prom_data)),
+    )
+
+
+def range_series(metric: MetricModel, prom_data: list[dict]) -> Iterator[RangeMetric]:
+    """Build the series of a Prometheus range query result one at a time."""
+    for item in prom_data:
+        yield RangeMetric(
+            labels={label: item["metric"][label] for label in metric.labels if label in item["metric"]},
+            values=[
+                DataPoint(timestamp=timestamp, value=float(value))
+                for timestamp, value in item["values"]
+                if value != "NaN"
+            ],
+        )
+
+
 @router.post("/range", response_model=RangeResponse)
 async def get_range_metric(
-    request: RangeMetricRequest, credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(security)] = None
-) -> RangeResponse:
+    request: RangeMetricRequest,
+    credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(security)] = None,
+    accept: Annotated[str | None, Header()] = None,
+) -> RangeResponse | StreamingResponse:
     """Query Prometheus for range metric value.
 
     This endpoint generates a range query that returns the value over a time range.
 
+    With `Accept: application/x-ndjson`, the first line holds the unit, pretty name and transform,
+    and each following line one series, built as it is streamed.
+
     Args:
         request: Request containing metric name and label filters
 
@@ -405,21 +458,16 @@ async def get_range_metric(
     """
     dashfrog = get_dashfrog_instance()
 
-    # Fetch metric from database
-    with Session(dashfrog.db_engine) as session:
-        try:
-            metric = session.execute(select(MetricModel).where(MetricModel.name == request.metric_name)).scalar_one()
-        except NoResultFound:
-            raise HTTPException(status_code=404, detail=f"Metric {request.metric_name} not found")
-
+    metric = await get_metric(request.metric_name)
+    async with AsyncSession(dashfrog.async_db_engine) as session:
         # Generate PromQL query
-        promql = get_range_metric_promql(
-            metric, request.transform, request.transform_metadata, request.labels, request.group_by, request.group_fn
-        )
+        promql = range_promql(request, metric)
 
         if request.notebook_id is not None:
             try:
-                notebook = session.execute(select(Notebook).where(Notebook.id == request.notebook_id)).scalar_one()
+                notebook = (
+                    await session.execute(select(Notebook).where(Notebook.id == request.notebook_id))
+                ).scalar_one()
             except NoResultFound:
                 raise HTTPException(status_code=404, detail=f"Notebook {request.notebook_id} not found")
 
@@ -437,78 +485,17 @@ async def get_range_metric(
                 raise HTTPException(status_code=401, detail="Unauthorized")
             verify_token_string(credentials.credentials)
 
-        response = requests.get(
-            f"{dashfrog.config.prometheus_endpoint}/api/v1/query_range",
-            params={
-                "query": promql,
-                "start": request.start_time.timestamp(),
-                "end": request.end_time.timestamp(),
-                "step": get_range_resolution(request.start_time, request.end_time),
-            },
-            timeout=10,
-        )
+    # Query Prometheus once the database connection is released
+    prom_data = await query_range(request, promql)
+    if accepts_ndjson(accept):
+        unit = metric.unit if request.transform != "ratio" else "percent"
+        header = {"unit": unit, "prettyName": metric.pretty_name, "transform": request.transform}
+        return ndjson_response(chain([header], range_series(metric, prom_data)))
 
-        if response.status_code != 200:
-            raise HTTPException(status_code=502, detail="Prometheus query failed")
-
-        prom_data = response.json()["data"]["result"]
-        return RangeResponse(
-            unit=metric.unit if request.transform != "ratio" else "percent",
-            transform=request.transform,
-            prettyName=metric.pretty_name,
-            series=[
-                RangeMetric(
-                    labels={label: item["metric"][label] for label in metric.labels if label in item["metric"]},
-                    values=[
-                        DataPoint(timestamp=timestamp, value=float(value))
-                        for timestamp, value in item["values"]
-                        if value != "NaN"
-                    ],
-                )
-                for item in prom_data
-            ],
-        )
+    return range_response(request, metric, prom_data)
 
 
 @router.get("/labels", response_model=list[Label])
 async def get_all_metric_labels(auth: Annotated[None, Depends(verify_token)]) -> list[Label]:
-    """Fetch all labels and their values from Prometheus."""
-    dashfrog = get_dashfrog_instance()
-
-    # Step 1: Get registered labels from database
-    with dashfrog.db_engine.connect() as conn:
-        metrics = conn.execute(select(MetricModel)).fetchall()
-        metric_labels = {label for metric in metrics for label in metric.labels} | {"tenant"}
-        metric_names = {metric.name for metric in metrics}
-
-    if not metric_names:
-        return []
-
-    # Step 2: Fetch all series from Prometheus
-    try:
-        # Use POST with explicit metric names to avoid URL length limits
-        matchers = [("match[]", f"dashfrog_{name}") for name in sorted(metric_names)]
-
-        response = requests.post(
-            f"{dashfrog.config.prometheus_endpoint}/api/v1/series",
-            data=matchers,
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
-            timeout=10,
-        )
-
-        if response.status_code != 200:
-            raise HTTPException(status_code=502, detail="Prometheus query failed")
-
-        series_data = response.json()["data"]
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=502, detail=f"Failed to connect to Prometheus: {e}")
-
-    # Step 3: Extract label values for registered labels only
-    label_values = {label: set() for label in metric_labels}
-    for series in series_data:
-        for label in metric_labels:
-            if label in series:
-                label_values[label].add(series[label])
-
-    # Convert to sorted lists
-    return [Label(label=label, values=sorted(values)) for label, values in label_values.items()]
+    """Fetch all labels and their values, from the label catalog refreshed in the background."""
+    return await get_label_catalog().labels()
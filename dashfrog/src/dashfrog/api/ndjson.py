@@ -0,0 +1,37 @@
+"""Newline-delimited JSON responses, for clients sending `Accept: application/x-ndjson`."""
+
+from collections.abc import AsyncIterable, AsyncIterator, Iterable, Iterator
+from typing import Any
+
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def accepts_ndjson(accept: str | None) -> bool:
+    """Whether an `Accept` header asks for newline-delimited JSON."""
+    return accept is not None and any(
+        media_range.split(";")[0].strip() == NDJSON_MEDIA_TYPE for media_range in accept.split(",")
+    )
+
+
+def ndjson_response(items: Iterable[Any] | AsyncIterable[Any]) -> StreamingResponse:
+    """
+    Stream `items` (Pydantic models, or anything JSON serializable) one JSON document per line.
+
+    Items are only produced and serialized as the client reads them, so sync iterables may
+    block, Starlette iterates them in its thread pool. Async iterables are iterated on the event loop.
+    """
+    content = _aencode(items) if isinstance(items, AsyncIterable) else _encode(items)
+    return StreamingResponse(content, media_type=NDJSON_MEDIA_TYPE)
+
+
+def _encode(items: Iterable[Any]) -> Iterator[bytes]:
+    for item in items:
+        yield to_json(item) + b"\n"
+
+
+async def _aencode(items: AsyncIterable[Any]) -> AsyncIterator[bytes]:
+    async for item in items:
+        yield to_json(item) + b"\n"
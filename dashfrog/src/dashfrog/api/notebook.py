@@ -1,24 +1,54 @@
-from typing import Annotated
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from datetime import datetime
+from functools import partial
+from typing import Annotated, Any
 from uuid import UUID, uuid4
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials
+from pydantic import BaseModel, Field
 from sqlalchemy import delete, select
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from dashfrog.api.schemas import BlockFilters, CreateNotebookRequest, DuplicateNotebookRequest, SerializedNotebook
+from dashfrog.api.schemas import (
+    BlockFilters,
+    CreateNotebookRequest,
+    DuplicateNotebookRequest,
+    FlowResponse,
+    InstantMetricRequest,
+    LabelFilter,
+    RangeMetricRequest,
+    SerializedNotebook,
+)
 from dashfrog.dashfrog import get_dashfrog_instance
-from dashfrog.models import Notebook
+from dashfrog.models import (
+    Metric as MetricModel,
+    Notebook,
+)
 
-from .auth import security, verify_token, verify_token_string
+from .auth import security, verify_has_access_to_notebook, verify_token, verify_token_string
+from .filters import label_filters_key
+from .flow import FlowSearchRequest, flow_summaries
+from .metrics import (
+    InstantResponse,
+    RangeResponse,
+    get_metric,
+    instant_promql,
+    instant_response,
+    query_range,
+    range_promql,
+    range_response,
+)
+from .prometheus import get_prometheus_client
 
 router = APIRouter(prefix="/api/notebooks", tags=["notebooks"])
 
 
 @router.get("/list")
 async def get_notebooks(tenant: str, auth: Annotated[None, Depends(verify_token)]) -> list[SerializedNotebook]:
-    with Session(get_dashfrog_instance().db_engine) as session:
-        notebooks = session.execute(select(Notebook).where(Notebook.tenant == tenant)).scalars().all()
+    async with AsyncSession(get_dashfrog_instance().async_db_engine) as session:
+        notebooks = (await session.scalars(select(Notebook).where(Notebook.tenant == tenant))).all()
         return [
             SerializedNotebook(
                 id=notebook.id,
@@ -39,8 +69,8 @@ async def get_notebooks(tenant: str, auth: Annotated[None, Depends(verify_token)
 async def get_notebook(
     id: UUID, credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(security)] = None
 ) -> SerializedNotebook:
-    with Session(get_dashfrog_instance().db_engine) as session:
-        notebook = session.execute(select(Notebook).where(Notebook.id == id)).scalar_one()
+    async with AsyncSession(get_dashfrog_instance().async_db_engine) as session:
+        notebook = (await session.execute(select(Notebook).where(Notebook.id == id))).scalar_one()
 
         # If notebook is not public, verify authentication
         if not notebook.is_public:
@@ -68,8 +98,8 @@ async def get_notebook(
 
 @router.post("/{id}/update")
 async def update_notebook(id: UUID, request: SerializedNotebook, auth: Annotated[None, Depends(verify_token)]) -> None:
-    with Session(get_dashfrog_instance().db_engine) as session:
-        notebook = session.execute(select(Notebook).where(Notebook.id == id)).scalar_one()
+    async with AsyncSession(get_dashfrog_instance().async_db_engine) as session:
+        notebook = (await session.execute(select(Notebook).where(Notebook.id == id))).scalar_one()
         notebook.title = request.title
         notebook.description = request.description
         notebook.blocks = request.blocks
@@ -82,12 +112,12 @@ async def update_notebook(id: UUID, request: SerializedNotebook, auth: Annotated
         notebook.metric_blocks_filters = (
             [m.model_dump() for m in request.metricBlocksFilters] if request.metricBlocksFilters else None
         )
-        session.commit()
+        await session.commit()
 
 
 @router.post("/create")
 async def create_notebook(request: CreateNotebookRequest, auth: Annotated[None, Depends(verify_token)]) -> None:
-    with Session(get_dashfrog_instance().db_engine) as session:
+    async with AsyncSession(get_dashfrog_instance().async_db_engine) as session:
         notebook = Notebook(
             id=request.notebook.id,
             title=request.notebook.title,
@@ -96,14 +126,14 @@ async def create_notebook(request: CreateNotebookRequest, auth: Annotated[None,
             tenant=request.tenant,
         )
         session.add(notebook)
-        session.commit()
+        await session.commit()
 
 
 @router.delete("/{id}")
 async def delete_notebook(id: UUID, auth: Annotated[None, Depends(verify_token)]) -> None:
-    with Session(get_dashfrog_instance().db_engine) as session:
-        session.execute(delete(Notebook).where(Notebook.id == id))
-        session.commit()
+    async with AsyncSession(get_dashfrog_instance().async_db_engine) as session:
+        await session.execute(delete(Notebook).where(Notebook.id == id))
+        await session.commit()
 
 
 @router.post("/{id}/duplicate")
@@ -115,8 +145,8 @@ async def duplicate_notebook(
     Creates a copy of the notebook for each specified tenant with a new UUID.
     Returns the list of created notebooks.
     """
-    with Session(get_dashfrog_instance().db_engine) as session:
-        original = session.execute(select(Notebook).where(Notebook.id == id)).scalar_one_or_none()
+    async with AsyncSession(get_dashfrog_instance().async_db_engine) as session:
+        original = (await session.execute(select(Notebook).where(Notebook.id == id))).scalar_one_or_none()
         if original is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Notebook not found")
 
@@ -135,4 +165,184 @@ async def duplicate_notebook(
             )
             session.add(new_notebook)
 
-        session.commit()
+        await session.commit()
+
+
+class NotebookRenderRequest(BaseModel):
+    """Request body for rendering the blocks of a notebook, by block id."""
+
+    flows: dict[str, FlowSearchRequest] = Field(default_factory=dict, description="Flow search of each flow block")
+    instant: dict[str, InstantMetricRequest] = Field(
+        default_factory=dict, description="Instant metric query of each metric block"
+    )
+    range: dict[str, RangeMetricRequest] = Field(
+        default_factory=dict, description="Range metric query of each metric block"
+    )
+
+
+class NotebookRenderResponse(BaseModel):
+    """Response for rendering the blocks of a notebook, by block id."""
+
+    flows: dict[str, list[FlowResponse]]
+    instant: dict[str, InstantResponse]
+    range: dict[str, RangeResponse]
+    errors: dict[str, str] = Field(default_factory=dict, description="Error of each block that couldn't be rendered")
+
+
+def _metric_tenant(labels: list[LabelFilter]) -> str | None:
+    return next((label.value for label in labels if label.label == "tenant"), None)
+
+
+@router.post("/{id}/render", response_model=NotebookRenderResponse)
+async def render_notebook(
+    id: UUID,
+    request: NotebookRenderRequest,
+    credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(security)] = None,
+) -> NotebookRenderResponse:
+    """Render all the flow and metric blocks of a notebook at once.
+
+    Blocks are the bodies of `/api/flows/search`, `/api/metrics/instant` and `/api/metrics/range`,
+    keyed by block id. The notebook is read and the token verified once, identical sub-queries run
+    once, and the flow queries and Prometheus queries of all blocks run concurrently.
+
+    A block that can't be rendered, because it is out of the notebook's scope or its query failed,
+    gets its error in `errors` instead of failing the whole render.
+    """
+    dashfrog = get_dashfrog_instance()
+    async with AsyncSession(dashfrog.async_db_engine) as session:
+        notebook = (await session.execute(select(Notebook).where(Notebook.id == id))).scalar_one_or_none()
+    if notebook is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Notebook not found")
+
+    # Authenticated users can read every block, anonymous ones only the blocks in the scope of a public notebook
+    authenticated = False
+    if credentials is not None:
+        try:
+            verify_token_string(credentials.credentials)
+            authenticated = True
+        except HTTPException:
+            pass
+    if not authenticated and not notebook.is_public:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Authentication required for private notebooks",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    def authorize(
+        notebook_id: UUID | None,
+        tenant: str | None,
+        start: datetime,
+        end: datetime,
+        flow_filter: BlockFilters | None = None,
+        metric_filter: BlockFilters | None = None,
+    ) -> None:
+        if notebook_id is not None and notebook_id != id:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Block of notebook {notebook_id}")
+        if not authenticated:
+            assert notebook is not None
+            verify_has_access_to_notebook(
+                None, notebook, tenant or "", start, end, flow_filter=flow_filter, metric_filter=metric_filter
+            )
+
+    # Sub-queries by key, shared by the blocks asking for the same data
+    queries: dict[Hashable, Callable[[], Awaitable[Any]]] = {}
+    errors: dict[str, str] = {}
+    flow_blocks: dict[str, Hashable] = {}
+    instant_blocks: dict[str, tuple[Hashable, InstantMetricRequest, MetricModel]] = {}
+    range_blocks: dict[str, tuple[Hashable, RangeMetricRequest, MetricModel]] = {}
+
+    for block_id, flow_block in request.flows.items():
+        try:
+            names = [] if flow_block.flow_name is None else [flow_block.flow_name]
+            authorize(
+                flow_block.notebook_id,
+                flow_block.tenant,
+                flow_block.start,
+                flow_block.end,
+                flow_filter=BlockFilters(names=names, filters=flow_block.labels),
+            )
+        except HTTPException as e:
+            errors[block_id] = e.detail
+            continue
+        key = (
+            "flows",
+            flow_block.tenant,
+            flow_block.start,
+            flow_block.end,
+            flow_block.flow_name,
+            label_filters_key(flow_block.labels),
+        )
+        queries.setdefault(
+            key,
+            partial(
+                flow_summaries,
+                dashfrog.async_db_engine,
+                flow_block.tenant,
+                flow_block.start,
+                flow_block.end,
+                flow_block.flow_name,
+                flow_block.labels,
+            ),
+        )
+        flow_blocks[block_id] = key
+
+    for block_id, instant_block in request.instant.items():
+        try:
+            metric = await get_metric(instant_block.metric_name)
+            authorize(
+                instant_block.notebook_id,
+                _metric_tenant(instant_block.labels),
+                instant_block.start_time,
+                instant_block.end_time,
+                metric_filter=BlockFilters(names=[instant_block.metric_name], filters=instant_block.labels),
+            )
+        except HTTPException as e:
+            errors[block_id] = e.detail
+            continue
+        promql = instant_promql(instant_block, metric)
+        key = ("instant", promql, instant_block.end_time)
+        queries.setdefault(key, partial(get_prometheus_client().query, promql, instant_block.end_time))
+        instant_blocks[block_id] = (key, instant_block, metric)
+
+    for block_id, range_block in request.range.items():
+        try:
+            metric = await get_metric(range_block.metric_name)
+            authorize(
+                range_block.notebook_id,
+                _metric_tenant(range_block.labels),
+                range_block.start_time,
+                range_block.end_time,
+                metric_filter=BlockFilters(names=[range_block.metric_name], filters=range_block.labels),
+            )
+        except HTTPException as e:
+            errors[block_id] = e.detail
+            continue
+        promql = range_promql(range_block, metric)
+        key = ("range", promql, range_block.start_time, range_block.end_time)
+        queries.setdefault(key, partial(query_range, range_block, promql))
+        range_blocks[block_id] = (key, range_block, metric)
+
+    # Run every distinct sub-query once, all at the same time
+    results = dict(zip(queries, await asyncio.gather(*(query() for query in queries.values()), return_exceptions=True)))
+    for result in results.values():
+        if isinstance(result, BaseException) and not isinstance(result, HTTPException):
+            raise result
+
+    response = NotebookRenderResponse(flows={}, instant={}, range={}, errors=errors)
+    for block_id, key in flow_blocks.items():
+        if isinstance(result := results[key], HTTPException):
+            response.errors[block_id] = result.detail
+        else:
+            response.flows[block_id] = result
+    for block_id, (key, instant_block, metric) in instant_blocks.items():
+        if isinstance(result := results[key], HTTPException):
+            response.errors[block_id] = result.detail
+        else:
+            response.instant[block_id] = instant_response(instant_block, metric, result)
+    for block_id, (key, range_block, metric) in range_blocks.items():
+        if isinstance(result := results[key], HTTPException):
+            response.errors[block_id] = result.detail
+        else:
+            response.range[block_id] = range_response(range_block, metric, result)
+    return response
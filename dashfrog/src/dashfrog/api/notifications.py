@@ -0,0 +1,110 @@
+"""Postgres LISTEN/NOTIFY channels, dispatched to the subscribers of the API server."""
+
+import asyncio
+from collections.abc import Callable
+from logging import exception
+from typing import Any
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from dashfrog.constants import CATALOG_CHANNEL, FLOW_RUN_CHANNEL
+
+
+class NotificationHub:
+    """
+    Listen to Postgres notification `channels` on one connection, and call their subscribers with the payloads.
+
+    Notifications sent while the connection is down are lost: `on_connect` callbacks are called after every
+    (re)connection, so that subscribers can catch up.
+    """
+
+    def __init__(self, engine: AsyncEngine, channels: list[str], reconnect_delay: float = 5.0):
+        self.engine = engine
+        self.channels = channels
+        self.reconnect_delay = reconnect_delay
+        self.connected = False
+        self._subscribers: dict[str, list[Callable[[str], None]]] = {channel: [] for channel in channels}
+        self._connect_callbacks: list[Callable[[], None]] = []
+        self._task: asyncio.Task | None = None
+
+    def subscribe(self, channel: str, callback: Callable[[str], None]) -> Callable[[], None]:
+        """Call `callback` with the payload of every notification on `channel`, until the returned function is called."""
+        if channel not in self._subscribers:
+            raise ValueError(f"Notification channel {channel} is not listened to")
+        self._subscribers[channel].append(callback)
+        return lambda: self._subscribers[channel].remove(callback)
+
+    def on_connect(self, callback: Callable[[], None]) -> None:
+        self._connect_callbacks.append(callback)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="dashfrog-notification-hub")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._listen()
+            except Exception:
+                exception("DashFrog lost its Postgres notification connection")
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _listen(self) -> None:
+        async with self.engine.connect() as conn:
+            # LISTEN on the asyncpg connection, which calls back as notifications arrive
+            driver_connection = (await conn.get_raw_connection()).driver_connection
+            assert driver_connection is not None
+            closed = asyncio.Event()
+            driver_connection.add_termination_listener(lambda _: closed.set())
+            for channel in self.channels:
+                await driver_connection.add_listener(channel, self._dispatch)
+            try:
+                self.connected = True
+                for callback in self._connect_callbacks:
+                    callback()
+                await closed.wait()
+            finally:
+                self.connected = False
+                if not driver_connection.is_closed():
+                    # The connection goes back to the pool, stop listening on it
+                    for channel in self.channels:
+                        await driver_connection.remove_listener(channel, self._dispatch)
+
+    def _dispatch(self, connection: Any, pid: int, channel: str, payload: str) -> None:
+        for callback in list(self._subscribers[channel]):
+            try:
+                callback(payload)
+            except Exception:
+                exception("DashFrog failed to handle a notification on %s", channel)
+
+
+_hub: NotificationHub | None = None
+
+
+def open_notification_hub(engine: AsyncEngine) -> NotificationHub:
+    """Start listening to the DashFrog notification channels, when the API server starts."""
+    global _hub
+    _hub = NotificationHub(engine, [CATALOG_CHANNEL, FLOW_RUN_CHANNEL])
+    _hub.start()
+    return _hub
+
+
+async def close_notification_hub() -> None:
+    """Stop listening to notifications, when the API server stops."""
+    global _hub
+    if _hub is not None:
+        await _hub.stop()
+        _hub = None
+
+
+def get_notification_hub() -> NotificationHub | None:
+    """The notification hub of the API server, None if it isn't listening."""
+    return _hub
@@ -0,0 +1,140 @@
+"""Shared async HTTP client for the Prometheus API."""
+
+import asyncio
+from datetime import datetime
+from typing import Any
+from urllib.parse import quote
+
+from fastapi import HTTPException
+import httpx
+
+from dashfrog import get_dashfrog_instance
+from dashfrog.config import Config
+
+# Length of the `match[]` parameters of a label values request, which Prometheus only accepts as GET,
+# kept well below the URL length limits of servers and proxies
+LABEL_VALUES_MATCHERS_MAX_LENGTH = 4000
+
+
+class PrometheusClient:
+    """
+    Prometheus HTTP API client, sharing one connection pool between requests.
+
+    Connections are kept alive between queries, responses are gzip compressed, and at most
+    `max_connections` queries are in flight, others wait up to `timeout` for a connection.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        timeout: float = 10.0,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self._http = httpx.AsyncClient(
+            base_url=endpoint,
+            transport=transport,
+            headers={"Accept-Encoding": "gzip"},
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+
+    @classmethod
+    def from_config(cls, config: Config) -> "PrometheusClient":
+        return cls(
+            config.prometheus_endpoint,
+            timeout=config.prometheus_timeout,
+            max_connections=config.prometheus_max_connections,
+            max_keepalive_connections=config.prometheus_max_keepalive_connections,
+        )
+
+    async def query(self, promql: str, time: datetime) -> list[dict]:
+        """Result of an instant query."""
+        return await self._get("/api/v1/query", {"query": promql, "time": time.timestamp()})
+
+    async def query_range(self, promql: str, start: datetime, end: datetime, step: str) -> list[dict]:
+        """Result of a range query."""
+        return await self._get(
+            "/api/v1/query_range",
+            {"query": promql, "start": start.timestamp(), "end": end.timestamp(), "step": step},
+        )
+
+    async def label_values(self, label: str, matchers: list[str], start: datetime | None = None) -> list[str]:
+        """
+        Values of `label` in the series matching any of `matchers`, since `start` if given.
+
+        Matchers are sent in groups of at most `LABEL_VALUES_MATCHERS_MAX_LENGTH` encoded characters, one
+        request per group, and the values of the groups are merged.
+        """
+        groups = _matcher_groups(matchers)
+        values = await asyncio.gather(*(self._label_values(label, group, start) for group in groups))
+        if len(values) == 1:
+            return values[0]
+        return sorted(set().union(*values))
+
+    async def _label_values(self, label: str, matchers: list[str], start: datetime | None) -> list[str]:
+        params: dict[str, Any] = {"match[]": matchers}
+        if start is not None:
+            params["start"] = start.timestamp()
+        return await self._request("GET", f"/api/v1/label/{label}/values", params=params)
+
+    async def _get(self, path: str, params: dict[str, Any]) -> Any:
+        data = await self._request("GET", path, params=params)
+        return data["result"]
+
+    async def _request(self, method: str, path: str, **kwargs: Any) -> Any:
+        try:
+            response = await self._http.request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=502, detail=f"Failed to connect to Prometheus: {e}")
+        if response.status_code != 200:
+            raise HTTPException(status_code=502, detail="Prometheus query failed")
+        return response.json()["data"]
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+
+def _matcher_groups(matchers: list[str]) -> list[list[str]]:
+    """`matchers` split into groups whose `match[]` parameters fit `LABEL_VALUES_MATCHERS_MAX_LENGTH`."""
+    groups: list[list[str]] = [[]]
+    length = 0
+    for matcher in matchers:
+        matcher_length = len("&match%5B%5D=") + len(quote(matcher, safe=""))
+        if groups[-1] and length + matcher_length > LABEL_VALUES_MATCHERS_MAX_LENGTH:
+            groups.append([])
+            length = 0
+        groups[-1].append(matcher)
+        length += matcher_length
+    return groups
+
+
+_client: PrometheusClient | None = None
+
+
+def open_prometheus_client(config: Config) -> PrometheusClient:
+    """Create the shared Prometheus client, when the API server starts."""
+    global _client
+    _client = PrometheusClient.from_config(config)
+    return _client
+
+
+async def close_prometheus_client() -> None:
+    """Close the connections of the shared Prometheus client, when the API server stops."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_prometheus_client() -> PrometheusClient:
+    """The shared Prometheus client, created from the DashFrog config if the API server didn't open it."""
+    if _client is None:
+        return open_prometheus_client(get_dashfrog_instance().config)
+    return _client
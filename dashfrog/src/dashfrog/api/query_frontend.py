@@ -0,0 +1,156 @@
+"""
+Prometheus range query frontend: step-aligned, split into days, and cached.
+
+Range queries are aligned on their step and split on UTC days, queried concurrently. Days old enough
+not to change anymore are queried whole and cached, so that overlapping windows and refreshes only
+query Prometheus for the recent tail.
+"""
+
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import time
+
+from dashfrog import get_dashfrog_instance
+
+from .prometheus import PrometheusClient
+
+DAY_SECONDS = 86400
+
+_STEP_UNITS = {"s": 1, "m": 60, "h": 3600, "d": DAY_SECONDS}
+
+
+def step_seconds(step: str) -> int:
+    """Seconds of a Prometheus duration such as `15s`, `5m` or `1d`."""
+    return int(step[:-1]) * _STEP_UNITS[step[-1]]
+
+
+def canonical_promql(promql: str) -> str:
+    """PromQL with its whitespace normalized, so that equivalent queries share cache entries."""
+    return " ".join(promql.split())
+
+
+def merge_series(chunks: list[list[dict]]) -> list[dict]:
+    """
+    Merge the series of the chunks of a range query, matching them on their labels.
+
+    Samples are ordered by time, and samples of the same time in several chunks are kept once.
+    """
+    metrics: dict[tuple, dict] = {}
+    samples: dict[tuple, dict[float, list]] = {}
+    for chunk in chunks:
+        for series in chunk:
+            key = tuple(sorted(series["metric"].items()))
+            metrics.setdefault(key, series["metric"])
+            series_samples = samples.setdefault(key, {})
+            for value in series["values"]:
+                series_samples.setdefault(value[0], value)
+    return [
+        {"metric": metrics[key], "values": [series_samples[t] for t in sorted(series_samples)]}
+        for key, series_samples in samples.items()
+        if series_samples
+    ]
+
+
+def _slice(chunk: list[dict], start: float, end: float) -> list[dict]:
+    return [
+        {"metric": series["metric"], "values": [value for value in series["values"] if start <= value[0] <= end]}
+        for series in chunk
+    ]
+
+
+def _datetime(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, timezone.utc)
+
+
+class RangeQueryFrontend:
+    """
+    Range query frontend, caching the days that ended `cache_delay` ago.
+
+    Days missing from the cache are queried as shards, at most `max_concurrency` at once per range query.
+    The cache holds at most `cache_samples` samples, the least recently used days are evicted first.
+    """
+
+    def __init__(
+        self,
+        cache_samples: int = 1_000_000,
+        cache_delay: timedelta = timedelta(minutes=10),
+        max_concurrency: int = 4,
+    ):
+        self.cache_samples = cache_samples
+        self.cache_delay = cache_delay
+        self.max_concurrency = max_concurrency
+        self._days: OrderedDict[tuple[str, int, int], tuple[list[dict], int]] = OrderedDict()
+        self._samples = 0
+
+    async def query_range(
+        self,
+        client: PrometheusClient,
+        promql: str,
+        start: datetime,
+        end: datetime,
+        step: str,
+        now: datetime | None = None,
+    ) -> list[dict]:
+        """Result of a range query, with `start` and `end` aligned down on `step`."""
+        step_s = step_seconds(step)
+        start_ts = start.timestamp() // step_s * step_s
+        end_ts = max(end.timestamp() // step_s * step_s, start_ts)
+        immutable_before = (now.timestamp() if now is not None else time.time()) - self.cache_delay.total_seconds()
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def shard(day: int) -> list[dict]:
+            day_end = day + DAY_SECONDS - step_s
+            start_shard, end_shard = max(start_ts, day), min(end_ts, day_end)
+            if day_end <= immutable_before:
+                return _slice(await self._day(client, semaphore, promql, step, day), start_shard, end_shard)
+
+            # The recent tail may still change, only query its part of the window and don't cache it
+            async with semaphore:
+                return await client.query_range(promql, _datetime(start_shard), _datetime(end_shard), step)
+
+        first_day = int(start_ts // DAY_SECONDS * DAY_SECONDS)
+        days = range(first_day, int(end_ts) + 1, DAY_SECONDS)
+        return merge_series(await asyncio.gather(*(shard(day) for day in days)))
+
+    async def _day(
+        self, client: PrometheusClient, semaphore: asyncio.Semaphore, promql: str, step: str, day: int
+    ) -> list[dict]:
+        key = (canonical_promql(promql), step_seconds(step), day)
+        if key in self._days:
+            self._days.move_to_end(key)
+            return self._days[key][0]
+
+        async with semaphore:
+            chunk = await client.query_range(
+                promql, _datetime(day), _datetime(day + DAY_SECONDS - step_seconds(step)), step
+            )
+        self._store(key, chunk)
+        return chunk
+
+    def _store(self, key: tuple[str, int, int], chunk: list[dict]) -> None:
+        samples = sum(len(series["values"]) for series in chunk)
+        if samples > self.cache_samples or key in self._days:
+            return
+        self._days[key] = (chunk, samples)
+        self._samples += samples
+        while self._samples > self.cache_samples:
+            _, (_, evicted) = self._days.popitem(last=False)
+            self._samples -= evicted
+
+
+_frontend: RangeQueryFrontend | None = None
+
+
+def get_range_query_frontend() -> RangeQueryFrontend:
+    """The shared range query frontend of the API server."""
+    global _frontend
+    if _frontend is None:
+        config = get_dashfrog_instance().config
+        _frontend = RangeQueryFrontend(
+            cache_samples=config.prometheus_range_cache_samples,
+            cache_delay=timedelta(seconds=config.prometheus_range_cache_delay),
+            max_concurrency=config.prometheus_shard_concurrency,
+        )
+    return _frontend
@@ -0,0 +1,120 @@
+"""
+Short-lived cache of API query results, with concurrent identical queries coalesced.
+
+Viewers of the same notebook send the same searches at the same moment: the first one runs the
+query, the others wait for its result, and later ones get it from the cache until it expires.
+"""
+
+import asyncio
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from datetime import datetime, timezone
+import math
+import time
+from typing import Any, TypeVar
+
+from pydantic import BaseModel
+
+from dashfrog import get_dashfrog_instance
+
+T = TypeVar("T")
+
+
+def round_window(start: datetime, end: datetime, bucket: float) -> tuple[datetime, datetime]:
+    """The window `[start, end]` widened to multiples of `bucket` seconds, so that nearby windows share keys."""
+    return _round(start, bucket, math.floor), _round(end, bucket, math.ceil)
+
+
+def _round(dt: datetime, bucket: float, round_fn: Callable[[float], int]) -> datetime:
+    # Naive timestamps are UTC, and stay naive
+    timestamp = dt.timestamp() if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc).timestamp()
+    rounded = datetime.fromtimestamp(round_fn(timestamp / bucket) * bucket, dt.tzinfo or timezone.utc)
+    return rounded if dt.tzinfo is not None else rounded.replace(tzinfo=None)
+
+
+class CacheStats(BaseModel):
+    """Counters of a result cache."""
+
+    hits: int
+    misses: int
+    coalesced: int
+    entries: int
+    items: int
+
+
+class ResultCache:
+    """
+    Results kept for `ttl` seconds, up to `max_items` result items in all, least recently used first out.
+
+    A query whose key is being computed waits for that computation instead of running again. The
+    computation runs in its own task, so it completes even if the request that started it is cancelled.
+    """
+
+    def __init__(self, ttl: float = 5.0, max_items: int = 100_000):
+        self.ttl = ttl
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries: OrderedDict[Hashable, tuple[float, int, Any]] = OrderedDict()
+        self._items = 0
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+
+    async def get(self, key: Hashable, compute: Callable[[], Awaitable[T]], items: Callable[[T], int]) -> T:
+        """Result of `key`, computed with `compute` unless cached or in flight. `items` weighs results."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, _, result = entry
+            if expires_at > time.monotonic():
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return result
+            self._evict(key)
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(compute())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda task: self._done(key, task, items))
+        return await asyncio.shield(task)
+
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            hits=self.hits, misses=self.misses, coalesced=self.coalesced, entries=len(self._entries), items=self._items
+        )
+
+    def _done(self, key: Hashable, task: asyncio.Task, items: Callable[[Any], int]) -> None:
+        del self._in_flight[key]
+        # Failures are raised to the waiting requests, and never cached
+        if task.cancelled() or task.exception() is not None:
+            return
+
+        result = task.result()
+        weight = items(result)
+        if weight > self.max_items:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, weight, result)
+        self._items += weight
+        while self._items > self.max_items:
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key: Hashable) -> None:
+        _, weight, _ = self._entries.pop(key)
+        self._items -= weight
+
+
+_flow_query_cache: ResultCache | None = None
+
+
+def get_flow_query_cache() -> ResultCache | None:
+    """The shared cache of flow searches and histories, None if it is disabled."""
+    global _flow_query_cache
+    config = get_dashfrog_instance().config
+    if config.flow_query_cache_ttl <= 0:
+        return None
+    if _flow_query_cache is None:
+        _flow_query_cache = ResultCache(ttl=config.flow_query_cache_ttl, max_items=config.flow_query_cache_items)
+    return _flow_query_cache
@@ -69,6 +69,18 @@ class FlowHistory(BaseModel):
     steps: list[FlowHistoryStep]
 
 
+class FlowRunChange(BaseModel):
+    """A flow run, as it is after a change notified at ingestion."""
+
+    flowId: str
+    groupId: str
+    name: str
+    labels: dict[str, str]
+    status: Literal["success", "failure", "running"]
+    startTime: datetime | None
+    endTime: datetime | None
+
+
 TransformT = Literal["ratePerSecond", "ratePerMinute", "ratePerHour", "ratePerDay", "p50", "p90", "p95", "p99", "ratio"]
 TimeAggregationT = Literal["last", "avg", "min", "max", "match"]
 GroupByFnT = Literal["sum", "avg", "min", "max"]
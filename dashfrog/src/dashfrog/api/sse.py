@@ -0,0 +1,24 @@
+"""Server-sent event responses, for the live feeds of the API."""
+
+from collections.abc import AsyncIterable
+from typing import Any
+
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
+
+SSE_MEDIA_TYPE = "text/event-stream"
+
+# Comment line sent to idle streams, so that proxies don't close them
+SSE_KEEPALIVE = b": keepalive\n\n"
+
+
+def sse_event(event: str, data: Any) -> bytes:
+    """An event named `event`, with `data` (Pydantic models, or anything JSON serializable) as JSON."""
+    return b"event: " + event.encode() + b"\ndata: " + to_json(data) + b"\n\n"
+
+
+def sse_response(events: AsyncIterable[bytes]) -> StreamingResponse:
+    """Stream encoded events as they are produced, unbuffered by proxies."""
+    return StreamingResponse(
+        events, media_type=SSE_MEDIA_TYPE, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -18,6 +18,17 @@ def main():
     server_parser.add_argument("--port", type=int, default=8000, help="Port to bind to (default: 8000)")
     server_parser.add_argument("--reload", action="store_true", help="Enable auto-reload for development")
 
+    # Partitions command
+    subparsers.add_parser(
+        "partitions", help="Create the coming flow event partitions, and drop or detach the expired ones"
+    )
+
+    # Rollups command
+    rollups_parser = subparsers.add_parser("rollups", help="Refresh the flow rollups once")
+    rollups_parser.add_argument(
+        "--lag", type=float, default=None, help="Leave runs upserted less than LAG seconds ago (default: config)"
+    )
+
     # Version command
     subparsers.add_parser("version", help="Show version information")
 
@@ -25,6 +36,10 @@ def main():
 
     if args.command == "serve":
         run_server(args.host, args.port, args.reload)
+    elif args.command == "partitions":
+        run_partitions()
+    elif args.command == "rollups":
+        run_rollups(args.lag)
     elif args.command == "version":
         show_version()
     else:
@@ -47,6 +62,45 @@ def run_server(host: str, port: int, reload: bool):
     uvicorn.run("dashfrog.api:app", host=host, port=port, reload=reload)
 
 
+def run_partitions():
+    """Maintain the flow event partitions once."""
+    from dashfrog import Config, get_dashfrog_instance, setup
+    from dashfrog.partitions import maintain_partitions
+
+    config = Config()
+    setup(config)
+    report = maintain_partitions(
+        get_dashfrog_instance().db_engine,
+        premake_days=config.event_partition_premake_days,
+        retention_days=config.event_retention_days,
+        expired_action=config.event_retention_action,
+    )
+    if report is None:
+        print("Flow event partitions are being maintained by another process")
+        return
+    for action, names in (("Created", report.created), ("Detached", report.detached), ("Dropped", report.dropped)):
+        for name in names:
+            print(f"{action} {name}")
+
+
+def run_rollups(lag: float | None):
+    """Refresh the flow rollups once."""
+    from datetime import timedelta
+
+    from dashfrog import Config, get_dashfrog_instance, setup
+    from dashfrog.rollups import refresh_rollups
+
+    config = Config()
+    setup(config)
+    watermark = refresh_rollups(
+        get_dashfrog_instance().db_engine, timedelta(seconds=config.rollup_lag if lag is None else lag)
+    )
+    if watermark is None:
+        print("Flow rollups are being refreshed by another process")
+    else:
+        print(f"Flow rollups are up to date until {watermark.isoformat()}")
+
+
 def show_version():
     """Show version information."""
     from importlib.metadata import version
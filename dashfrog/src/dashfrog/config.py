@@ -1,4 +1,5 @@
 from os import environ
+from typing import Literal
 
 from pydantic import BaseModel
 
@@ -29,12 +30,73 @@ class Config(BaseModel):
     postgres_user: str = environ.get("DASHFROG_POSTGRES_USER", "postgres")
     postgres_password: str = environ.get("DASHFROG_POSTGRES_PASSWORD", "postgres")
 
+    # Flow events
+    # "sync" writes each event in its own transaction, "buffered" hands it to a background writer,
+    # "spool" appends it to local segment files replayed into Postgres in the background
+    event_write_mode: Literal["sync", "buffered", "spool"] = environ.get(  # pyright: ignore[reportAssignmentType]
+        "DASHFROG_EVENT_WRITE_MODE", "sync"
+    )
+    event_batch_size: int = int(environ.get("DASHFROG_EVENT_BATCH_SIZE", "500"))
+    event_flush_interval: float = float(environ.get("DASHFROG_EVENT_FLUSH_INTERVAL", "1.0"))
+    event_queue_size: int = int(environ.get("DASHFROG_EVENT_QUEUE_SIZE", "10000"))
+    event_queue_overflow: Literal["block", "drop"] = environ.get(  # pyright: ignore[reportAssignmentType]
+        "DASHFROG_EVENT_QUEUE_OVERFLOW", "block"
+    )
+    spool_directory: str = environ.get("DASHFROG_SPOOL_DIRECTORY", ".dashfrog-spool")
+    spool_segment_size: int = int(environ.get("DASHFROG_SPOOL_SEGMENT_SIZE", str(16 * 1024 * 1024)))
+    spool_max_size: int = int(environ.get("DASHFROG_SPOOL_MAX_SIZE", str(1024 * 1024 * 1024)))
+    spool_fsync: bool = environ.get("DASHFROG_SPOOL_FSYNC", "false").lower() == "true"
+
+    # Daily flow event partitions, maintained by the API server every `partition_maintenance_interval`
+    # seconds (0 disables it). Partitions older than `event_retention_days` are dropped or only detached
+    event_partition_premake_days: int = int(environ.get("DASHFROG_EVENT_PARTITION_PREMAKE_DAYS", "7"))
+    event_retention_days: int | None = (
+        int(environ["DASHFROG_EVENT_RETENTION_DAYS"]) if environ.get("DASHFROG_EVENT_RETENTION_DAYS") else None
+    )
+    event_retention_action: Literal["drop", "detach"] = environ.get(  # pyright: ignore[reportAssignmentType]
+        "DASHFROG_EVENT_RETENTION_ACTION", "drop"
+    )
+    partition_maintenance_interval: float = float(environ.get("DASHFROG_PARTITION_MAINTENANCE_INTERVAL", "3600"))
+
+    # Notify the flow runs upserted at ingestion, for the API server to stream them. Postgres serializes
+    # the commits of notifying transactions, so leave it off unless the flow run stream is used
+    flow_run_notifications: bool = environ.get("DASHFROG_FLOW_RUN_NOTIFICATIONS", "false").lower() == "true"
+
+    # Flow rollups, refreshed by the API server every `rollup_interval` seconds (0 disables it), and search
+    # cursors leave the runs of the last `rollup_lag` seconds to the next refresh
+    rollup_interval: float = float(environ.get("DASHFROG_ROLLUP_INTERVAL", "60"))
+    rollup_lag: float = float(environ.get("DASHFROG_ROLLUP_LAG", "60"))
+    # Flow searches and histories of the API server, cached `flow_query_cache_ttl` seconds (0 disables it), up to
+    # a number of flows and runs. Windows share the entry of their window widened to multiples of
+    # `flow_query_cache_bucket` seconds when its first and last buckets hold no runs
+    flow_query_cache_ttl: float = float(environ.get("DASHFROG_FLOW_QUERY_CACHE_TTL", "5"))
+    flow_query_cache_bucket: float = float(environ.get("DASHFROG_FLOW_QUERY_CACHE_BUCKET", "5"))
+    flow_query_cache_items: int = int(environ.get("DASHFROG_FLOW_QUERY_CACHE_ITEMS", "100000"))
+
     # Telemetry
     otlp_endpoint: str = environ.get("DASHFROG_OTLP_ENDPOINT", "grpc://localhost:4317")
     otlp_auth_token: str | None = environ.get("DASHFROG_OTLP_AUTH_TOKEN", "pwd")
     prometheus_endpoint: str = environ.get("DASHFROG_PROMETHEUS_ENDPOINT", "http://prometheus:9090")
+    # Prometheus queries of the API server: seconds before giving up, and connections in flight and kept alive
+    prometheus_timeout: float = float(environ.get("DASHFROG_PROMETHEUS_TIMEOUT", "10"))
+    prometheus_max_connections: int = int(environ.get("DASHFROG_PROMETHEUS_MAX_CONNECTIONS", "20"))
+    prometheus_max_keepalive_connections: int = int(environ.get("DASHFROG_PROMETHEUS_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    # Range query days ended `prometheus_range_cache_delay` seconds ago are cached, up to a number of samples
+    prometheus_range_cache_samples: int = int(environ.get("DASHFROG_PROMETHEUS_RANGE_CACHE_SAMPLES", "1000000"))
+    prometheus_range_cache_delay: float = float(environ.get("DASHFROG_PROMETHEUS_RANGE_CACHE_DELAY", "600"))
+    # Day shards of a range query queried at once
+    prometheus_shard_concurrency: int = int(environ.get("DASHFROG_PROMETHEUS_SHARD_CONCURRENCY", "4"))
+    # Metric label values, refreshed by the API server every `metric_label_refresh_interval` seconds
+    # (0 reads them on every request), from the series of the last `metric_label_lookback` seconds if set
+    metric_label_refresh_interval: float = float(environ.get("DASHFROG_METRIC_LABEL_REFRESH_INTERVAL", "60"))
+    metric_label_lookback: float | None = (
+        float(environ["DASHFROG_METRIC_LABEL_LOOKBACK"]) if environ.get("DASHFROG_METRIC_LABEL_LOOKBACK") else None
+    )
 
     # API
     api_username: str = environ.get("DASHFROG_API_USERNAME", "admin")
     api_password: str = environ.get("DASHFROG_API_PASSWORD", "admin")
     api_secret_key: str = environ.get("DASHFROG_API_SECRET_KEY", "change-this-secret-key-in-production")
+    # Connection pool of the API server's async engine, which bounds its in-flight queries
+    api_db_pool_size: int = int(environ.get("DASHFROG_API_DB_POOL_SIZE", "10"))
+    api_db_max_overflow: int = int(environ.get("DASHFROG_API_DB_MAX_OVERFLOW", "20"))
@@ -1,5 +1,6 @@
 """Shared constants for DashFrog SDK."""
 
+from enum import IntEnum
 from typing import Literal
 
 # Baggage keys
@@ -16,6 +17,33 @@ EVENT_STEP_SUCCESS = "step_success"
 EVENT_STEP_FAIL = "step_fail"
 TENANT_LABEL_NAME = "tenant"
 
+# Postgres notification channel of flow and metric registrations
+CATALOG_CHANNEL = "dashfrog_catalog"
+# Postgres notification channel of the flow runs upserted at ingestion
+FLOW_RUN_CHANNEL = "dashfrog_flow_run"
+
+
+class EventKind(IntEnum):
+    """Kind of a flow event, stored as a smallint. Custom events keep their name in `event_name`."""
+
+    FLOW_START = 1
+    FLOW_SUCCESS = 2
+    FLOW_FAIL = 3
+    STEP_START = 4
+    STEP_SUCCESS = 5
+    STEP_FAIL = 6
+    CUSTOM = 7
+
+
+EVENT_KINDS = {
+    EVENT_FLOW_START: EventKind.FLOW_START,
+    EVENT_FLOW_SUCCESS: EventKind.FLOW_SUCCESS,
+    EVENT_FLOW_FAIL: EventKind.FLOW_FAIL,
+    EVENT_STEP_START: EventKind.STEP_START,
+    EVENT_STEP_SUCCESS: EventKind.STEP_SUCCESS,
+    EVENT_STEP_FAIL: EventKind.STEP_FAIL,
+}
+
 
 # Types
 MetricUnitT = Literal["percent"] | str | None
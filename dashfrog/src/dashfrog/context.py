@@ -0,0 +1,119 @@
+"""Per-context state of the flow and step currently open."""
+
+from collections.abc import Generator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, replace
+from typing import Any
+
+from .constants import BAGGAGE_FLOW_LABEL_NAME, BAGGAGE_STEP_LABEL_NAME, TENANT_LABEL_NAME
+from .utils import generate_flow_group_id, get_labels_from_baggage
+
+from opentelemetry.trace import INVALID_SPAN, get_current_span
+
+
+@dataclass(frozen=True)
+class FlowContext:
+    """
+    Precomputed state of a flow, built once when the flow (or step) opens.
+
+    Event writes read it from a contextvar instead of re-parsing the baggage and
+    re-serializing the group id on every event. Baggage is still written, so the flow
+    propagates to other processes, where the context is rebuilt from it once per step.
+    """
+
+    trace_id: int
+    flow_name: str
+    tenant: str
+    labels: dict[str, str]
+    group_id: str
+    step_name: str | None = None
+    flow_id: str = field(init=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "flow_id", str(self.trace_id))
+
+    @staticmethod
+    def create(trace_id: int, flow_name: str, tenant: str, labels: dict[str, str]) -> "FlowContext":
+        return FlowContext(
+            trace_id=trace_id,
+            flow_name=flow_name,
+            tenant=tenant,
+            labels=labels,
+            group_id=generate_flow_group_id(flow_name, tenant, **labels),
+        )
+
+    def with_step(self, step_name: str) -> "FlowContext":
+        return replace(self, step_name=step_name)
+
+    def flow_event(self, event_name: str) -> dict[str, Any]:
+        """Values of a flow-level event row."""
+        return dict(
+            flow_id=self.flow_id,
+            event_name=event_name,
+            tenant=self.tenant,
+            group_id=self.group_id,
+            flow_metadata={
+                BAGGAGE_FLOW_LABEL_NAME: self.flow_name,
+            },
+            labels=self.labels,
+        )
+
+    def step_event(self, event_name: str) -> dict[str, Any]:
+        """Values of a step event row."""
+        return dict(
+            flow_id=self.flow_id,
+            event_name=event_name,
+            tenant=self.tenant,
+            group_id=self.group_id,
+            flow_metadata={
+                BAGGAGE_FLOW_LABEL_NAME: self.flow_name,
+                BAGGAGE_STEP_LABEL_NAME: self.step_name,
+            },
+            labels=self.labels,
+        )
+
+
+_current_flow: ContextVar[FlowContext | None] = ContextVar("dashfrog_flow", default=None)
+
+
+@contextmanager
+def use_flow_context(flow_context: FlowContext) -> Generator[None, None, None]:
+    """Make `flow_context` the current flow for the duration of the block."""
+    token = _current_flow.set(flow_context)
+    try:
+        yield
+    finally:
+        _current_flow.reset(token)
+
+
+def get_flow_context(with_step: bool = False) -> FlowContext:
+    """
+    Get the flow open in the current context.
+
+    Falls back to the baggage when the flow was opened in another process, or when the
+    current trace is not the one the context was opened in.
+
+    Raises:
+        ValueError: If there is no current span, or the baggage misses mandatory labels
+    """
+    span = get_current_span()
+    if span == INVALID_SPAN:
+        raise ValueError("No span found")
+    trace_id = span.get_span_context().trace_id
+
+    flow_context = _current_flow.get()
+    if flow_context is None or flow_context.trace_id != trace_id:
+        flow_context = _flow_context_from_baggage(trace_id)
+
+    if with_step and flow_context.step_name is None:
+        raise ValueError(f"Missing mandatory labels: { ({BAGGAGE_STEP_LABEL_NAME}) }")
+    return flow_context
+
+
+def _flow_context_from_baggage(trace_id: int) -> FlowContext:
+    labels = get_labels_from_baggage(mandatory_labels=[BAGGAGE_FLOW_LABEL_NAME, TENANT_LABEL_NAME])
+    flow_name = labels.pop(BAGGAGE_FLOW_LABEL_NAME)
+    tenant = labels.pop(TENANT_LABEL_NAME)
+    step_name = labels.pop(BAGGAGE_STEP_LABEL_NAME, None)
+    return replace(FlowContext.create(trace_id, flow_name, tenant, labels), step_name=step_name)
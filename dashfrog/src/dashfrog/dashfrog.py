@@ -1,20 +1,27 @@
+import asyncio
+import atexit
 from base64 import b64encode
 from dataclasses import dataclass, field
-from typing import TYPE_CHECKING, Literal, overload
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Literal, overload
 import uuid
 
-from sqlalchemy import Engine, create_engine
+from sqlalchemy import Engine, create_engine, func, select
 from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 
 from .config import Config
-from .constants import MetricUnitT
+from .constants import CATALOG_CHANNEL, MetricUnitT
+from .ingest import insert_event
 from .models import (
     Flow,
     Metric as MetricModel,
 )
+from .spool import Spool
+from .writer import EventWriter
 
 from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
-from opentelemetry.metrics import CallbackT, Histogram, Instrument, Meter, ObservableGauge
+from opentelemetry.metrics import CallbackOptions, CallbackT, Histogram, Instrument, Meter, ObservableGauge, Observation
 from opentelemetry.sdk.metrics import Counter, MeterProvider
 from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
 from opentelemetry.sdk.metrics.view import ExponentialBucketHistogramAggregation, View
@@ -44,6 +51,8 @@ class Dashfrog:
 
     _flows: set[str] = field(init=False, default_factory=set)
     _metrics: set[str] = field(init=False, default_factory=set)
+    _writer: EventWriter | Spool | None = field(init=False, default=None)
+    _async_db_engine: AsyncEngine | None = field(init=False, default=None)
 
     def __post_init__(self):
         # Build resource
@@ -83,18 +92,83 @@ class Dashfrog:
         self.meter = meter_provider.get_meter("dashfrog")
 
         # Create SQLAlchemy engine with connection pooling
-        db_url = (
-            f"postgresql://{self.config.postgres_user}:{self.config.postgres_password}"
-            f"@{self.config.postgres_host}:{self.config.postgres_port}/{self.config.postgres_dbname}"
-        )
         self.db_engine = create_engine(
-            db_url,
+            f"postgresql://{self._db_location}",
             pool_size=5,
             max_overflow=10,
             pool_pre_ping=True,  # Verify connections before using
             pool_recycle=3600,  # Recycle connections after 1 hour
         )
 
+        # Hand flow events to a background writer instead of writing them inline
+        if self.config.event_write_mode == "buffered":
+            self._writer = EventWriter(
+                self.db_engine,
+                batch_size=self.config.event_batch_size,
+                flush_interval=self.config.event_flush_interval,
+                queue_size=self.config.event_queue_size,
+                overflow=self.config.event_queue_overflow,
+                notify_runs=self.config.flow_run_notifications,
+            )
+            atexit.register(self.close)
+        elif self.config.event_write_mode == "spool":
+            self._writer = Spool(
+                self.config.spool_directory,
+                self.db_engine,
+                segment_size=self.config.spool_segment_size,
+                max_size=self.config.spool_max_size,
+                batch_size=self.config.event_batch_size,
+                drain_interval=self.config.event_flush_interval,
+                fsync=self.config.spool_fsync,
+                notify_runs=self.config.flow_run_notifications,
+            )
+            self._register_spool_metrics(self._writer)
+            atexit.register(self.close)
+
+    @property
+    def _db_location(self) -> str:
+        return (
+            f"{self.config.postgres_user}:{self.config.postgres_password}"
+            f"@{self.config.postgres_host}:{self.config.postgres_port}/{self.config.postgres_dbname}"
+        )
+
+    @property
+    def async_db_engine(self) -> AsyncEngine:
+        """
+        Async engine of the API server, so that queries in flight don't hold a worker thread.
+
+        Created on first use, the SDK only needs the sync engine and driver.
+        """
+        if self._async_db_engine is None:
+            self._async_db_engine = create_async_engine(
+                f"postgresql+asyncpg://{self._db_location}",
+                pool_size=self.config.api_db_pool_size,
+                max_overflow=self.config.api_db_max_overflow,
+                pool_pre_ping=True,
+                pool_recycle=3600,
+            )
+        return self._async_db_engine
+
+    async def close_async_db_engine(self) -> None:
+        """Close the connections of the async engine, they can't be reused from another event loop."""
+        if self._async_db_engine is not None:
+            await self._async_db_engine.dispose()
+            self._async_db_engine = None
+
+    def _register_spool_metrics(self, spool: Spool) -> None:
+        """Export spool depth and lag, so a Postgres outage can be alerted on before the spool fills up."""
+
+        def observe(value):
+            def callback(options: CallbackOptions):
+                yield Observation(value=value())
+
+            return [callback]
+
+        self.meter.create_observable_gauge("spool_depth_bytes", callbacks=observe(lambda: spool.depth_bytes), unit="By")
+        self.meter.create_observable_gauge("spool_segments", callbacks=observe(lambda: spool.segment_count))
+        self.meter.create_observable_gauge("spool_lag_seconds", callbacks=observe(lambda: spool.lag_seconds), unit="s")
+        self.meter.create_observable_gauge("spool_dropped_events", callbacks=observe(lambda: spool.dropped))
+
     @staticmethod
     def parse_otel_config(endpoint: str) -> tuple[bool, str]:
         """
@@ -113,6 +187,42 @@ class Dashfrog:
         # Plain host:port defaults to gRPC insecure (for dev)
         return True, endpoint
 
+    def write_event(self, event: dict[str, Any]) -> None:
+        """Write a flow event, either inline or through the background writer."""
+        if self._writer is None:
+            insert_event(event, self.db_engine, notify_runs=self.config.flow_run_notifications)
+            return
+
+        # Timestamp at enqueue time, the row may only be written up to `event_flush_interval` later
+        event.setdefault("event_dt", datetime.now(timezone.utc).replace(tzinfo=None))
+        self._writer.put(event)
+
+    async def awrite_event(self, event: dict[str, Any]) -> None:
+        """Write a flow event without blocking the event loop."""
+        if self._writer is not None:
+            event.setdefault("event_dt", datetime.now(timezone.utc).replace(tzinfo=None))
+            if self._writer.put_nowait(event):
+                return
+
+        # Inline write, or buffer full: wait for it off the event loop
+        await asyncio.to_thread(self.write_event, event)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Write every buffered flow event to Postgres.
+
+        Returns:
+            True if all pending events were written before `timeout` expired
+        """
+        if self._writer is None:
+            return True
+        return self._writer.flush(timeout)
+
+    def close(self) -> None:
+        """Flush buffered flow events and stop the background writer."""
+        if self._writer is not None:
+            self._writer.close()
+
     def register_flow(self, flow_name: str, *labels: str) -> None:
         if flow_name in self._flows:
             return
@@ -123,8 +233,16 @@ class Dashfrog:
                 .values(name=flow_name, labels=list(labels))
                 .on_conflict_do_update(index_elements=[Flow.name], set_=dict(labels=list(labels)))
             )
+            # Let the API servers know that their catalog changed, once committed
+            conn.execute(select(func.pg_notify(CATALOG_CHANNEL, f"flow:{flow_name}")))
         self._flows.add(flow_name)
 
+    async def aregister_flow(self, flow_name: str, *labels: str) -> None:
+        if flow_name in self._flows:
+            return
+
+        await asyncio.to_thread(self.register_flow, flow_name, *labels)
+
     @overload
     def register_metric(
         self,
@@ -200,6 +318,7 @@ class Dashfrog:
                         ),
                     )
                 )
+                conn.execute(select(func.pg_notify(CATALOG_CHANNEL, f"metric:{metric_name}")))
             self._metrics.add(metric_name)
 
         if metric_type == "counter":
@@ -287,6 +406,9 @@ def setup(
     """
     global _dashfrog
 
+    if _dashfrog is not None:
+        _dashfrog.close()
+
     _dashfrog = Dashfrog(config or Config())
 
     if run_migrations:
@@ -295,6 +417,23 @@ def setup(
         run_db_migrations(_dashfrog.db_engine)
 
 
+def flush(timeout: float | None = None) -> bool:
+    """
+    Write every buffered flow event to Postgres.
+
+    Only useful with `event_write_mode="buffered"`, where events are otherwise written
+    by a background thread every `event_flush_interval` seconds and at interpreter exit.
+
+    Example:
+        from dashfrog import flush, setup
+
+        setup(Config(event_write_mode="buffered"))
+        ...
+        flush()
+    """
+    return get_dashfrog_instance().flush(timeout)
+
+
 def get_dashfrog_instance() -> Dashfrog:
     """Raise error if setup() hasn't been called."""
     if _dashfrog is None:
@@ -1,21 +1,18 @@
-from collections.abc import Generator
-from contextlib import contextmanager
+from collections.abc import AsyncGenerator, Generator
+from contextlib import asynccontextmanager, contextmanager
 from logging import warning
-
-from sqlalchemy import insert
-
-from dashfrog.models import FlowEvent
+from typing import Any
 
 from .constants import (
     BAGGAGE_FLOW_LABEL_NAME,
-    BAGGAGE_STEP_LABEL_NAME,
     EVENT_FLOW_FAIL,
     EVENT_FLOW_START,
     EVENT_FLOW_SUCCESS,
     TENANT_LABEL_NAME,
 )
+from .context import FlowContext, get_flow_context, use_flow_context
 from .dashfrog import get_dashfrog_instance
-from .utils import generate_flow_group_id, get_flow_id, get_labels_from_baggage, write_to_baggage
+from .utils import write_to_baggage
 
 from opentelemetry import trace
 
@@ -49,26 +46,16 @@ def start(name: str, tenant: str, end_on_exit: bool = True, **labels: str) -> Ge
 
     # Always create fresh span
     with tracer.start_as_current_span(f"flow.{name}") as span:
-        flow_id = str(span.get_span_context().trace_id)
-        group_id = generate_flow_group_id(name, tenant, **labels)
-        with write_to_baggage({BAGGAGE_FLOW_LABEL_NAME: name, TENANT_LABEL_NAME: tenant, **labels}):
+        flow_context = FlowContext.create(span.get_span_context().trace_id, name, tenant, labels)
+        with (
+            write_to_baggage({BAGGAGE_FLOW_LABEL_NAME: name, TENANT_LABEL_NAME: tenant, **labels}),
+            use_flow_context(flow_context),
+        ):
             # Write START event
-            with dashfrog.db_engine.begin() as conn:
-                conn.execute(
-                    insert(FlowEvent).values(
-                        flow_id=flow_id,
-                        event_name=EVENT_FLOW_START,
-                        labels=labels,
-                        tenant=tenant,
-                        group_id=group_id,
-                        flow_metadata={
-                            BAGGAGE_FLOW_LABEL_NAME: name,
-                        },
-                    )
-                )
+            dashfrog.write_event(flow_context.flow_event(EVENT_FLOW_START))
 
             try:
-                yield flow_id
+                yield flow_context.flow_id
             except Exception:
                 if end_on_exit:
                     _end_flow(EVENT_FLOW_FAIL)
@@ -78,74 +65,75 @@ def start(name: str, tenant: str, end_on_exit: bool = True, **labels: str) -> Ge
                     _end_flow(EVENT_FLOW_SUCCESS)
 
 
-def event(event_name: str):
-    """Write a custom event to the database."""
+@asynccontextmanager
+async def astart(name: str, tenant: str, end_on_exit: bool = True, **labels: str) -> AsyncGenerator[str, None]:
+    """
+    Start a business workflow/process flow from async code.
 
-    try:
-        flow_id = get_flow_id()
-    except ValueError as e:
-        warning(e.args[0])
-        return
+    Same as `start`, but event writes never block the event loop: they are either queued
+    to the background writer (`event_write_mode="buffered"`) or run in a worker thread.
 
-    try:
-        event_labels = get_labels_from_baggage(mandatory_labels=[BAGGAGE_FLOW_LABEL_NAME, TENANT_LABEL_NAME])
-    except ValueError as e:
-        warning(e.args[0])
-        return
+    Usage:
+        from dashfrog import flow
 
-    flow_name = event_labels.pop(BAGGAGE_FLOW_LABEL_NAME)
-    tenant = event_labels.pop(TENANT_LABEL_NAME)
-    event_labels.pop(BAGGAGE_STEP_LABEL_NAME, None)
-    group_id = generate_flow_group_id(flow_name, tenant, **event_labels)
+        async with flow.astart("process_order", tenant="acme-corp"):
+            # ... work
+            pass  # Automatically writes SUCCESS/FAIL event on exit
+    """
+    tracer = trace.get_tracer("dashfrog")
     dashfrog = get_dashfrog_instance()
+    await dashfrog.aregister_flow(name, *labels)
 
-    with dashfrog.db_engine.begin() as conn:
-        conn.execute(
-            insert(FlowEvent).values(
-                flow_id=flow_id,
-                event_name=event_name,
-                tenant=tenant,
-                group_id=group_id,
-                flow_metadata={
-                    BAGGAGE_FLOW_LABEL_NAME: flow_name,
-                },
-                labels=event_labels,
-            )
-        )
+    # Always create fresh span
+    with tracer.start_as_current_span(f"flow.{name}") as span:
+        flow_context = FlowContext.create(span.get_span_context().trace_id, name, tenant, labels)
+        with (
+            write_to_baggage({BAGGAGE_FLOW_LABEL_NAME: name, TENANT_LABEL_NAME: tenant, **labels}),
+            use_flow_context(flow_context),
+        ):
+            # Write START event
+            await dashfrog.awrite_event(flow_context.flow_event(EVENT_FLOW_START))
 
+            try:
+                yield flow_context.flow_id
+            except Exception:
+                if end_on_exit:
+                    await _aend_flow(EVENT_FLOW_FAIL)
+                raise
+            else:
+                if end_on_exit:
+                    await _aend_flow(EVENT_FLOW_SUCCESS)
 
-def _end_flow(event_name: str):
-    dashfrog = get_dashfrog_instance()
 
-    try:
-        flow_id = get_flow_id()
-    except ValueError as e:
-        warning(e.args[0])
-        return
+def event(event_name: str):
+    """Write a custom event to the database."""
+    if (values := _current_flow_event(event_name)) is not None:
+        get_dashfrog_instance().write_event(values)
+
 
+async def aevent(event_name: str):
+    """Write a custom event to the database, without blocking the event loop."""
+    if (values := _current_flow_event(event_name)) is not None:
+        await get_dashfrog_instance().awrite_event(values)
+
+
+def _current_flow_event(event_name: str) -> dict[str, Any] | None:
+    """Build a flow-level event for the flow in the current context, or None if there is none."""
     try:
-        event_labels = get_labels_from_baggage(mandatory_labels=[BAGGAGE_FLOW_LABEL_NAME, TENANT_LABEL_NAME])
+        return get_flow_context().flow_event(event_name)
     except ValueError as e:
         warning(e.args[0])
-        return
-
-    flow_name = event_labels.pop(BAGGAGE_FLOW_LABEL_NAME)
-    tenant = event_labels.pop(TENANT_LABEL_NAME)
-    group_id = generate_flow_group_id(flow_name, tenant, **event_labels)
-
-    with dashfrog.db_engine.begin() as conn:
-        conn.execute(
-            insert(FlowEvent).values(
-                flow_id=flow_id,
-                event_name=event_name,
-                tenant=tenant,
-                group_id=group_id,
-                flow_metadata={
-                    BAGGAGE_FLOW_LABEL_NAME: flow_name,
-                },
-                labels=event_labels,
-            )
-        )
+        return None
+
+
+def _end_flow(event_name: str):
+    if (values := _current_flow_event(event_name)) is not None:
+        get_dashfrog_instance().write_event(values)
+
+
+async def _aend_flow(event_name: str):
+    if (values := _current_flow_event(event_name)) is not None:
+        await get_dashfrog_instance().awrite_event(values)
 
 
 def success():
@@ -156,3 +144,13 @@ def success():
 def fail():
     """Manually mark a flow as failed. Use this when end_on_exit=False in flow.start()."""
     _end_flow(EVENT_FLOW_FAIL)
+
+
+async def asuccess():
+    """Manually mark a flow as successful from async code. Use this when end_on_exit=False in flow.astart()."""
+    await _aend_flow(EVENT_FLOW_SUCCESS)
+
+
+async def afail():
+    """Manually mark a flow as failed from async code. Use this when end_on_exit=False in flow.astart()."""
+    await _aend_flow(EVENT_FLOW_FAIL)
@@ -0,0 +1,437 @@
+"""
+Bulk ingestion of flow events.
+
+Usage:
+    from dashfrog import ingest
+
+    ingest.bulk_write(
+        [
+            {
+                "flow_id": "1234",
+                "event_name": "flow_start",
+                "event_dt": datetime(2024, 1, 1, 12, 0),
+                "labels": {"region": "eu"},
+                "group_id": "import$$tenant=acme$$region=eu",
+                "tenant": "acme",
+                "flow_metadata": {"flow_name": "import"},
+            },
+            ...
+        ]
+    )
+
+Rows are streamed to Postgres with `COPY ... FROM STDIN`, which is much cheaper than
+parameterized inserts for large batches (see `benchmarks/ingest.py`).
+
+`group_id` and `labels` are dictionary-encoded: `flow_event` rows only store the 64-bit ids
+of their `flow_group` and `label_set` rows. Ids are hashes computed client-side, so writers
+never wait on a lookup, and dictionary rows are upserted once per process.
+
+The tenants and flow label values the UI filters on are kept in `tenant` and `flow_label_value`
+with the last time they were seen, upserted at most once per `SEEN_INTERVAL` per process.
+
+Flow start and end events also upsert the run's `flow_run` row, in the same transaction. With
+`notify_runs`, the upserted runs are notified on the flow run channel once it commits: Postgres
+serializes the commits of transactions that notified, so only writers feeding the flow run stream do.
+"""
+
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from datetime import datetime, timezone
+from functools import lru_cache
+from hashlib import blake2b
+from itertools import islice
+import json
+import time
+from typing import Any
+from uuid import UUID
+
+from sqlalchemy import Connection, Engine, and_, case, func, insert, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .constants import BAGGAGE_FLOW_LABEL_NAME, BAGGAGE_STEP_LABEL_NAME, EVENT_KINDS, FLOW_RUN_CHANNEL, EventKind
+from .models import FlowEvent, FlowGroup, FlowLabelValue, FlowRun, LabelSet, Tenant
+
+FLOW_EVENT_COLUMNS = (
+    "flow_id",
+    "event_kind",
+    "event_name",
+    "event_dt",
+    "flow_group_id",
+    "label_set_id",
+    "tenant",
+    "flow_name",
+    "step_name",
+)
+
+_COPY_FLOW_EVENT = f"COPY flow_event ({', '.join(FLOW_EVENT_COLUMNS)}) FROM STDIN"
+_COPY_NULL = "\\N"
+_TEXT_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+# Dictionary rows known to be committed, cleared when they grow past `_KNOWN_KEYS_MAX`
+_known_flow_groups: set[int] = set()
+_known_label_sets: set[int] = set()
+_KNOWN_KEYS_MAX = 100_000
+
+# Seconds between upserts of the last time a tenant or flow label value was seen, and when they were
+SEEN_INTERVAL = 3600.0
+_seen_tenants: dict[str, float] = {}
+_seen_label_values: dict[tuple[str, str, str], float] = {}
+
+# Events read from the iterable of `bulk_write` and written at a time
+BULK_WRITE_CHUNK_SIZE = 10_000
+
+# Postgres rejects notification payloads of 8000 bytes or more
+_NOTIFY_PAYLOAD_MAX = 7900
+
+
+def bulk_write(events: Iterable[Mapping[str, Any]], engine: Engine | None = None, notify_runs: bool = False) -> int:
+    """
+    Write flow events to `flow_event` with `COPY`, in chunks of `BULK_WRITE_CHUNK_SIZE` events, in a single transaction.
+
+    Args:
+        events: Flow events, as mappings with the keys `flow_id`, `event_name`, `event_dt`,
+            `labels`, `group_id`, `tenant` and `flow_metadata`.
+            `event_dt` defaults to the current UTC time.
+        engine: Engine to write with (defaults to the DashFrog instance engine)
+        notify_runs: Notify the upserted flow runs on the flow run channel
+
+    Returns:
+        Number of rows written
+    """
+    if engine is None:
+        from .dashfrog import get_dashfrog_instance
+
+        engine = get_dashfrog_instance().db_engine
+
+    rows = 0
+    flow_groups: set[int] = set()
+    label_sets: set[int] = set()
+    tenants: set[str] = set()
+    label_values: set[tuple[str, str, str]] = set()
+    timestamped = (_timestamped(event) for event in events)
+    with engine.begin() as conn:
+        # Chunks are read from the iterable one at a time, so backfills don't hold all their events in memory
+        while chunk := list(islice(timestamped, BULK_WRITE_CHUNK_SIZE)):
+            chunk_flow_groups, chunk_label_sets = write_dictionaries(conn, chunk)
+            stream = _CopyStream(encode_event(event) for event in chunk)
+            with conn.connection.cursor() as cursor:
+                cursor.copy_expert(_COPY_FLOW_EVENT, stream)  # pyright: ignore[reportAttributeAccessIssue]
+            write_runs(conn, chunk, notify=notify_runs)
+            chunk_tenants, chunk_label_values = write_last_seen(conn, chunk)
+
+            rows += stream.rows
+            flow_groups |= chunk_flow_groups
+            label_sets |= chunk_label_sets
+            tenants |= chunk_tenants
+            label_values |= chunk_label_values
+
+    _remember(flow_groups, label_sets)
+    _remember_seen(tenants, label_values)
+    return rows
+
+
+def insert_event(event: Mapping[str, Any], engine: Engine, notify_runs: bool = False) -> None:
+    """Write a single flow event with a plain `INSERT`."""
+    event = _timestamped(event)
+    with engine.begin() as conn:
+        flow_groups, label_sets = write_dictionaries(conn, [event])
+        conn.execute(insert(FlowEvent).values(**flow_event_values(event)))
+        write_runs(conn, [event], notify=notify_runs)
+        tenants, label_values = write_last_seen(conn, [event])
+
+    _remember(flow_groups, label_sets)
+    _remember_seen(tenants, label_values)
+
+
+def write_dictionaries(conn: Connection, events: Iterable[Mapping[str, Any]]) -> tuple[set[int], set[int]]:
+    """
+    Upsert the `flow_group` and `label_set` rows of `events` not known to exist yet.
+
+    Returns:
+        Ids of the upserted flow groups and label sets
+    """
+    flow_groups: dict[int, dict[str, Any]] = {}
+    label_sets: dict[int, dict[str, Any]] = {}
+    for event in events:
+        label_set_id = label_set_key(event["labels"])
+        if label_set_id not in _known_label_sets and label_set_id not in label_sets:
+            label_sets[label_set_id] = dict(id=label_set_id, labels=event["labels"])
+
+        flow_group_id = flow_group_key(event["group_id"])
+        if flow_group_id not in _known_flow_groups and flow_group_id not in flow_groups:
+            flow_groups[flow_group_id] = dict(
+                id=flow_group_id,
+                group_id=event["group_id"],
+                flow_name=event["flow_metadata"][BAGGAGE_FLOW_LABEL_NAME],
+                tenant=event["tenant"],
+                label_set_id=label_set_id,
+            )
+
+    if label_sets:
+        conn.execute(pg_insert(LabelSet).values(list(label_sets.values())).on_conflict_do_nothing())
+    if flow_groups:
+        conn.execute(pg_insert(FlowGroup).values(list(flow_groups.values())).on_conflict_do_nothing())
+    return set(flow_groups), set(label_sets)
+
+
+def write_runs(conn: Connection, events: Iterable[Mapping[str, Any]], notify: bool = False) -> None:
+    """Upsert the `flow_run` rows of the flow start and end events among `events`, and notify them if `notify`."""
+    runs: dict[tuple[str, int], dict[str, Any]] = {}
+    for event in events:
+        event_kind = EVENT_KINDS.get(event["event_name"])
+        if event_kind not in (EventKind.FLOW_START, EventKind.FLOW_SUCCESS, EventKind.FLOW_FAIL):
+            continue
+
+        # Merge the events of a run first, a single upsert can't update a row twice. Flows of the same
+        # trace share their flow id, so a run is keyed by its flow group too
+        run_key = (event["flow_id"], flow_group_key(event["group_id"]))
+        run = runs.get(run_key)
+        if run is None:
+            run = runs[run_key] = dict(
+                flow_id=UUID(int=int(event["flow_id"])),
+                flow_group_id=run_key[1],
+                label_set_id=label_set_key(event["labels"]),
+                tenant=event["tenant"],
+                flow_name=event["flow_metadata"][BAGGAGE_FLOW_LABEL_NAME],
+                status="running",
+                started_at=None,
+                ended_at=None,
+            )
+
+        event_dt = event["event_dt"]
+        if event_kind == EventKind.FLOW_START:
+            run["started_at"] = event_dt if run["started_at"] is None else min(run["started_at"], event_dt)
+        elif run["ended_at"] is None or event_dt >= run["ended_at"]:
+            run["ended_at"] = event_dt
+            run["status"] = "success" if event_kind == EventKind.FLOW_SUCCESS else "failure"
+
+    if not runs:
+        return
+
+    # Sorted, so concurrent writers lock rows in the same order
+    stmt = pg_insert(FlowRun).values(sorted(runs.values(), key=lambda run: (run["flow_id"], run["flow_group_id"])))
+    excluded_ends_later = and_(
+        stmt.excluded.ended_at.isnot(None),
+        or_(FlowRun.ended_at.is_(None), stmt.excluded.ended_at >= FlowRun.ended_at),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[FlowRun.flow_id, FlowRun.flow_group_id],
+        set_=dict(
+            # LEAST and GREATEST ignore NULLs
+            started_at=func.least(FlowRun.started_at, stmt.excluded.started_at),
+            ended_at=func.greatest(FlowRun.ended_at, stmt.excluded.ended_at),
+            status=case((excluded_ends_later, stmt.excluded.status), else_=FlowRun.status),
+            # Marks the run's rollup buckets as stale
+            updated_at=func.timezone("utc", func.now()),
+        ),
+    )
+    if not notify:
+        conn.execute(stmt)
+        return
+
+    upserted = conn.execute(
+        stmt.returning(
+            FlowRun.flow_id,
+            FlowRun.flow_group_id,
+            FlowRun.label_set_id,
+            FlowRun.tenant,
+            FlowRun.flow_name,
+            FlowRun.status,
+            FlowRun.started_at,
+            FlowRun.ended_at,
+        )
+    )
+
+    # Delivered to listeners when the transaction commits, with the runs as they are after the upsert
+    for payload in run_notifications(upserted):
+        conn.execute(select(func.pg_notify(FLOW_RUN_CHANNEL, payload)))
+
+
+def write_last_seen(
+    conn: Connection, events: Iterable[Mapping[str, Any]]
+) -> tuple[set[str], set[tuple[str, str, str]]]:
+    """
+    Upsert the `tenant` rows of `events`, and the `flow_label_value` rows of their flow start events,
+    unless they were upserted less than `SEEN_INTERVAL` seconds ago.
+
+    Returns:
+        Upserted tenants, and (flow name, key, value) of the upserted label values
+    """
+    now = time.monotonic()
+    tenants: dict[str, datetime] = {}
+    label_values: dict[tuple[str, str, str], datetime] = {}
+    for event in events:
+        event_dt = event["event_dt"]
+        tenant = event["tenant"]
+        if tenant in tenants or now - _seen_tenants.get(tenant, -SEEN_INTERVAL) >= SEEN_INTERVAL:
+            tenants[tenant] = max(tenants.get(tenant, event_dt), event_dt)
+
+        if EVENT_KINDS.get(event["event_name"]) != EventKind.FLOW_START:
+            continue
+        flow_name = event["flow_metadata"][BAGGAGE_FLOW_LABEL_NAME]
+        for key, value in event["labels"].items():
+            label_value = (flow_name, key, value)
+            if value is None:
+                continue
+            if (
+                label_value in label_values
+                or now - _seen_label_values.get(label_value, -SEEN_INTERVAL) >= SEEN_INTERVAL
+            ):
+                label_values[label_value] = max(label_values.get(label_value, event_dt), event_dt)
+
+    # Sorted, so concurrent writers lock rows in the same order
+    if tenants:
+        stmt = pg_insert(Tenant).values([dict(name=name, last_seen=tenants[name]) for name in sorted(tenants)])
+        conn.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[Tenant.name],
+                set_=dict(last_seen=func.greatest(Tenant.last_seen, stmt.excluded.last_seen)),
+            )
+        )
+    if label_values:
+        stmt = pg_insert(FlowLabelValue).values(
+            [
+                dict(flow_name=flow_name, key=key, value=value, last_seen=label_values[flow_name, key, value])
+                for flow_name, key, value in sorted(label_values)
+            ]
+        )
+        conn.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[FlowLabelValue.flow_name, FlowLabelValue.key, FlowLabelValue.value],
+                set_=dict(last_seen=func.greatest(FlowLabelValue.last_seen, stmt.excluded.last_seen)),
+            )
+        )
+    return set(tenants), set(label_values)
+
+
+def run_notifications(runs: Iterable[Sequence[Any]]) -> Iterator[str]:
+    """
+    Payloads notifying `flow_run` rows, as JSON arrays of runs small enough for `NOTIFY`.
+
+    Each run is an array of its flow id (hex), flow group id, label set id, tenant, flow name,
+    status, and start and end (ISO format, or null).
+    """
+    chunk: list[str] = []
+    size = 2
+    for flow_id, flow_group_id, label_set_id, tenant, flow_name, status, started_at, ended_at in runs:
+        run = json.dumps(
+            [
+                flow_id.hex,
+                flow_group_id,
+                label_set_id,
+                tenant,
+                flow_name,
+                status,
+                started_at.isoformat() if started_at is not None else None,
+                ended_at.isoformat() if ended_at is not None else None,
+            ],
+            separators=(",", ":"),
+        )
+        run_size = len(run.encode()) + 1
+        if chunk and size + run_size > _NOTIFY_PAYLOAD_MAX:
+            yield f"[{','.join(chunk)}]"
+            chunk, size = [], 2
+        chunk.append(run)
+        size += run_size
+    if chunk:
+        yield f"[{','.join(chunk)}]"
+
+
+def flow_event_values(event: Mapping[str, Any]) -> dict[str, Any]:
+    """Column values of the `flow_event` row of a flow event."""
+    event_kind = EVENT_KINDS.get(event["event_name"], EventKind.CUSTOM)
+    values = dict(
+        flow_id=UUID(int=int(event["flow_id"])),
+        event_kind=event_kind,
+        event_name=event["event_name"] if event_kind == EventKind.CUSTOM else None,
+        flow_group_id=flow_group_key(event["group_id"]),
+        label_set_id=label_set_key(event["labels"]),
+        tenant=event["tenant"],
+        flow_name=event["flow_metadata"][BAGGAGE_FLOW_LABEL_NAME],
+        step_name=event["flow_metadata"].get(BAGGAGE_STEP_LABEL_NAME),
+        event_dt=event["event_dt"],
+    )
+    return values
+
+
+def encode_event(event: Mapping[str, Any]) -> str:
+    """Encode a flow event as a line of Postgres `COPY` text format."""
+    event_dt = event.get("event_dt") or _utcnow()
+    event_kind = EVENT_KINDS.get(event["event_name"], EventKind.CUSTOM)
+    values = (
+        str(UUID(int=int(event["flow_id"]))),
+        str(event_kind.value),
+        event["event_name"] if event_kind == EventKind.CUSTOM else None,
+        event_dt.isoformat(),
+        str(flow_group_key(event["group_id"])),
+        str(label_set_key(event["labels"])),
+        event["tenant"],
+        event["flow_metadata"][BAGGAGE_FLOW_LABEL_NAME],
+        event["flow_metadata"].get(BAGGAGE_STEP_LABEL_NAME),
+    )
+    return "\t".join(_COPY_NULL if value is None else value.translate(_TEXT_ESCAPES) for value in values) + "\n"
+
+
+@lru_cache(maxsize=4096)
+def flow_group_key(group_id: str) -> int:
+    """Id of the `flow_group` row of a group id."""
+    return _hash_key(group_id)
+
+
+def label_set_key(labels: Mapping[str, str]) -> int:
+    """Id of the `label_set` row of a label set, independent of the label order."""
+    return _hash_key(json.dumps(labels, sort_keys=True, separators=(",", ":")))
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _timestamped(event: Mapping[str, Any]) -> Mapping[str, Any]:
+    """Default `event_dt` to the current UTC time, so every row written for the event agrees on it."""
+    if event.get("event_dt") is None:
+        return {**event, "event_dt": _utcnow()}
+    return event
+
+
+def _hash_key(value: str) -> int:
+    return int.from_bytes(blake2b(value.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+def _remember(flow_groups: set[int], label_sets: set[int]) -> None:
+    """Mark dictionary rows as existing, once the transaction that upserted them committed."""
+    for known, keys in ((_known_flow_groups, flow_groups), (_known_label_sets, label_sets)):
+        if len(known) + len(keys) > _KNOWN_KEYS_MAX:
+            known.clear()
+        known.update(keys)
+
+
+def _remember_seen(tenants: set[str], label_values: set[tuple[str, str, str]]) -> None:
+    """Mark tenants and label values as seen now, once the transaction that upserted them committed."""
+    now = time.monotonic()
+    for seen, keys in ((_seen_tenants, tenants), (_seen_label_values, label_values)):
+        if len(seen) + len(keys) > _KNOWN_KEYS_MAX:
+            seen.clear()
+        seen.update(dict.fromkeys(keys, now))
+
+
+class _CopyStream:
+    """File-like object feeding encoded rows to `copy_expert` without materializing them as one string."""
+
+    def __init__(self, lines: Iterator[str]):
+        self.rows = 0
+        self._lines = lines
+        self._buffer = ""
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._buffer += line
+            self.rows += 1
+
+        if size < 0:
+            chunk, self._buffer = self._buffer, ""
+        else:
+            chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
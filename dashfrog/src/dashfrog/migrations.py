@@ -55,7 +55,7 @@ def run_migrations(engine: Engine, target_revision: str = "head") -> None:
     """
     alembic_cfg = get_alembic_config(engine)
 
-    # Run migrations
-    with engine.begin() as connection:
+    # Run migrations, each in its own transaction so they can build indexes concurrently
+    with engine.connect() as connection:
         alembic_cfg.attributes["connection"] = connection
         command.upgrade(alembic_cfg, target_revision)
@@ -1,12 +1,12 @@
 """SQLAlchemy models for DashFrog."""
 
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Any, Literal
 from uuid import UUID
 
-from sqlalchemy import BigInteger, Index, String, func
+from sqlalchemy import BigInteger, Computed, Index, Interval, SmallInteger, String, func, text
 from sqlalchemy.dialects.postgresql import ARRAY, JSONB
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.types import UUID as SQLAlchemyUUID
 
 
@@ -23,16 +23,169 @@ class FlowEvent(Base):
     __table_args__ = (
         # Use a BRIN index for time-ordered queries on event_dt
         Index("ix_flow_event_event_dt_brin", "event_dt", postgresql_using="brin"),
+        Index("ix_flow_event_tenant_event_dt", "tenant", "event_dt"),
+        Index("ix_flow_event_tenant_flow_name_event_dt", "tenant", "flow_name", "event_dt"),
+        # Events of given runs
+        Index("ix_flow_event_flow_id_event_dt", "flow_id", "event_dt"),
+        # Daily partitions, see `dashfrog.partitions`
+        {"postgresql_partition_by": "RANGE (event_dt)"},
     )
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
-    flow_id: Mapped[str]
-    event_name: Mapped[str]
-    event_dt: Mapped[datetime] = mapped_column(server_default=func.now())
-    labels: Mapped[dict] = mapped_column(JSONB)
+    # Trace id of the flow
+    flow_id: Mapped[UUID] = mapped_column(SQLAlchemyUUID(as_uuid=True))
+    event_kind: Mapped[int] = mapped_column(SmallInteger)
+    # Name of custom events, NULL for flow and step lifecycle events
+    event_name: Mapped[str | None]
+    # Part of the primary key, as the partition key
+    event_dt: Mapped[datetime] = mapped_column(primary_key=True, server_default=func.now())
+    flow_group_id: Mapped[int] = mapped_column(BigInteger)
+    label_set_id: Mapped[int] = mapped_column(BigInteger)
+    tenant: Mapped[str]
+    flow_name: Mapped[str]
+    step_name: Mapped[str | None]
+
+    flow_group: Mapped["FlowGroup"] = relationship(
+        primaryjoin="foreign(FlowEvent.flow_group_id) == FlowGroup.id", viewonly=True
+    )
+    label_set: Mapped["LabelSet"] = relationship(
+        primaryjoin="foreign(FlowEvent.label_set_id) == LabelSet.id", viewonly=True
+    )
+
+    @property
+    def group_id(self) -> str:
+        return self.flow_group.group_id
+
+    @property
+    def labels(self) -> dict:
+        return self.label_set.labels
+
+
+class FlowRun(Base):
+    """
+    One row per flow run, upserted at ingestion from the flow start and end events.
+
+    A run is keyed by its trace id and flow group, as several flows may run in the same trace.
+
+    Events of a run may be written out of order (e.g. by different processes), so the
+    upsert keeps the earliest start and the latest end it has seen.
+    """
+
+    __tablename__ = "flow_run"
+    __table_args__ = (
+        Index("ix_flow_run_tenant_started_at", "tenant", "started_at"),
+        Index("ix_flow_run_tenant_flow_name_started_at", "tenant", "flow_name", "started_at"),
+        # Latest run of each group, and runs to roll up
+        Index("ix_flow_run_flow_group_id_started_at", "flow_group_id", "started_at"),
+        Index("ix_flow_run_updated_at", "updated_at"),
+    )
+
+    flow_id: Mapped[UUID] = mapped_column(SQLAlchemyUUID(as_uuid=True), primary_key=True)
+    flow_group_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    label_set_id: Mapped[int] = mapped_column(BigInteger)
+    tenant: Mapped[str]
+    flow_name: Mapped[str]
+    status: Mapped[Literal["running", "success", "failure"]] = mapped_column(String)
+    started_at: Mapped[datetime | None]
+    ended_at: Mapped[datetime | None]
+    duration: Mapped[timedelta | None] = mapped_column(Interval, Computed("ended_at - started_at"))
+    updated_at: Mapped[datetime] = mapped_column(server_default=text("timezone('utc', now())"))
+
+
+class FlowRollup(Base):
+    """
+    Flow run stats per flow group and bucket of run start time, see `dashfrog.rollups`.
+
+    `duration_sketch` maps log-bucket indexes to run counts, so it can be merged across buckets.
+    """
+
+    __tablename__ = "flow_rollup"
+
+    resolution: Mapped[Literal["minute", "hour", "day"]] = mapped_column(String, primary_key=True)
+    bucket: Mapped[datetime] = mapped_column(primary_key=True)
+    flow_group_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    run_count: Mapped[int] = mapped_column(BigInteger)
+    success_count: Mapped[int] = mapped_column(BigInteger)
+    failed_count: Mapped[int] = mapped_column(BigInteger)
+    duration_count: Mapped[int] = mapped_column(BigInteger)
+    duration_sum: Mapped[timedelta] = mapped_column(Interval)
+    duration_min: Mapped[timedelta | None] = mapped_column(Interval)
+    duration_max: Mapped[timedelta | None] = mapped_column(Interval)
+    last_started_at: Mapped[datetime]
+    duration_sketch: Mapped[dict] = mapped_column(JSONB)
+
+
+class FlowRollupState(Base):
+    """Watermarks of the rollups: they reflect every run upserted before `watermark`."""
+
+    __tablename__ = "flow_rollup_state"
+
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    watermark: Mapped[datetime]
+
+
+class FlowGroup(Base):
+    """
+    Dictionary of flow groups (flow name, tenant and label values), referenced by flow events.
+
+    `id` is a hash of `group_id` computed by the SDK, see `dashfrog.ingest`.
+    """
+
+    __tablename__ = "flow_group"
+    __table_args__ = (Index("ix_flow_group_tenant_flow_name", "tenant", "flow_name"),)
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
     group_id: Mapped[str]
+    flow_name: Mapped[str]
     tenant: Mapped[str]
-    flow_metadata: Mapped[dict] = mapped_column(JSONB)
+    label_set_id: Mapped[int] = mapped_column(BigInteger)
+
+
+class LabelSet(Base):
+    """
+    Dictionary of distinct flow label sets, referenced by flow events and flow groups.
+
+    `id` is a hash of the canonical JSON of `labels` computed by the SDK, see `dashfrog.ingest`.
+    """
+
+    __tablename__ = "label_set"
+    # Containment (`@>`) of label values
+    __table_args__ = (
+        Index("ix_label_set_labels", "labels", postgresql_using="gin", postgresql_ops={"labels": "jsonb_path_ops"}),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    labels: Mapped[dict] = mapped_column(JSONB)
+
+
+class FlowLabelValue(Base):
+    """
+    Dictionary of the label values of flow runs, with the last time a run started with them.
+
+    Upserted at ingestion from flow start events, at most once per value and interval, see `dashfrog.ingest`.
+    """
+
+    __tablename__ = "flow_label_value"
+    __table_args__ = (Index("ix_flow_label_value_last_seen", "last_seen"),)
+
+    flow_name: Mapped[str] = mapped_column(String, primary_key=True)
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    value: Mapped[str] = mapped_column(String, primary_key=True)
+    last_seen: Mapped[datetime]
+
+
+class Tenant(Base):
+    """
+    Dictionary of the tenants of flow events, with the last time an event was written for them.
+
+    Upserted at ingestion, at most once per tenant and interval, see `dashfrog.ingest`.
+    """
+
+    __tablename__ = "tenant"
+    __table_args__ = (Index("ix_tenant_last_seen", "last_seen"),)
+
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    last_seen: Mapped[datetime]
 
 
 class Flow(Base):
@@ -0,0 +1,169 @@
+"""
+Daily range partitions of `flow_event`.
+
+`flow_event` is partitioned by `event_dt`, with one `flow_event_pYYYYMMDD` partition per UTC day
+and a `flow_event_default` partition catching events outside of them. Queries filtering on
+`event_dt` only scan the partitions of their window, and expired days are dropped as a whole
+instead of being deleted row by row.
+
+Partitions are maintained by `maintain_partitions`, the `dashfrog partitions` command, or a
+`PartitionMaintainer`: it creates the partitions of the coming days, moving the events already
+caught by the default partition, and detaches or drops the days older than the retention.
+"""
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from logging import exception
+import threading
+from typing import Literal
+
+from sqlalchemy import Connection, Engine, text
+
+PARTITIONED_TABLE = "flow_event"
+DEFAULT_PARTITION = "flow_event_default"
+_PARTITION_PREFIX = "flow_event_p"
+# Arbitrary key of the advisory lock serializing maintenance across processes
+_MAINTENANCE_LOCK_KEY = 0x64667032
+
+
+@dataclass
+class PartitionReport:
+    """Partitions created, detached and dropped by a maintenance run."""
+
+    created: list[str] = field(default_factory=list)
+    detached: list[str] = field(default_factory=list)
+    dropped: list[str] = field(default_factory=list)
+
+
+def partition_name(day: date) -> str:
+    """Name of the partition holding the events of `day`."""
+    return f"{_PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+def partition_day(name: str) -> date | None:
+    """Day of a partition from its name, None for the default partition or other tables."""
+    try:
+        return datetime.strptime(name.removeprefix(_PARTITION_PREFIX), "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+def list_partitions(conn: Connection) -> dict[date, str]:
+    """Daily partitions attached to `flow_event`, by day."""
+    names = conn.execute(
+        text("""
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(:table)
+        """),
+        {"table": PARTITIONED_TABLE},
+    ).scalars()
+    return {day: name for name in names if name.startswith(_PARTITION_PREFIX) and (day := partition_day(name))}
+
+
+def create_partition(conn: Connection, day: date) -> str:
+    """
+    Create the partition of `day`.
+
+    Events of that day already caught by the default partition are moved to it, as Postgres
+    refuses to attach a partition whose rows would still match the default one.
+    """
+    name = partition_name(day)
+    start, end = day.isoformat(), (day + timedelta(days=1)).isoformat()
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {PARTITIONED_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    conn.execute(
+        text(f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION} WHERE event_dt >= :start AND event_dt < :end RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """),
+        {"start": start, "end": end},
+    )
+    conn.execute(
+        text(f"ALTER TABLE {PARTITIONED_TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')")
+    )
+    return name
+
+
+def maintain_partitions(
+    engine: Engine,
+    premake_days: int = 7,
+    retention_days: int | None = None,
+    expired_action: Literal["drop", "detach"] = "drop",
+    today: date | None = None,
+) -> PartitionReport | None:
+    """
+    Create the partitions of the coming days, and detach or drop the expired ones.
+
+    Args:
+        engine: Engine to maintain the partitions with
+        premake_days: Number of days after today to create partitions for
+        retention_days: Partitions of days older than this are expired, None keeps them forever
+        expired_action: "drop" expired partitions, or only "detach" them, e.g. to archive them first
+        today: Current UTC day, defaults to the database's
+
+    Returns:
+        What was changed, or None if another process is maintaining the partitions.
+    """
+    report = PartitionReport()
+    with engine.begin() as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _MAINTENANCE_LOCK_KEY}).scalar():
+            return None
+
+        today = today or conn.execute(text("SELECT (timezone('utc', now()))::date")).scalar_one()
+        partitions = list_partitions(conn)
+
+        for offset in range(premake_days + 1):
+            day = today + timedelta(days=offset)
+            if day not in partitions:
+                report.created.append(create_partition(conn, day))
+
+        if retention_days is not None:
+            for day, name in sorted(partitions.items()):
+                if day >= today - timedelta(days=retention_days):
+                    break
+                conn.execute(text(f"ALTER TABLE {PARTITIONED_TABLE} DETACH PARTITION {name}"))
+                if expired_action == "drop":
+                    conn.execute(text(f"DROP TABLE {name}"))
+                    report.dropped.append(name)
+                else:
+                    report.detached.append(name)
+    return report
+
+
+class PartitionMaintainer:
+    """Maintain the partitions every `interval` seconds from a daemon thread."""
+
+    def __init__(
+        self,
+        engine: Engine,
+        interval: float = 3600.0,
+        premake_days: int = 7,
+        retention_days: int | None = None,
+        expired_action: Literal["drop", "detach"] = "drop",
+    ):
+        self.engine = engine
+        self.interval = interval
+        self.premake_days = premake_days
+        self.retention_days = retention_days
+        self.expired_action: Literal["drop", "detach"] = expired_action
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="dashfrog-partition-maintainer", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self, timeout: float | None = 10.0) -> None:
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                maintain_partitions(self.engine, self.premake_days, self.retention_days, self.expired_action)
+            except Exception:
+                exception("DashFrog failed to maintain flow event partitions")
+            self._stopped.wait(self.interval)
@@ -0,0 +1,293 @@
+"""
+Time-bucketed rollups of flow runs.
+
+`flow_rollup` holds, per flow group and per minute, hour and day bucket of run start time,
+the run counts, duration stats and a mergeable duration sketch. Long windows are answered
+from the coarsest buckets they cover, and only the unaligned edges read `flow_run`.
+
+Rollups are refreshed incrementally: every run upserted since the last watermark marks its
+hour as stale, stale hours are recomputed from `flow_run`, and their days from the hours.
+Refresh with `refresh_rollups`, the `dashfrog rollups` command, or a `RollupMaintainer`.
+
+The duration sketch is a log-bucketed histogram (`{bucket index: run count}`): bucket `i`
+counts durations in `(gamma^(i-1), gamma^i]` seconds, so quantiles derived from merged
+sketches are within `SKETCH_RELATIVE_ACCURACY` of the exact value.
+"""
+
+from collections.abc import Iterable, Mapping
+from datetime import datetime, timedelta
+from logging import exception
+import threading
+from typing import Literal
+
+from sqlalchemy import Connection, Engine, text
+
+ResolutionT = Literal["day", "hour", "minute"]
+
+# Coarsest first, with the size of their buckets
+RESOLUTIONS: dict[ResolutionT, timedelta] = {
+    "day": timedelta(days=1),
+    "hour": timedelta(hours=1),
+    "minute": timedelta(minutes=1),
+}
+
+SKETCH_RELATIVE_ACCURACY = 0.02
+SKETCH_GAMMA = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+# Durations below are counted in the lowest bucket
+SKETCH_MIN_SECONDS = 0.001
+
+_STATE_NAME = "flow_rollup"
+# Arbitrary key of the advisory lock serializing refreshes across processes
+_REFRESH_LOCK_KEY = 0x64667231
+
+_STALE_HOURS = text("""
+    SELECT DISTINCT date_trunc('hour', started_at)
+    FROM flow_run
+    WHERE updated_at >= :low AND updated_at < :high AND started_at IS NOT NULL
+""")
+
+_ROLLUP_COLUMNS = (
+    "resolution, bucket, flow_group_id, run_count, success_count, failed_count, duration_count, "
+    "duration_sum, duration_min, duration_max, last_started_at, duration_sketch"
+)
+
+_DELETE_ROLLUPS = text("""
+    DELETE FROM flow_rollup WHERE resolution = :resolution AND bucket >= :start AND bucket < :end
+""")
+
+_ROLLUP_FROM_RUNS = text(f"""
+    INSERT INTO flow_rollup ({_ROLLUP_COLUMNS})
+    SELECT :resolution, stats.*, coalesce(sketch.duration_sketch, '{{}}'::jsonb)
+    FROM (
+        SELECT
+            date_trunc(:resolution, started_at) AS bucket,
+            flow_group_id,
+            count(*) AS run_count,
+            count(*) FILTER (WHERE status = 'success') AS success_count,
+            count(*) FILTER (WHERE status = 'failure') AS failed_count,
+            count(duration) AS duration_count,
+            coalesce(sum(duration), interval '0') AS duration_sum,
+            min(duration) AS duration_min,
+            max(duration) AS duration_max,
+            max(started_at) AS last_started_at
+        FROM flow_run
+        WHERE started_at >= :start AND started_at < :end
+        GROUP BY 1, 2
+    ) stats
+    LEFT JOIN (
+        SELECT bucket, flow_group_id, jsonb_object_agg(sketch_index, runs) AS duration_sketch
+        FROM (
+            SELECT
+                date_trunc(:resolution, started_at) AS bucket,
+                flow_group_id,
+                ceil(ln(greatest(extract(epoch FROM duration), :min_seconds)) / ln(:gamma))::int AS sketch_index,
+                count(*) AS runs
+            FROM flow_run
+            WHERE started_at >= :start AND started_at < :end AND duration IS NOT NULL
+            GROUP BY 1, 2, 3
+        ) indexes
+        GROUP BY 1, 2
+    ) sketch USING (bucket, flow_group_id)
+""")
+
+_DAY_FROM_HOURS = text(f"""
+    INSERT INTO flow_rollup ({_ROLLUP_COLUMNS})
+    SELECT 'day', stats.*, coalesce(sketch.duration_sketch, '{{}}'::jsonb)
+    FROM (
+        SELECT
+            date_trunc('day', bucket) AS bucket,
+            flow_group_id,
+            sum(run_count) AS run_count,
+            sum(success_count) AS success_count,
+            sum(failed_count) AS failed_count,
+            sum(duration_count) AS duration_count,
+            sum(duration_sum) AS duration_sum,
+            min(duration_min) AS duration_min,
+            max(duration_max) AS duration_max,
+            max(last_started_at) AS last_started_at
+        FROM flow_rollup
+        WHERE resolution = 'hour' AND bucket >= :start AND bucket < :end
+        GROUP BY 1, 2
+    ) stats
+    LEFT JOIN (
+        SELECT bucket, flow_group_id, jsonb_object_agg(sketch_index, runs) AS duration_sketch
+        FROM (
+            SELECT date_trunc('day', bucket) AS bucket, flow_group_id, kv.key AS sketch_index, sum(kv.value::bigint) AS runs
+            FROM flow_rollup, jsonb_each_text(duration_sketch) AS kv
+            WHERE resolution = 'hour' AND bucket >= :start AND bucket < :end
+            GROUP BY 1, 2, 3
+        ) indexes
+        GROUP BY 1, 2
+    ) sketch USING (bucket, flow_group_id)
+""")
+
+
+def refresh_rollups(engine: Engine, lag: timedelta = timedelta(minutes=1)) -> datetime | None:
+    """
+    Recompute the rollups of the runs upserted since the last refresh.
+
+    Args:
+        engine: Engine to refresh with
+        lag: Runs upserted less than `lag` ago are left for the next refresh, so transactions
+            still in flight when the refresh starts are not skipped
+
+    Returns:
+        The new watermark: rollups reflect every run upserted before it.
+        None if another process is refreshing the rollups.
+    """
+    with engine.begin() as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _REFRESH_LOCK_KEY}).scalar():
+            return None
+
+        low = conn.execute(
+            text("SELECT watermark FROM flow_rollup_state WHERE name = :name FOR UPDATE"), {"name": _STATE_NAME}
+        ).scalar()
+        high = conn.execute(text("SELECT timezone('utc', now()) - :lag"), {"lag": lag}).scalar_one()
+        if low is not None and high <= low:
+            return low
+
+        stale_hours = conn.execute(_STALE_HOURS, {"low": low or datetime.min, "high": high}).scalars()
+        hour = RESOLUTIONS["hour"]
+        for start, end in _ranges(stale_hours, hour):
+            for resolution in ("minute", "hour"):
+                params = {"resolution": resolution, "start": start, "end": end}
+                conn.execute(_DELETE_ROLLUPS, params)
+                conn.execute(_ROLLUP_FROM_RUNS, {**params, "gamma": SKETCH_GAMMA, "min_seconds": SKETCH_MIN_SECONDS})
+
+            day_start, day_end = floor_bucket(start, "day"), ceil_bucket(end, "day")
+            conn.execute(_DELETE_ROLLUPS, {"resolution": "day", "start": day_start, "end": day_end})
+            conn.execute(_DAY_FROM_HOURS, {"start": day_start, "end": day_end})
+
+        conn.execute(
+            text("""
+                INSERT INTO flow_rollup_state (name, watermark) VALUES (:name, :watermark)
+                ON CONFLICT (name) DO UPDATE SET watermark = excluded.watermark
+            """),
+            {"name": _STATE_NAME, "watermark": high},
+        )
+    return high
+
+
+def get_watermark(conn: Connection) -> datetime | None:
+    """Time before which the rollups reflect every run, or None if they were never refreshed."""
+    return conn.execute(
+        text("SELECT watermark FROM flow_rollup_state WHERE name = :name"), {"name": _STATE_NAME}
+    ).scalar()
+
+
+def decompose_window(
+    start: datetime, end: datetime, watermark: datetime | None
+) -> list[tuple[ResolutionT | None, datetime, datetime]]:
+    """
+    Split `[start, end)` into the coarsest rollup buckets it covers, and raw edges.
+
+    Only the part before `watermark` can be answered from rollups.
+
+    Returns:
+        `(resolution, start, end)` segments, with resolution None for segments to read from raw runs
+    """
+    rollup_end = min(end, floor_bucket(watermark, "minute")) if watermark is not None else start
+    if rollup_end <= start:
+        return [(None, start, end)]
+
+    segments = _decompose(start, rollup_end, list(RESOLUTIONS))
+    if rollup_end < end:
+        segments.append((None, rollup_end, end))
+    return segments
+
+
+def floor_bucket(dt: datetime, resolution: ResolutionT) -> datetime:
+    """Start of the bucket containing `dt`."""
+    if resolution == "day":
+        return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    if resolution == "hour":
+        return dt.replace(minute=0, second=0, microsecond=0)
+    return dt.replace(second=0, microsecond=0)
+
+
+def ceil_bucket(dt: datetime, resolution: ResolutionT) -> datetime:
+    """Start of the first bucket starting at or after `dt`."""
+    floor = floor_bucket(dt, resolution)
+    return floor if floor == dt else floor + RESOLUTIONS[resolution]
+
+
+def merge_sketches(sketches: Iterable[Mapping[str, int] | None]) -> dict[int, int]:
+    """Merge duration sketches, e.g. of several rollup buckets."""
+    merged: dict[int, int] = {}
+    for sketch in sketches:
+        for index, count in (sketch or {}).items():
+            merged[int(index)] = merged.get(int(index), 0) + count
+    return merged
+
+
+def sketch_quantile(sketch: Mapping[int, int], quantile: float) -> float | None:
+    """Approximate duration quantile in seconds, or None for an empty sketch."""
+    total = sum(sketch.values())
+    if total == 0:
+        return None
+
+    rank = quantile * (total - 1)
+    seen = 0
+    for index in sorted(sketch):
+        seen += sketch[index]
+        if seen > rank:
+            # Middle of the bucket, relative to its bounds
+            return 2 * SKETCH_GAMMA**index / (SKETCH_GAMMA + 1)
+    return 2 * SKETCH_GAMMA ** max(sketch) / (SKETCH_GAMMA + 1)
+
+
+class RollupMaintainer:
+    """Refresh the rollups every `interval` seconds from a daemon thread."""
+
+    def __init__(self, engine: Engine, interval: float = 60.0, lag: timedelta = timedelta(minutes=1)):
+        self.engine = engine
+        self.interval = interval
+        self.lag = lag
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="dashfrog-rollup-maintainer", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self, timeout: float | None = 10.0) -> None:
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                refresh_rollups(self.engine, self.lag)
+            except Exception:
+                exception("DashFrog failed to refresh flow rollups")
+            self._stopped.wait(self.interval)
+
+
+def _decompose(
+    start: datetime, end: datetime, resolutions: list[ResolutionT]
+) -> list[tuple[ResolutionT | None, datetime, datetime]]:
+    if start >= end:
+        return []
+    if not resolutions:
+        return [(None, start, end)]
+
+    resolution, finer = resolutions[0], resolutions[1:]
+    aligned_start, aligned_end = ceil_bucket(start, resolution), floor_bucket(end, resolution)
+    if aligned_start >= aligned_end:
+        return _decompose(start, end, finer)
+    return [
+        *_decompose(start, aligned_start, finer),
+        (resolution, aligned_start, aligned_end),
+        *_decompose(aligned_end, end, finer),
+    ]
+
+
+def _ranges(buckets: Iterable[datetime], size: timedelta) -> list[tuple[datetime, datetime]]:
+    """Merge buckets of `size` into contiguous `[start, end)` ranges."""
+    ranges: list[tuple[datetime, datetime]] = []
+    for bucket in sorted(buckets):
+        if ranges and ranges[-1][1] == bucket:
+            ranges[-1] = (ranges[-1][0], bucket + size)
+        else:
+            ranges.append((bucket, bucket + size))
+    return ranges
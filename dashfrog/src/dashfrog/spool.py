@@ -0,0 +1,303 @@
+"""
+Disk-backed spool for flow events.
+
+Events are appended to local segment files and replayed into `flow_event` by a background
+drainer, so writes never block on (or fail because of) Postgres. Delivery is at-least-once:
+a crash between a committed batch and the next checkpoint replays that batch.
+
+Layout of the spool directory:
+    segment-000000000001.log   appended records, one per line: "<crc32 hex> <json>\\n"
+    segment-000000000002.log   ...
+    checkpoint                 {"segment": <seq>, "offset": <bytes>} of the next record to replay
+"""
+
+from datetime import datetime, timezone
+import json
+from logging import exception, warning
+import os
+from pathlib import Path
+import threading
+from typing import Any
+import zlib
+
+from sqlalchemy import Engine
+
+from .ingest import bulk_write
+
+_SEGMENT_PREFIX = "segment-"
+_SEGMENT_SUFFIX = ".log"
+_CHECKPOINT = "checkpoint"
+_MAX_BACKOFF_SECONDS = 30.0
+
+
+def encode_record(event: dict[str, Any]) -> bytes:
+    """Encode a flow event as a spool record."""
+    event_dt = event.get("event_dt") or datetime.now(timezone.utc).replace(tzinfo=None)
+    payload = json.dumps({**event, "event_dt": event_dt.isoformat()}, separators=(",", ":")).encode()
+    return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+
+def decode_record(line: bytes) -> dict[str, Any] | None:
+    """Decode a spool record, or return None if it is torn or corrupted."""
+    if not line.endswith(b"\n") or len(line) < 10:
+        return None
+
+    checksum, payload = line[:8], line[9:-1]
+    try:
+        if int(checksum, 16) != zlib.crc32(payload):
+            return None
+        event = json.loads(payload)
+    except ValueError:
+        return None
+
+    event["event_dt"] = datetime.fromisoformat(event["event_dt"])
+    return event
+
+
+class Spool:
+    """
+    Append flow events to local segment files and drain them into Postgres.
+
+    Appends are sequential buffered writes handed to the OS, so they cost microseconds and
+    never wait on the database. The active segment is rotated once it reaches `segment_size`
+    bytes. When undrained segments exceed `max_size` bytes, new events are dropped and
+    counted in `dropped` rather than filling the disk.
+
+    A single drainer thread replays segments in order, `batch_size` events per `COPY`, and
+    persists its position in an atomically replaced checkpoint file after each commit.
+    While Postgres is unreachable it retries with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        engine: Engine,
+        segment_size: int = 16 * 1024 * 1024,
+        max_size: int = 1024 * 1024 * 1024,
+        batch_size: int = 500,
+        drain_interval: float = 1.0,
+        fsync: bool = False,
+        notify_runs: bool = False,
+    ):
+        self.directory = Path(directory)
+        self.engine = engine
+        self.segment_size = segment_size
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.drain_interval = drain_interval
+        self.fsync = fsync
+        self.notify_runs = notify_runs
+        self.dropped = 0
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._drained = threading.Condition(self._lock)
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._closed = False
+
+        # Segment sizes by sequence number, for every segment not fully drained yet
+        self._segments: dict[int, int] = {seq: self._segment_path(seq).stat().st_size for seq in self._list_segments()}
+        self._checkpoint = self._load_checkpoint()
+        for seq in [seq for seq in self._segments if seq < self._checkpoint[0]]:
+            self._delete_segment(seq)
+
+        # Always append to a fresh segment, a previous process may have left a torn record behind
+        self._active_seq = max(self._segments, default=self._checkpoint[0] - 1) + 1
+        self._active_file = self._open_segment(self._active_seq)
+
+        self._lag_origin: datetime | None = None
+        self._thread = threading.Thread(target=self._run, name="dashfrog-spool-drainer", daemon=True)
+        self._thread.start()
+
+    @property
+    def depth_bytes(self) -> int:
+        """Bytes appended but not replayed into Postgres yet."""
+        with self._lock:
+            return sum(self._segments.values()) - self._checkpoint[1]
+
+    @property
+    def segment_count(self) -> int:
+        """Number of segment files on disk."""
+        with self._lock:
+            return len(self._segments)
+
+    @property
+    def lag_seconds(self) -> float:
+        """Age of the oldest event not replayed into Postgres yet."""
+        origin = self._lag_origin
+        if origin is None:
+            return 0.0
+        return max((datetime.now(timezone.utc).replace(tzinfo=None) - origin).total_seconds(), 0.0)
+
+    def put(self, event: dict[str, Any]) -> None:
+        """Append an event to the spool. Never blocks on the database."""
+        record = encode_record(event)
+
+        with self._lock:
+            if self._closed or sum(self._segments.values()) - self._checkpoint[1] + len(record) > self.max_size:
+                self.dropped += 1
+                return
+
+            if self._segments[self._active_seq] + len(record) > self.segment_size and self._segments[self._active_seq]:
+                self._rotate()
+
+            self._active_file.write(record)
+            self._active_file.flush()
+            self._segments[self._active_seq] += len(record)
+            if self._lag_origin is None:
+                self._lag_origin = event.get("event_dt") or datetime.now(timezone.utc).replace(tzinfo=None)
+
+        self._wakeup.set()
+
+    def put_nowait(self, event: dict[str, Any]) -> bool:
+        """Append an event to the spool. Appends never wait, so this always returns True."""
+        self.put(event)
+        return True
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Wait until every event appended so far is replayed into Postgres.
+
+        Returns:
+            True if the spool was drained before `timeout` expired
+        """
+        with self._lock:
+            target = (self._active_seq, self._segments[self._active_seq])
+            self._wakeup.set()
+            return self._drained.wait_for(lambda: self._checkpoint >= target, timeout)
+
+    def close(self, timeout: float | None = 10.0) -> None:
+        """Stop accepting events, try to drain what is left, and stop the drainer."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._sync(self._active_file)
+
+        self.flush(timeout)
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+        self._active_file.close()
+
+    def _run(self) -> None:
+        backoff = self.drain_interval
+        while True:
+            try:
+                pending = self._drain_batch()
+            except Exception:
+                exception(f"DashFrog failed to replay spooled flow events, retrying in {backoff:.0f}s")
+                if self._stopped.wait(backoff):
+                    return
+                backoff = min(backoff * 2, _MAX_BACKOFF_SECONDS)
+                continue
+
+            backoff = self.drain_interval
+            if pending:
+                continue
+            if self._closed:
+                return
+
+            self._wakeup.wait(self.drain_interval)
+            self._wakeup.clear()
+
+    def _drain_batch(self) -> bool:
+        """Replay the next batch of records. Returns True if more records are pending."""
+        with self._lock:
+            seq, offset = self._checkpoint
+            active_seq = self._active_seq
+            segments = dict(self._segments)
+
+        batch: list[dict[str, Any]] = []
+        while len(batch) < self.batch_size:
+            limit = segments.get(seq, 0)
+            if offset >= limit:
+                if seq >= active_seq:
+                    break
+                seq, offset = min(s for s in segments if s > seq), 0
+                continue
+
+            offset = self._read_records(seq, offset, limit, batch)
+
+        if batch:
+            self._lag_origin = batch[0]["event_dt"]
+            bulk_write(batch, self.engine, notify_runs=self.notify_runs)
+
+        self._save_checkpoint((seq, offset))
+        with self._lock:
+            self._checkpoint = (seq, offset)
+            for drained_seq in [s for s in self._segments if s < seq]:
+                self._delete_segment(drained_seq)
+            pending = self._checkpoint < (self._active_seq, self._segments[self._active_seq])
+            if not pending:
+                self._lag_origin = None
+            self._drained.notify_all()
+
+        return pending and not self._stopped.is_set()
+
+    def _read_records(self, seq: int, offset: int, limit: int, batch: list[dict[str, Any]]) -> int:
+        """Read records of a segment into `batch`, returns the offset of the next unread record."""
+        with open(self._segment_path(seq), "rb") as f:
+            f.seek(offset)
+            while offset < limit and len(batch) < self.batch_size:
+                line = f.readline(limit - offset)
+                event = decode_record(line)
+                if event is None:
+                    warning(f"DashFrog skipped a corrupted spool record in segment {seq} at offset {offset}")
+                    if not line.endswith(b"\n"):
+                        # Torn write at the tail of a segment from a crashed process
+                        return limit
+                else:
+                    batch.append(event)
+                offset += len(line)
+        return offset
+
+    def _rotate(self) -> None:
+        self._sync(self._active_file)
+        self._active_file.close()
+        self._active_seq += 1
+        self._active_file = self._open_segment(self._active_seq)
+
+    def _open_segment(self, seq: int):
+        self._segments.setdefault(seq, 0)
+        return open(self._segment_path(seq), "ab")
+
+    def _delete_segment(self, seq: int) -> None:
+        self._segments.pop(seq, None)
+        self._segment_path(seq).unlink(missing_ok=True)
+
+    def _sync(self, f) -> None:
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    def _segment_path(self, seq: int) -> Path:
+        return self.directory / f"{_SEGMENT_PREFIX}{seq:012d}{_SEGMENT_SUFFIX}"
+
+    def _list_segments(self) -> list[int]:
+        return sorted(
+            int(path.name.removeprefix(_SEGMENT_PREFIX).removesuffix(_SEGMENT_SUFFIX))
+            for path in self.directory.glob(f"{_SEGMENT_PREFIX}*{_SEGMENT_SUFFIX}")
+        )
+
+    def _load_checkpoint(self) -> tuple[int, int]:
+        try:
+            checkpoint = json.loads((self.directory / _CHECKPOINT).read_text())
+            return checkpoint["segment"], checkpoint["offset"]
+        except FileNotFoundError:
+            return min(self._segments, default=1), 0
+        except (ValueError, KeyError):
+            warning("DashFrog spool checkpoint is corrupted, replaying every segment")
+            return min(self._segments, default=1), 0
+
+    def _save_checkpoint(self, checkpoint: tuple[int, int]) -> None:
+        """Atomically replace the checkpoint file, so a crash leaves either the old or the new one."""
+        path = self.directory / _CHECKPOINT
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"segment": checkpoint[0], "offset": checkpoint[1]}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
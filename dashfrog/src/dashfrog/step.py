@@ -1,21 +1,17 @@
-from collections.abc import Generator
-from contextlib import contextmanager
+from collections.abc import AsyncGenerator, Generator
+from contextlib import asynccontextmanager, contextmanager, nullcontext
 from logging import warning
-
-from sqlalchemy import insert
-
-from dashfrog.models import FlowEvent
+from typing import Any
 
 from .constants import (
-    BAGGAGE_FLOW_LABEL_NAME,
     BAGGAGE_STEP_LABEL_NAME,
     EVENT_STEP_FAIL,
     EVENT_STEP_START,
     EVENT_STEP_SUCCESS,
-    TENANT_LABEL_NAME,
 )
+from .context import get_flow_context, use_flow_context
 from .dashfrog import get_dashfrog_instance
-from .utils import generate_flow_group_id, get_flow_id, get_labels_from_baggage, write_to_baggage
+from .utils import write_to_baggage
 
 
 @contextmanager
@@ -42,8 +38,8 @@ def start(name: str, end_on_exit: bool = True) -> Generator[None, None, None]:
     Automatically linked to current flow via baggage, records to Postgres.
     """
 
-    # Set step name in baggage
-    with write_to_baggage({BAGGAGE_STEP_LABEL_NAME: name}):
+    # Set step name in baggage and in the flow context
+    with write_to_baggage({BAGGAGE_STEP_LABEL_NAME: name}), _step_context(name):
         # Write START event
         _write_step_event(EVENT_STEP_START)
 
@@ -60,42 +56,68 @@ def start(name: str, end_on_exit: bool = True) -> Generator[None, None, None]:
                 _write_step_event(EVENT_STEP_SUCCESS)
 
 
-def _write_step_event(event_name: str) -> None:
-    """Write step event to Postgres."""
+@asynccontextmanager
+async def astart(name: str, end_on_exit: bool = True) -> AsyncGenerator[None, None]:
+    """
+    Start a step within a flow from async code.
+
+    Same as `start`, but event writes never block the event loop.
+
+    Usage:
+        from dashfrog import step
+
+        async with step.astart("validate_order"):
+            # work
+            pass  # Automatically writes START and SUCCESS/FAIL events
+    """
+
+    # Set step name in baggage and in the flow context
+    with write_to_baggage({BAGGAGE_STEP_LABEL_NAME: name}), _step_context(name):
+        # Write START event
+        await _awrite_step_event(EVENT_STEP_START)
+
+        try:
+            yield
+        except Exception:
+            # Failure case
+            if end_on_exit:
+                await _awrite_step_event(EVENT_STEP_FAIL)
+            raise
+        else:
+            # Success case
+            if end_on_exit:
+                await _awrite_step_event(EVENT_STEP_SUCCESS)
+
+
+def _step_context(name: str):
+    """Derive the step context from the current flow, resolved once for the whole step."""
     try:
-        flow_id = get_flow_id()
-    except ValueError as e:
-        warning(e.args[0])
-        return
+        flow_context = get_flow_context()
+    except ValueError:
+        # Warned about on every event write, like a step outside of a flow always was
+        return nullcontext()
+    return use_flow_context(flow_context.with_step(name))
+
 
+def _current_step_event(event_name: str) -> dict[str, Any] | None:
+    """Build a step event for the step in the current context, or None if there is none."""
     try:
-        event_labels = get_labels_from_baggage(
-            mandatory_labels=[BAGGAGE_FLOW_LABEL_NAME, BAGGAGE_STEP_LABEL_NAME, TENANT_LABEL_NAME]
-        )
+        return get_flow_context(with_step=True).step_event(event_name)
     except ValueError as e:
         warning(e.args[0])
-        return
-
-    flow_name = event_labels.pop(BAGGAGE_FLOW_LABEL_NAME)
-    tenant = event_labels.pop(TENANT_LABEL_NAME)
-    step_name = event_labels.pop(BAGGAGE_STEP_LABEL_NAME)
-    group_id = generate_flow_group_id(flow_name, tenant, **event_labels)
-    dashfrog = get_dashfrog_instance()
-
-    with dashfrog.db_engine.begin() as conn:
-        conn.execute(
-            insert(FlowEvent).values(
-                flow_id=flow_id,
-                event_name=event_name,
-                tenant=tenant,
-                group_id=group_id,
-                flow_metadata={
-                    BAGGAGE_FLOW_LABEL_NAME: flow_name,
-                    BAGGAGE_STEP_LABEL_NAME: step_name,
-                },
-                labels=event_labels,
-            )
-        )
+        return None
+
+
+def _write_step_event(event_name: str) -> None:
+    """Write step event to Postgres."""
+    if (values := _current_step_event(event_name)) is not None:
+        get_dashfrog_instance().write_event(values)
+
+
+async def _awrite_step_event(event_name: str) -> None:
+    """Write step event to Postgres without blocking the event loop."""
+    if (values := _current_step_event(event_name)) is not None:
+        await get_dashfrog_instance().awrite_event(values)
 
 
 def success() -> None:
@@ -106,3 +128,13 @@ def success() -> None:
 def fail() -> None:
     """End the current step with failure."""
     _write_step_event(EVENT_STEP_FAIL)
+
+
+async def asuccess() -> None:
+    """End the current step with success from async code."""
+    await _awrite_step_event(EVENT_STEP_SUCCESS)
+
+
+async def afail() -> None:
+    """End the current step with failure from async code."""
+    await _awrite_step_event(EVENT_STEP_FAIL)
@@ -49,6 +49,11 @@ def generate_flow_group_id(flow_name: str, tenant: str, **labels: str) -> str:
     return f"{flow_name}$$tenant={tenant}$${serialized_labels}"
 
 
+def naive_utc(dt: datetime.datetime) -> datetime.datetime:
+    """Convert an aware datetime to naive UTC, as timestamps are stored without time zone."""
+    return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo is not None else dt
+
+
 def get_time_range_from_time_window(time_window: dict | None) -> tuple[datetime.datetime, datetime.datetime]:
     """
     Convert a time window configuration to absolute start and end datetimes.
@@ -0,0 +1,150 @@
+"""Buffered background writer for flow and step events."""
+
+from dataclasses import dataclass, field
+from logging import exception, warning
+import queue
+import threading
+import time
+from typing import Any, Literal
+
+from sqlalchemy import Engine
+
+from .ingest import bulk_write
+
+OverflowPolicyT = Literal["block", "drop"]
+
+
+@dataclass
+class _FlushRequest:
+    """Marker put on the queue to force the worker to write its pending batch."""
+
+    done: threading.Event = field(default_factory=threading.Event)
+
+
+class EventWriter:
+    """
+    Write flow events from a background thread in batches.
+
+    Events are put on a bounded in-process queue and a single worker thread drains it,
+    copying a batch to Postgres as soon as `batch_size` events are pending or
+    `flush_interval` seconds have passed since the first pending event, whichever comes first.
+
+    When the queue is full, `overflow` decides what happens to new events:
+        - "block": the caller waits until the worker frees some room
+        - "drop": the event is discarded and counted in `dropped`
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        queue_size: int = 10_000,
+        overflow: OverflowPolicyT = "block",
+        notify_runs: bool = False,
+    ):
+        self.engine = engine
+        self.notify_runs = notify_runs
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.dropped = 0
+
+        self._queue: queue.Queue[dict[str, Any] | _FlushRequest | None] = queue.Queue(maxsize=queue_size)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="dashfrog-event-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, event: dict[str, Any]) -> None:
+        """Enqueue an event for the next batch."""
+        if self._closed:
+            warning("DashFrog event writer is closed, event dropped")
+            self.dropped += 1
+            return
+
+        if self.overflow == "block":
+            self._queue.put(event)
+            return
+
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def put_nowait(self, event: dict[str, Any]) -> bool:
+        """
+        Enqueue an event without ever waiting.
+
+        Returns:
+            False if the queue is full and the overflow policy is "block", in which case
+            the event was not enqueued and the caller should `put` it from a thread
+        """
+        if self.overflow == "block" and not self._closed:
+            try:
+                self._queue.put_nowait(event)
+            except queue.Full:
+                return False
+            return True
+
+        self.put(event)
+        return True
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Write every event enqueued so far.
+
+        Returns:
+            True if the pending events were written before `timeout` expired
+        """
+        if not self._thread.is_alive():
+            return self._queue.empty()
+
+        request = _FlushRequest()
+        self._queue.put(request)
+        return request.done.wait(timeout)
+
+    def close(self, timeout: float | None = 10.0) -> None:
+        """Flush pending events and stop the worker thread."""
+        if self._closed:
+            return
+        self._closed = True
+
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        batch: list[dict[str, Any]] = []
+        deadline: float | None = None
+
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = _FlushRequest()
+
+            if isinstance(item, dict):
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(batch) < self.batch_size:
+                    continue
+                item = _FlushRequest()
+
+            self._write(batch)
+            batch, deadline = [], None
+
+            if item is None:
+                return
+            item.done.set()
+
+    def _write(self, batch: list[dict[str, Any]]) -> None:
+        if not batch:
+            return
+
+        try:
+            bulk_write(batch, self.engine, notify_runs=self.notify_runs)
+        except Exception:
+            exception(f"DashFrog failed to write {len(batch)} flow events")
+            self.dropped += len(batch)
@@ -28,7 +28,8 @@ def test_engine():
 @pytest.fixture
 def setup_dashfrog(test_engine):
     """Initialize DashFrog with test database."""
-    from dashfrog import get_dashfrog_instance
+    from dashfrog import get_dashfrog_instance, ingest
+    from dashfrog.api import result_cache
     from dashfrog.models import Base
 
     config = Config()
@@ -38,12 +39,25 @@ def setup_dashfrog(test_engine):
     dashfrog = get_dashfrog_instance()
     with dashfrog.db_engine.begin() as conn:
         conn.execute(Base.metadata.tables["flow_event"].delete())
+        conn.execute(Base.metadata.tables["flow_run"].delete())
+        conn.execute(Base.metadata.tables["flow_rollup"].delete())
+        conn.execute(Base.metadata.tables["flow_rollup_state"].delete())
+        conn.execute(Base.metadata.tables["flow_group"].delete())
+        conn.execute(Base.metadata.tables["label_set"].delete())
+        conn.execute(Base.metadata.tables["flow_label_value"].delete())
+        conn.execute(Base.metadata.tables["tenant"].delete())
         conn.execute(Base.metadata.tables["flow"].delete())
         conn.execute(Base.metadata.tables["metric"].delete())
         conn.execute(Base.metadata.tables["notebook"].delete())
+        conn.execute(Base.metadata.tables["comment"].delete())
 
     # Clear in-memory caches
     dashfrog._flows.clear()
     dashfrog._metrics.clear()
+    ingest._known_flow_groups.clear()
+    ingest._known_label_sets.clear()
+    ingest._seen_tenants.clear()
+    ingest._seen_label_values.clear()
+    result_cache._flow_query_cache = None
 
     yield
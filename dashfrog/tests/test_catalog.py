@@ -0,0 +1,80 @@
+"""Tests for the notification hub and the metric and flow definition catalog."""
+
+import asyncio
+
+from dashfrog import get_dashfrog_instance
+from dashfrog.api.catalog import DefinitionCatalog
+from dashfrog.api.notifications import NotificationHub
+from dashfrog.constants import CATALOG_CHANNEL
+
+import pytest
+
+
+def make_hub() -> NotificationHub:
+    # Not started: notifications are dispatched by hand
+    hub = NotificationHub(engine=None, channels=[CATALOG_CHANNEL])  # pyright: ignore[reportArgumentType]
+    hub.connected = True
+    return hub
+
+
+def notify(hub: NotificationHub, payload: str) -> None:
+    hub._dispatch(None, 0, CATALOG_CHANNEL, payload)
+
+
+class TestNotificationHub:
+    """Test the dispatch of notifications to subscribers."""
+
+    def test_subscribe(self):
+        hub, payloads = make_hub(), []
+        unsubscribe = hub.subscribe(CATALOG_CHANNEL, payloads.append)
+
+        notify(hub, "flow:import")
+        unsubscribe()
+        notify(hub, "flow:export")
+
+        assert payloads == ["flow:import"]
+
+    def test_unknown_channel(self):
+        with pytest.raises(ValueError):
+            make_hub().subscribe("unknown", print)
+
+
+class TestDefinitionCatalog:
+    """Test that definitions are cached until a registration is notified."""
+
+    def test_invalidated_by_registration(self, setup_dashfrog):
+        dashfrog, hub = get_dashfrog_instance(), make_hub()
+        catalog = DefinitionCatalog(hub)
+
+        async def metric_names() -> set[str]:
+            try:
+                return set(await catalog.metrics())
+            finally:
+                await dashfrog.close_async_db_engine()
+
+        dashfrog.register_metric("counter", "orders", "Orders", "count", ["region"])
+        assert asyncio.run(metric_names()) == {"orders"}
+
+        # Nothing listens for the notification of the registration, the catalog is still cached
+        dashfrog.register_metric("counter", "refunds", "Refunds", "count", ["region"])
+        assert asyncio.run(metric_names()) == {"orders"}
+
+        notify(hub, "metric:refunds")
+        assert catalog.version == 1
+        assert asyncio.run(metric_names()) == {"orders", "refunds"}
+
+    def test_not_cached_while_disconnected(self, setup_dashfrog):
+        dashfrog, hub = get_dashfrog_instance(), make_hub()
+        hub.connected = False
+        catalog = DefinitionCatalog(hub)
+
+        async def flow_names() -> list[str]:
+            try:
+                return [flow.name for flow in await catalog.flows()]
+            finally:
+                await dashfrog.close_async_db_engine()
+
+        dashfrog.register_flow("import", "region")
+        assert asyncio.run(flow_names()) == ["import"]
+        dashfrog.register_flow("export", "region")
+        assert asyncio.run(flow_names()) == ["export", "import"]
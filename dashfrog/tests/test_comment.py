@@ -0,0 +1,71 @@
+"""Tests for the comment endpoints."""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.orm import Session
+
+from dashfrog import get_dashfrog_instance
+from dashfrog.api.auth import create_access_token
+from dashfrog.api.comment import GetCommentsRequest, create_comment, get_comments, update_comment
+from dashfrog.api.schemas import CreateCommentRequest
+from dashfrog.models import Comment, Notebook
+
+
+def credentials() -> HTTPAuthorizationCredentials:
+    token = create_access_token({"sub": get_dashfrog_instance().config.api_username})
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+class TestComments:
+    """Test that comments can be written and read with aware datetimes."""
+
+    def test_aware_datetimes(self, setup_dashfrog):
+        # Request bodies carry a time zone, comments are stored as naive UTC
+        created = CreateCommentRequest.model_validate_json(
+            '{"emoji": "🚀", "title": "Release", "start": "2024-01-01T12:00:00Z", "end": "2024-01-01T13:00:00+01:00"}'
+        )
+        updated = CreateCommentRequest.model_validate_json(
+            '{"emoji": "🚀", "title": "Release", "start": "2024-01-01T12:30:00Z", "end": "2024-01-01T13:30:00+01:00"}'
+        )
+        listed = GetCommentsRequest.model_validate_json(
+            '{"start": "2024-01-01T11:00:00Z", "end": "2024-01-01T14:00:00Z"}'
+        )
+
+        async def run():
+            try:
+                comment = await create_comment(created, auth=None)
+                await update_comment(comment.id, updated, auth=None)
+                return await get_comments(listed, credentials())
+            finally:
+                await get_dashfrog_instance().close_async_db_engine()
+
+        (comment,) = asyncio.run(run())
+
+        assert (comment.start, comment.end) == (datetime(2024, 1, 1, 12, 30), datetime(2024, 1, 1, 12, 30))
+
+    def test_notebook_time_window(self, setup_dashfrog):
+        # Relative time windows are resolved to aware datetimes
+        notebook = Notebook(
+            id=uuid4(),
+            title="Imports",
+            description="",
+            tenant="acme",
+            time_window={"type": "relative", "metadata": {"value": "24h"}},
+        )
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        with Session(get_dashfrog_instance().db_engine) as session:
+            session.add(notebook)
+            session.add(Comment(emoji="🚀", title="Release", start=now - timedelta(hours=1), end=now))
+            session.add(Comment(emoji="🐛", title="Outage", start=now - timedelta(days=3), end=now - timedelta(days=2)))
+            session.commit()
+
+        async def run():
+            try:
+                return await get_comments(GetCommentsRequest(notebook_id=notebook.id), credentials())
+            finally:
+                await get_dashfrog_instance().close_async_db_engine()
+
+        assert [comment.title for comment in asyncio.run(run())] == ["Release"]
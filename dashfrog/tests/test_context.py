@@ -0,0 +1,61 @@
+"""Tests for the per-context flow state."""
+
+from dashfrog.constants import BAGGAGE_FLOW_LABEL_NAME, BAGGAGE_STEP_LABEL_NAME, TENANT_LABEL_NAME
+from dashfrog.context import FlowContext, get_flow_context, use_flow_context
+from dashfrog.utils import write_to_baggage
+
+import pytest
+
+from opentelemetry.sdk.trace import TracerProvider
+
+tracer = TracerProvider().get_tracer("dashfrog-tests")
+
+
+class TestFlowContext:
+    """Test resolving the flow open in the current context."""
+
+    def test_precomputed_events(self):
+        flow_context = FlowContext.create(42, "import", "acme", {"region": "eu"})
+        step_context = flow_context.with_step("validate")
+
+        assert flow_context.flow_event("flow_start") == dict(
+            flow_id="42",
+            event_name="flow_start",
+            tenant="acme",
+            group_id="import$$tenant=acme$$region=eu",
+            flow_metadata={"flow_name": "import"},
+            labels={"region": "eu"},
+        )
+        assert step_context.step_event("step_start")["flow_metadata"] == {
+            "flow_name": "import",
+            "step_name": "validate",
+        }
+        assert flow_context.step_name is None
+
+    def test_reads_context_var(self):
+        with tracer.start_as_current_span("flow.import") as span:
+            flow_context = FlowContext.create(span.get_span_context().trace_id, "import", "acme", {})
+            with use_flow_context(flow_context):
+                assert get_flow_context() is flow_context
+
+    def test_falls_back_to_baggage(self):
+        """A flow opened in another process only reaches this one through the baggage."""
+        labels = {BAGGAGE_FLOW_LABEL_NAME: "import", TENANT_LABEL_NAME: "acme", BAGGAGE_STEP_LABEL_NAME: "load"}
+        with tracer.start_as_current_span("flow.import") as span, write_to_baggage({**labels, "region": "eu"}):
+            flow_context = get_flow_context(with_step=True)
+
+        assert flow_context.flow_id == str(span.get_span_context().trace_id)
+        assert flow_context.step_name == "load"
+        assert flow_context.labels == {"region": "eu"}
+
+    def test_ignores_context_of_another_trace(self):
+        stale = FlowContext.create(1, "import", "acme", {})
+        with use_flow_context(stale), tracer.start_as_current_span("flow.other"):
+            with pytest.raises(ValueError):
+                get_flow_context()
+
+    def test_missing_step(self):
+        with tracer.start_as_current_span("flow.import") as span:
+            flow_context = FlowContext.create(span.get_span_context().trace_id, "import", "acme", {})
+            with use_flow_context(flow_context), pytest.raises(ValueError):
+                get_flow_context(with_step=True)
@@ -0,0 +1,67 @@
+"""Tests for the compiled flow label filters."""
+
+from sqlalchemy import or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from dashfrog import get_dashfrog_instance
+from dashfrog.api.filters import label_set_filter, labels_match
+from dashfrog.api.schemas import LabelFilter
+from dashfrog.models import LabelSet
+
+import pytest
+
+LABEL_SETS = {
+    1: {},
+    2: {"region": "eu"},
+    3: {"region": "us"},
+    4: {"region": "eu", "env": "prod"},
+    5: {"env": "prod"},
+    6: {"env": "dev", "team": "data"},
+    7: {"region": None},
+}
+
+
+def legacy_label_set_filter(label_set_id, label_filters: list[LabelFilter]):
+    """The filter as it was written before being compiled into index-friendly forms."""
+    return label_set_id.in_(
+        select(LabelSet.id).where(
+            *(
+                or_(
+                    LabelSet.labels[label_filter.label].astext == label_filter.value,
+                    LabelSet.labels[label_filter.label].is_(None),
+                )
+                for label_filter in label_filters
+            )
+        )
+    )
+
+
+class TestLabelSetFilter:
+    """Test that compiled label filters match the same label sets as the legacy filter."""
+
+    @pytest.mark.parametrize(
+        "filters",
+        [
+            [],
+            [("region", "eu")],
+            [("region", "asia")],
+            [("region", "eu"), ("env", "prod")],
+            [("env", "prod"), ("team", "data")],
+            [("region", "eu"), ("region", "us")],
+            [("region", "eu"), ("region", "eu")],
+        ],
+    )
+    def test_same_label_sets_as_legacy(self, setup_dashfrog, filters):
+        label_filters = [LabelFilter(label=label, value=value) for label, value in filters]
+        with Session(get_dashfrog_instance().db_engine) as session:
+            session.execute(insert(LabelSet), [{"id": id, "labels": labels} for id, labels in LABEL_SETS.items()])
+
+            legacy = session.execute(select(LabelSet.id).where(legacy_label_set_filter(LabelSet.id, label_filters)))
+            compiled = session.execute(select(LabelSet.id).where(label_set_filter(LabelSet.id, label_filters)))
+
+            matched = set(compiled.scalars())
+            assert matched == set(legacy.scalars())
+
+        # And the filter evaluated in memory, on the label sets of notified runs
+        assert {id for id, labels in LABEL_SETS.items() if labels_match(labels, label_filters)} == matched
@@ -1,13 +1,17 @@
 """Tests for async flow tracking with FastAPI integration."""
 
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
-from dashfrog import flow, get_dashfrog_instance
-from dashfrog.constants import EVENT_FLOW_START, EVENT_FLOW_SUCCESS
+from dashfrog import flow, get_dashfrog_instance, step
+from dashfrog.constants import EventKind
 from dashfrog.models import FlowEvent
 
+import pytest
+
 
 class TestAsync:
     """Test async flow without end_on_exit."""
@@ -46,14 +50,82 @@ class TestAsync:
 
             # Verify START event
             start_event = events[0]
-            assert start_event.event_name == EVENT_FLOW_START
-            assert start_event.flow_metadata["flow_name"] == "process_order"
+            assert start_event.event_kind == EventKind.FLOW_START
+            assert start_event.flow_name == "process_order"
             assert start_event.labels["order_id"] == "123"
 
             # Verify SUCCESS event
             success_event = events[1]
-            assert success_event.event_name == EVENT_FLOW_SUCCESS
-            assert success_event.flow_metadata["flow_name"] == "process_order"
+            assert success_event.event_kind == EventKind.FLOW_SUCCESS
+            assert success_event.flow_name == "process_order"
 
             # Verify same trace_id
             assert start_event.flow_id == success_event.flow_id
+
+
+class TestNativeAsync:
+    """Test the asyncio flow/step API."""
+
+    def test_async_flow_with_steps(self, setup_dashfrog):
+        """Test flow and steps opened with async context managers."""
+
+        async def run():
+            async with flow.astart("async_flow", tenant="test_tenant", order_id="123") as flow_id:
+                async with step.astart("validate"):
+                    await asyncio.sleep(0)
+                await flow.aevent("validated")
+            return flow_id
+
+        flow_id = asyncio.run(run())
+
+        dashfrog = get_dashfrog_instance()
+        with Session(dashfrog.db_engine) as session:
+            events = session.query(FlowEvent).order_by(FlowEvent.id).all()
+
+            assert [e.event_kind for e in events] == [
+                EventKind.FLOW_START,
+                EventKind.STEP_START,
+                EventKind.STEP_SUCCESS,
+                EventKind.CUSTOM,
+                EventKind.FLOW_SUCCESS,
+            ]
+            assert events[3].event_name == "validated"
+            assert {str(e.flow_id.int) for e in events} == {flow_id}
+            assert events[1].step_name == "validate"
+            assert all(e.labels == {"order_id": "123"} for e in events)
+
+    def test_async_flow_failure(self, setup_dashfrog):
+        """Test that exceptions mark the step and flow as failed."""
+
+        async def run():
+            async with flow.astart("async_flow", tenant="test_tenant"):
+                async with step.astart("validate"):
+                    raise ValueError("Validation failed")
+
+        with pytest.raises(ValueError):
+            asyncio.run(run())
+
+        dashfrog = get_dashfrog_instance()
+        with Session(dashfrog.db_engine) as session:
+            events = session.query(FlowEvent).order_by(FlowEvent.id).all()
+
+            assert [e.event_kind for e in events] == [
+                EventKind.FLOW_START,
+                EventKind.STEP_START,
+                EventKind.STEP_FAIL,
+                EventKind.FLOW_FAIL,
+            ]
+
+    def test_async_manual_ending(self, setup_dashfrog):
+        """Test ending a flow manually from async code."""
+
+        async def run():
+            async with flow.astart("async_flow", tenant="test_tenant", end_on_exit=False):
+                await flow.asuccess()
+
+        asyncio.run(run())
+
+        dashfrog = get_dashfrog_instance()
+        with Session(dashfrog.db_engine) as session:
+            events = session.query(FlowEvent).order_by(FlowEvent.id).all()
+            assert [e.event_kind for e in events] == [EventKind.FLOW_START, EventKind.FLOW_SUCCESS]
@@ -0,0 +1,87 @@
+"""Tests for the live feed of flow run changes."""
+
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from dashfrog import get_dashfrog_instance, ingest
+from dashfrog.api.flow_runs import RESYNC, FlowRunFeed
+from dashfrog.api.notifications import NotificationHub
+from dashfrog.api.schemas import LabelFilter
+from dashfrog.constants import EVENT_FLOW_START, FLOW_RUN_CHANNEL
+from dashfrog.models import FlowRun
+
+
+def make_event(flow_id: int, tenant: str, **labels: str) -> dict:
+    return dict(
+        flow_id=str(flow_id),
+        event_name=EVENT_FLOW_START,
+        event_dt=datetime(2024, 1, 1, 12, 0),
+        labels=labels,
+        group_id=f"import$$tenant={tenant}",
+        tenant=tenant,
+        flow_metadata={"flow_name": "import"},
+    )
+
+
+def make_feed() -> tuple[NotificationHub, FlowRunFeed]:
+    # Not started: notifications are dispatched by hand
+    hub = NotificationHub(engine=None, channels=[FLOW_RUN_CHANNEL])  # pyright: ignore[reportArgumentType]
+    return hub, FlowRunFeed(hub)
+
+
+def notify_runs(hub: NotificationHub) -> None:
+    """Dispatch the notifications of the runs in the database, as their ingestion sent them."""
+    with Session(get_dashfrog_instance().db_engine) as session:
+        runs = session.execute(
+            select(
+                FlowRun.flow_id,
+                FlowRun.flow_group_id,
+                FlowRun.label_set_id,
+                FlowRun.tenant,
+                FlowRun.flow_name,
+                FlowRun.status,
+                FlowRun.started_at,
+                FlowRun.ended_at,
+            ).order_by(FlowRun.flow_id)
+        ).all()
+    for payload in ingest.run_notifications(runs):
+        hub._dispatch(None, 0, FLOW_RUN_CHANNEL, payload)
+
+
+class TestFlowRunFeed:
+    """Test that notified runs reach the subscribers whose filters they match."""
+
+    def test_filtered_changes(self, setup_dashfrog):
+        ingest.bulk_write(
+            [make_event(1, "acme", region="eu"), make_event(2, "acme", region="us"), make_event(3, "other")]
+        )
+        hub, feed = make_feed()
+
+        async def main():
+            try:
+                async with feed.subscribe("acme", "import", [LabelFilter(label="region", value="eu")]) as changes:
+                    notify_runs(hub)
+                    return await anext(changes)
+            finally:
+                await get_dashfrog_instance().close_async_db_engine()
+
+        changes = asyncio.run(main())
+
+        assert [(change.flowId, change.groupId, change.labels, change.status) for change in changes] == [
+            ("1", "import$$tenant=acme", {"region": "eu"}, "running")
+        ]
+
+    def test_resync_on_reconnection(self):
+        hub, feed = make_feed()
+
+        async def main():
+            async with feed.subscribe("acme", idle=0.01) as changes:
+                idle = await anext(changes)
+                for callback in hub._connect_callbacks:
+                    callback()
+                return idle, await anext(changes)
+
+        assert asyncio.run(main()) == ([], RESYNC)
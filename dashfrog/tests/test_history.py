@@ -0,0 +1,118 @@
+"""Tests for the paginated flow history."""
+
+import asyncio
+from datetime import datetime, timedelta
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dashfrog import get_dashfrog_instance, ingest
+from dashfrog.api.flow import (
+    decode_history_cursor,
+    encode_history_cursor,
+    history_page,
+    history_runs_query,
+    iter_flow_history,
+)
+from dashfrog.constants import EVENT_FLOW_START, EVENT_FLOW_SUCCESS, EVENT_STEP_START
+
+import pytest
+
+START, END = datetime(2024, 1, 1), datetime(2024, 1, 2)
+
+
+def make_event(flow_id: int, event_name: str, event_dt: datetime, flow_name: str = "import", **metadata: str) -> dict:
+    return dict(
+        flow_id=str(flow_id),
+        event_name=event_name,
+        event_dt=event_dt,
+        labels={},
+        group_id=f"{flow_name}$$tenant=acme",
+        tenant="acme",
+        flow_metadata={"flow_name": flow_name, **metadata},
+    )
+
+
+class TestCursor:
+    """Test the opaque history cursors."""
+
+    def test_round_trip(self):
+        keyset = (datetime(2024, 1, 1, 12, 30, 15, 123), UUID(int=1234), -42)
+        assert decode_history_cursor(encode_history_cursor(*keyset)) == keyset
+
+    def test_invalid(self):
+        with pytest.raises(HTTPException) as error:
+            decode_history_cursor("not a cursor")
+        assert error.value.status_code == 400
+
+
+class TestPagination:
+    """Test paging through flow runs."""
+
+    def test_pages_cover_all_runs(self, setup_dashfrog):
+        # Runs 1 and 2 start at the same time, the flow id breaks the tie
+        started_at = [START + timedelta(hours=1), START + timedelta(hours=1), START + timedelta(hours=2)]
+        events = []
+        for flow_id, dt in enumerate([*started_at, START + timedelta(hours=3)], start=1):
+            events += [
+                make_event(flow_id, EVENT_FLOW_START, dt),
+                make_event(flow_id, EVENT_STEP_START, dt, step_name="load"),
+                make_event(flow_id, EVENT_FLOW_SUCCESS, dt + timedelta(seconds=1)),
+            ]
+        ingest.bulk_write(events)
+
+        async def read_history():
+            dashfrog = get_dashfrog_instance()
+            try:
+                async with AsyncSession(dashfrog.async_db_engine) as session:
+                    pages, after = [], None
+                    while True:
+                        runs_query = history_runs_query("acme", "import", START, END, [], after).limit(2)
+                        runs = (await session.execute(runs_query)).all()
+                        if not runs:
+                            break
+                        pages.append(await history_page(session, runs, "acme", "import", START, END))
+                        after = (runs[-1].started_at, runs[-1].flow_id, runs[-1].flow_group_id)
+
+                    runs_query = history_runs_query("acme", "import", START, END, [])
+                    everything = [
+                        run async for run in iter_flow_history(session, runs_query, "acme", "import", START, END)
+                    ]
+                    return pages, everything
+            finally:
+                await dashfrog.close_async_db_engine()
+
+        pages, everything = asyncio.run(read_history())
+
+        assert [[run.flowId for run in page] for page in pages] == [["4", "3"], ["2", "1"]]
+        assert [run for page in pages for run in page] == everything
+        assert all(run.steps[0].name == "load" for run in everything)
+
+    def test_flows_of_the_same_trace(self, setup_dashfrog):
+        # An inner "notify" flow runs in the trace of the "import" flow, its steps are not the import's
+        dt = START + timedelta(hours=1)
+        ingest.bulk_write(
+            [
+                make_event(1, EVENT_FLOW_START, dt),
+                make_event(1, EVENT_STEP_START, dt, step_name="load"),
+                make_event(1, EVENT_FLOW_START, dt, flow_name="notify"),
+                make_event(1, EVENT_STEP_START, dt, flow_name="notify", step_name="send"),
+                make_event(1, EVENT_FLOW_SUCCESS, dt + timedelta(seconds=1), flow_name="notify"),
+                make_event(1, EVENT_FLOW_SUCCESS, dt + timedelta(seconds=2)),
+            ]
+        )
+
+        async def read_history(flow_name: str):
+            dashfrog = get_dashfrog_instance()
+            try:
+                async with AsyncSession(dashfrog.async_db_engine) as session:
+                    runs_query = history_runs_query("acme", flow_name, START, END, [])
+                    return [run async for run in iter_flow_history(session, runs_query, "acme", flow_name, START, END)]
+            finally:
+                await dashfrog.close_async_db_engine()
+
+        for flow_name, step_name in [("import", "load"), ("notify", "send")]:
+            (run,) = asyncio.run(read_history(flow_name))
+            assert run.groupId == f"{flow_name}$$tenant=acme"
+            assert [step.name for step in run.steps] == [step_name]
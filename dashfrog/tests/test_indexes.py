@@ -0,0 +1,78 @@
+"""EXPLAIN-based regression tests for the indexes of the flow API queries."""
+
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import ClauseElement, Executable, Select, text
+from sqlalchemy.ext.compiler import compiles
+
+from dashfrog import get_dashfrog_instance
+from dashfrog.api.flow import flow_summary_query, history_events_query, history_runs_query
+from dashfrog.api.schemas import LabelFilter
+from dashfrog.partitions import list_partitions, maintain_partitions
+
+import pytest
+
+START, END = datetime(2024, 1, 1), datetime(2024, 1, 8)
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN of a query, with its parameters bound as they are by the API."""
+
+    inherit_cache = False
+
+    def __init__(self, query: Select):
+        self.query = query
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element: Explain, compiler, **kw) -> str:
+    return f"EXPLAIN {compiler.process(element.query, **kw)}"
+
+
+def explain(query: Select) -> str:
+    """Plan of `query`, with sequential scans discouraged so that tiny test tables still use indexes."""
+    with get_dashfrog_instance().db_engine.begin() as conn:
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        return "\n".join(conn.execute(Explain(query)).scalars())
+
+
+class TestFlowQueryIndexes:
+    """Test that the flow API queries can use their indexes instead of scanning tables."""
+
+    @pytest.mark.parametrize(
+        "flow_name, index", [("import", "ix_flow_run_tenant_flow_name_started_at"), (None, "ix_flow_run_tenant")]
+    )
+    def test_search(self, setup_dashfrog, flow_name, index):
+        plan = explain(flow_summary_query("acme", START, END, flow_name, [], watermark=None))
+
+        assert index in plan
+        assert "Seq Scan on flow_run" not in plan
+
+    def test_search_from_rollups(self, setup_dashfrog):
+        plan = explain(flow_summary_query("acme", START, END, "import", [], watermark=END))
+
+        assert "ix_flow_group_tenant_flow_name" in plan
+        assert "Seq Scan on flow_rollup" not in plan
+
+    def test_label_filter(self, setup_dashfrog):
+        label_filters = [LabelFilter(label="region", value="eu")]
+        plan = explain(flow_summary_query("acme", START, END, "import", label_filters, watermark=None))
+
+        assert "ix_label_set_labels" in plan
+
+    def test_history(self, setup_dashfrog):
+        runs_plan = explain(history_runs_query("acme", "import", START, END, []))
+        assert "ix_flow_run_tenant_flow_name_started_at" in runs_plan
+
+        # Events are read from the partitions of the window only, through their indexes
+        engine = get_dashfrog_instance().db_engine
+        maintain_partitions(engine)
+        with engine.connect() as conn:
+            outside = [name for day, name in list_partitions(conn).items() if not START.date() <= day <= END.date()]
+        assert outside
+
+        events_plan = explain(history_events_query("acme", "import", [(UUID(int=1), 1), (UUID(int=2), 1)], START, END))
+        assert "flow_id_event_dt_idx" in events_plan
+        assert "Seq Scan on flow_event" not in events_plan
+        assert not any(name in events_plan for name in outside)
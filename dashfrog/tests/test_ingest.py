@@ -0,0 +1,204 @@
+"""Tests for COPY-based bulk ingestion."""
+
+from datetime import datetime, timedelta
+import json
+from uuid import UUID
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from dashfrog import get_dashfrog_instance, ingest
+from dashfrog.constants import EVENT_FLOW_FAIL, EVENT_FLOW_START, EVENT_FLOW_SUCCESS, EventKind
+from dashfrog.models import FlowEvent, FlowLabelValue, FlowRun, Tenant
+
+# Primary key of the run of `make_event`
+RUN_KEY = (UUID(int=1234), ingest.flow_group_key("import$$tenant=acme"))
+
+
+def make_event(event_name: str, **labels: str) -> dict:
+    return dict(
+        flow_id="1234",
+        event_name=event_name,
+        event_dt=datetime(2024, 1, 1, 12, 0),
+        labels=labels,
+        group_id="import$$tenant=acme",
+        tenant="acme",
+        flow_metadata={"flow_name": "import"},
+    )
+
+
+class TestEncoding:
+    """Test COPY text format encoding."""
+
+    def test_special_characters_are_escaped(self):
+        event = make_event(EVENT_FLOW_START)
+        event["tenant"] = "C:\\tmp\ta\nb"
+        line = ingest.encode_event(event)
+
+        assert line.endswith("\n")
+        assert line.count("\n") == 1
+        assert line.count("\t") == len(ingest.FLOW_EVENT_COLUMNS) - 1
+        assert "C:\\\\tmp\\ta\\nb" in line
+
+    def test_dictionary_keys(self):
+        line = ingest.encode_event(make_event(EVENT_FLOW_START, b="2", a="1"))
+
+        assert str(ingest.flow_group_key("import$$tenant=acme")) in line
+        assert ingest.label_set_key({"b": "2", "a": "1"}) == ingest.label_set_key({"a": "1", "b": "2"})
+        assert ingest.label_set_key({"a": "1"}) != ingest.label_set_key({"a": "2"})
+
+
+class TestRunNotifications:
+    """Test the payloads notifying upserted runs."""
+
+    def test_payloads_fit_notify(self):
+        runs = [
+            (UUID(int=i), 1, 2, "acme", "import" * 20, "success", datetime(2024, 1, 1), datetime(2024, 1, 1, 1))
+            for i in range(200)
+        ]
+
+        payloads = list(ingest.run_notifications(runs))
+
+        assert len(payloads) > 1
+        assert all(len(payload.encode()) < 8000 for payload in payloads)
+        decoded = [run for payload in payloads for run in json.loads(payload)]
+        assert [UUID(hex=run[0]) for run in decoded] == [UUID(int=i) for i in range(200)]
+        assert decoded[0][5:] == ["success", "2024-01-01T00:00:00", "2024-01-01T01:00:00"]
+
+
+class TestBulkWrite:
+    """Test that bulk_write round-trips events."""
+
+    def test_bulk_write(self, setup_dashfrog):
+        events = [
+            make_event(EVENT_FLOW_START, path="C:\\tmp", note="a\tb\nc", quote='"é"'),
+            make_event(EVENT_FLOW_SUCCESS),
+        ]
+
+        assert ingest.bulk_write(events) == 2
+
+        with Session(get_dashfrog_instance().db_engine) as session:
+            rows = session.query(FlowEvent).order_by(FlowEvent.id).all()
+
+            assert [r.event_kind for r in rows] == [EventKind.FLOW_START, EventKind.FLOW_SUCCESS]
+            assert rows[0].labels == {"path": "C:\\tmp", "note": "a\tb\nc", "quote": '"é"'}
+            assert rows[0].event_dt == datetime(2024, 1, 1, 12, 0)
+            assert rows[0].flow_name == "import"
+
+    def test_bulk_write_empty(self, setup_dashfrog):
+        assert ingest.bulk_write([]) == 0
+
+    def test_bulk_write_chunks(self, setup_dashfrog, monkeypatch):
+        monkeypatch.setattr(ingest, "BULK_WRITE_CHUNK_SIZE", 2)
+        start, end = make_event(EVENT_FLOW_START), make_event(EVENT_FLOW_SUCCESS)
+        end["event_dt"] = start["event_dt"] + timedelta(seconds=3)
+        events = iter([start, make_event("checkpoint"), make_event("checkpoint"), end, make_event("checkpoint")])
+
+        assert ingest.bulk_write(events) == 5
+
+        with Session(get_dashfrog_instance().db_engine) as session:
+            assert session.query(FlowEvent).count() == 5
+            run = session.get_one(FlowRun, RUN_KEY)
+            assert run.status == "success"
+            assert run.duration == timedelta(seconds=3)
+
+
+class TestFlowRuns:
+    """Test that flow start and end events maintain flow_run."""
+
+    def test_run_upserted(self, setup_dashfrog):
+        start, end = make_event(EVENT_FLOW_START), make_event(EVENT_FLOW_SUCCESS)
+        end["event_dt"] = start["event_dt"] + timedelta(seconds=3)
+
+        ingest.bulk_write([start])
+        with Session(get_dashfrog_instance().db_engine) as session:
+            run = session.get_one(FlowRun, RUN_KEY)
+            assert run.status == "running"
+            assert run.ended_at is None
+
+        ingest.bulk_write([end])
+        with Session(get_dashfrog_instance().db_engine) as session:
+            run = session.get_one(FlowRun, RUN_KEY)
+            assert run.status == "success"
+            assert run.started_at == start["event_dt"]
+            assert run.duration == timedelta(seconds=3)
+
+    def test_events_out_of_order(self, setup_dashfrog):
+        start, end = make_event(EVENT_FLOW_START), make_event(EVENT_FLOW_FAIL)
+        end["event_dt"] = start["event_dt"] + timedelta(seconds=3)
+
+        ingest.bulk_write([end])
+        ingest.bulk_write([start])
+
+        with Session(get_dashfrog_instance().db_engine) as session:
+            run = session.get_one(FlowRun, RUN_KEY)
+            assert run.status == "failure"
+            assert run.started_at == start["event_dt"]
+            assert run.ended_at == end["event_dt"]
+
+    def test_notified_only_if_enabled(self, setup_dashfrog):
+        engine = get_dashfrog_instance().db_engine
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            ingest.bulk_write([make_event(EVENT_FLOW_START)], engine)
+            assert not any("pg_notify" in statement for statement in statements)
+
+            ingest.bulk_write([make_event(EVENT_FLOW_SUCCESS)], engine, notify_runs=True)
+            assert any("pg_notify" in statement for statement in statements)
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    def test_flows_of_the_same_trace(self, setup_dashfrog):
+        outer, inner = make_event(EVENT_FLOW_START), make_event(EVENT_FLOW_START)
+        inner.update(group_id="notify$$tenant=acme", flow_metadata={"flow_name": "notify"})
+        inner_fail = {**inner, "event_name": EVENT_FLOW_FAIL, "event_dt": inner["event_dt"] + timedelta(seconds=1)}
+        outer_end = make_event(EVENT_FLOW_SUCCESS)
+        outer_end["event_dt"] = outer["event_dt"] + timedelta(seconds=3)
+
+        ingest.bulk_write([outer, inner, inner_fail])
+        ingest.bulk_write([outer_end])
+
+        with Session(get_dashfrog_instance().db_engine) as session:
+            runs = session.scalars(select(FlowRun).order_by(FlowRun.flow_name)).all()
+            assert [(run.flow_id, run.flow_name, run.status) for run in runs] == [
+                (UUID(int=1234), "import", "success"),
+                (UUID(int=1234), "notify", "failure"),
+            ]
+            assert [run.duration for run in runs] == [timedelta(seconds=3), timedelta(seconds=1)]
+
+
+class TestLastSeen:
+    """Test that tenants and flow label values are upserted at most once per interval."""
+
+    def last_seen(self) -> tuple[list, list]:
+        with Session(get_dashfrog_instance().db_engine) as session:
+            tenants = session.execute(select(Tenant.name, Tenant.last_seen)).all()
+            label_values = session.execute(
+                select(FlowLabelValue.flow_name, FlowLabelValue.key, FlowLabelValue.value, FlowLabelValue.last_seen)
+            ).all()
+            return [tuple(row) for row in tenants], [tuple(row) for row in label_values]
+
+    def test_once_per_interval(self, setup_dashfrog):
+        first, later = make_event(EVENT_FLOW_START, region="eu"), make_event(EVENT_FLOW_START, region="eu")
+        later["event_dt"] += timedelta(minutes=5)
+
+        ingest.bulk_write([first])
+        ingest.bulk_write([later])
+        assert self.last_seen() == (
+            [("acme", first["event_dt"])],
+            [("import", "region", "eu", first["event_dt"])],
+        )
+
+        # Once the interval elapsed
+        ingest._seen_tenants.clear()
+        ingest._seen_label_values.clear()
+        ingest.bulk_write([later, make_event(EVENT_FLOW_SUCCESS, region="us")])
+        assert self.last_seen() == (
+            [("acme", later["event_dt"])],
+            [("import", "region", "eu", later["event_dt"])],
+        )
@@ -0,0 +1,43 @@
+"""Tests for the metric label catalog."""
+
+import asyncio
+
+import httpx
+
+from dashfrog.api.label_catalog import fetch_label_values
+from dashfrog.api.prometheus import PrometheusClient
+from dashfrog.api.schemas import Label
+
+VALUES = {"region": ["us", "eu"], "endpoint": ["/orders"], "tenant": ["acme"]}
+
+
+class TestFetchLabelValues:
+    """Test that label values are read per label, from the metrics registering it."""
+
+    def test_one_query_per_label(self):
+        matchers = {}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            label = request.url.path.split("/")[-2]
+            matchers[label] = request.url.params.get_list("match[]")
+            return httpx.Response(200, json={"status": "success", "data": VALUES[label]})
+
+        async def main():
+            client = PrometheusClient("http://prometheus:9090", transport=httpx.MockTransport(handler))
+            try:
+                return await fetch_label_values(client, {"orders": ["region"], "latency": ["region", "endpoint"]})
+            finally:
+                await client.aclose()
+
+        labels = asyncio.run(main())
+
+        assert labels == [
+            Label(label="endpoint", values=["/orders"]),
+            Label(label="region", values=["eu", "us"]),
+            Label(label="tenant", values=["acme"]),
+        ]
+        assert matchers == {
+            "endpoint": ["dashfrog_latency"],
+            "region": ["dashfrog_latency", "dashfrog_orders"],
+            "tenant": ["dashfrog_latency", "dashfrog_orders"],
+        }
@@ -0,0 +1,53 @@
+"""Tests for newline-delimited JSON responses."""
+
+from datetime import datetime
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from dashfrog.api.ndjson import NDJSON_MEDIA_TYPE, accepts_ndjson, ndjson_response
+from dashfrog.api.schemas import DataPoint, RangeMetric
+
+
+class TestNdjson:
+    """Test content negotiation and line encoding."""
+
+    def test_accepts_ndjson(self):
+        assert accepts_ndjson("application/x-ndjson")
+        assert accepts_ndjson("application/json;q=0.5, application/x-ndjson; q=1")
+        assert not accepts_ndjson("application/json")
+        assert not accepts_ndjson(None)
+
+    def test_one_document_per_line(self):
+        app = FastAPI()
+
+        def series():
+            for i in range(3):
+                yield RangeMetric(labels={"i": str(i)}, values=[DataPoint(timestamp=datetime(2024, 1, 1), value=i)])
+
+        @app.get("/series")
+        def get_series():
+            return ndjson_response(series())
+
+        response = TestClient(app).get("/series")
+
+        assert response.headers["content-type"] == NDJSON_MEDIA_TYPE
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["labels"] for line in lines] == [{"i": "0"}, {"i": "1"}, {"i": "2"}]
+        assert lines[0]["values"][0]["timestamp"] == "2024-01-01T00:00:00"
+
+    def test_async_iterable(self):
+        app = FastAPI()
+
+        async def numbers():
+            for i in range(3):
+                yield {"i": i}
+
+        @app.get("/numbers")
+        async def get_numbers():
+            return ndjson_response(numbers())
+
+        response = TestClient(app).get("/numbers")
+
+        assert [json.loads(line) for line in response.text.splitlines()] == [{"i": 0}, {"i": 1}, {"i": 2}]
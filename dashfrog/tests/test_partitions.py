@@ -0,0 +1,62 @@
+"""Tests for the daily flow event partitions."""
+
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import text
+
+from dashfrog import get_dashfrog_instance, ingest
+from dashfrog.constants import EVENT_FLOW_START
+from dashfrog.partitions import list_partitions, maintain_partitions, partition_day, partition_name
+
+
+def make_event(event_dt: datetime) -> dict:
+    return dict(
+        flow_id="1234",
+        event_name=EVENT_FLOW_START,
+        event_dt=event_dt,
+        labels={},
+        group_id="import$$tenant=acme",
+        tenant="acme",
+        flow_metadata={"flow_name": "import"},
+    )
+
+
+class TestNames:
+    """Test partition naming."""
+
+    def test_round_trip(self):
+        assert partition_name(date(2024, 1, 31)) == "flow_event_p20240131"
+        assert partition_day("flow_event_p20240131") == date(2024, 1, 31)
+        assert partition_day("flow_event_default") is None
+
+
+class TestMaintenance:
+    """Test creating and expiring partitions."""
+
+    def test_moves_events_from_default_partition(self, setup_dashfrog):
+        engine = get_dashfrog_instance().db_engine
+        # Far enough in the past to have no partition yet
+        day = date(2001, 1, 1)
+        ingest.bulk_write([make_event(datetime(2001, 1, 1, 12))])
+
+        report = maintain_partitions(engine, premake_days=1, today=day)
+
+        assert report is not None
+        assert report.created == ["flow_event_p20010101", "flow_event_p20010102"]
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT count(*) FROM flow_event_p20010101")).scalar_one() == 1
+            assert conn.execute(text("SELECT count(*) FROM flow_event_default")).scalar_one() == 0
+
+        report = maintain_partitions(engine, premake_days=0, retention_days=3, today=day + timedelta(days=4))
+
+        assert report is not None
+        assert report.dropped == ["flow_event_p20010101"]
+        with engine.connect() as conn:
+            partitions = list_partitions(conn)
+        assert day not in partitions
+        assert day + timedelta(days=1) in partitions
+
+        # Leave no partitions of the test days behind
+        with engine.begin() as conn:
+            for name in (name for partitioned_day, name in partitions.items() if partitioned_day.year == 2001):
+                conn.execute(text(f"DROP TABLE {name}"))
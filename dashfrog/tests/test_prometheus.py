@@ -0,0 +1,93 @@
+"""Tests for the shared Prometheus client."""
+
+import asyncio
+from datetime import datetime, timezone
+
+from fastapi import HTTPException
+import httpx
+
+from dashfrog.api import prometheus
+from dashfrog.api.prometheus import PrometheusClient
+
+import pytest
+
+END = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def make_client(handler) -> PrometheusClient:
+    return PrometheusClient("http://prometheus:9090", transport=httpx.MockTransport(handler))
+
+
+def run(client: PrometheusClient, call):
+    async def main():
+        try:
+            return await call(client)
+        finally:
+            await client.aclose()
+
+    return asyncio.run(main())
+
+
+class TestPrometheusClient:
+    """Test the Prometheus API calls and their errors."""
+
+    def test_query(self):
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(
+                200, json={"status": "success", "data": {"result": [{"metric": {}, "value": [0, "1"]}]}}
+            )
+
+        result = run(make_client(handler), lambda client: client.query("up", END))
+
+        assert result == [{"metric": {}, "value": [0, "1"]}]
+        [request] = requests
+        assert request.url.path == "/api/v1/query"
+        assert request.url.params["time"] == str(END.timestamp())
+        assert "gzip" in request.headers["accept-encoding"]
+
+    def test_label_values(self):
+        def handler(request: httpx.Request) -> httpx.Response:
+            assert request.url.path == "/api/v1/label/region/values"
+            assert request.url.params.get_list("match[]") == ["dashfrog_a", "dashfrog_b"]
+            assert request.url.params["start"] == str(END.timestamp())
+            return httpx.Response(200, json={"status": "success", "data": ["eu", "us"]})
+
+        result = run(
+            make_client(handler), lambda client: client.label_values("region", ["dashfrog_a", "dashfrog_b"], END)
+        )
+
+        assert result == ["eu", "us"]
+
+    def test_label_values_in_groups(self, monkeypatch):
+        monkeypatch.setattr(prometheus, "LABEL_VALUES_MATCHERS_MAX_LENGTH", 100)
+        matchers = [f"dashfrog_metric_{i}" for i in range(20)]
+        groups = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            groups.append(request.url.params.get_list("match[]"))
+            assert len(request.url.query) < 150
+            return httpx.Response(200, json={"status": "success", "data": [str(len(groups) % 2), "shared"]})
+
+        result = run(make_client(handler), lambda client: client.label_values("tenant", matchers))
+
+        assert len(groups) > 1
+        assert sorted(matcher for group in groups for matcher in group) == sorted(matchers)
+        assert result == ["0", "1", "shared"]
+
+    def test_failed_query(self):
+        client = make_client(lambda request: httpx.Response(400, json={"status": "error"}))
+
+        with pytest.raises(HTTPException) as error:
+            run(client, lambda client: client.query_range("up", END, END, "1m"))
+        assert error.value.status_code == 502
+
+    def test_unreachable(self):
+        def handler(request: httpx.Request) -> httpx.Response:
+            raise httpx.ConnectError("connection refused", request=request)
+
+        with pytest.raises(HTTPException) as error:
+            run(make_client(handler), lambda client: client.query("up", END))
+        assert error.value.status_code == 502
@@ -0,0 +1,118 @@
+"""Tests for the Prometheus range query frontend."""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from dashfrog.api.prometheus import PrometheusClient
+from dashfrog.api.query_frontend import RangeQueryFrontend, canonical_promql, merge_series, step_seconds
+
+NOW = datetime(2024, 1, 10, 12, 0, tzinfo=timezone.utc)
+
+
+class FakePrometheus:
+    """Answers range queries with one series whose value is the sample timestamp, and records them."""
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.queries: list[tuple[float, float]] = []
+        self.in_flight = self.max_in_flight = 0
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        start, end = float(request.url.params["start"]), float(request.url.params["end"])
+        step = step_seconds(request.url.params["step"])
+        self.queries.append((start, end))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        values, t = [], start
+        while t <= end:
+            values.append([t, str(t)])
+            t += step
+        result = [{"metric": {"job": "api"}, "values": values}]
+        return httpx.Response(200, json={"status": "success", "data": {"result": result}})
+
+
+def query_range(frontend: RangeQueryFrontend, prometheus: FakePrometheus, start: datetime, end: datetime, step: str):
+    async def main():
+        client = PrometheusClient("http://prometheus:9090", transport=httpx.MockTransport(prometheus.handler))
+        try:
+            return await frontend.query_range(client, "rate(x[1m])", start, end, step, now=NOW)
+        finally:
+            await client.aclose()
+
+    return asyncio.run(main())
+
+
+class TestRangeQueryFrontend:
+    """Test the step alignment, day split and cache of range queries."""
+
+    def test_aligned_on_step(self):
+        prometheus = FakePrometheus()
+        start = NOW - timedelta(minutes=10, seconds=7)
+
+        [series] = query_range(RangeQueryFrontend(), prometheus, start, NOW - timedelta(seconds=33), "1m")
+
+        assert prometheus.queries == [
+            ((NOW - timedelta(minutes=11)).timestamp(), (NOW - timedelta(minutes=1)).timestamp())
+        ]
+        assert len(series["values"]) == 11
+
+    def test_split_matches_single_query(self):
+        prometheus = FakePrometheus()
+        start = NOW - timedelta(days=3, hours=5)
+
+        [series] = query_range(RangeQueryFrontend(), prometheus, start, NOW, "5m")
+
+        # Three past days, then the tail of today
+        assert len(prometheus.queries) == 4
+        timestamps = [value[0] for value in series["values"]]
+        assert timestamps == [start.timestamp() + i * 300 for i in range(len(timestamps))]
+        assert timestamps[-1] == NOW.timestamp()
+
+    def test_past_days_cached(self):
+        prometheus, frontend = FakePrometheus(), RangeQueryFrontend()
+        first = query_range(frontend, prometheus, NOW - timedelta(days=2), NOW, "5m")
+        prometheus.queries.clear()
+
+        # A refresh, a few minutes later, only queries the tail
+        second = query_range(frontend, prometheus, NOW - timedelta(days=2), NOW, "5m")
+
+        assert second == first
+        assert prometheus.queries == [(datetime(2024, 1, 10, tzinfo=timezone.utc).timestamp(), NOW.timestamp())]
+
+    def test_cache_bounded(self):
+        # One day of 1h samples is 24 samples, the cache keeps a single day
+        prometheus, frontend = FakePrometheus(), RangeQueryFrontend(cache_samples=30)
+        day = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        query_range(frontend, prometheus, day, day + timedelta(hours=23), "1h")
+        query_range(frontend, prometheus, day + timedelta(days=1), day + timedelta(days=1, hours=23), "1h")
+        prometheus.queries.clear()
+
+        query_range(frontend, prometheus, day, day + timedelta(hours=23), "1h")
+
+        assert len(prometheus.queries) == 1
+
+    def test_canonical_promql(self):
+        assert canonical_promql("sum by (job)(\n  rate(x[1m])\n)") == canonical_promql("sum by (job)( rate(x[1m]) )")
+
+    def test_shards_concurrency_capped(self):
+        prometheus = FakePrometheus(delay=0.01)
+        start = NOW - timedelta(days=30)
+
+        [series] = query_range(RangeQueryFrontend(max_concurrency=3), prometheus, start, NOW, "1h")
+
+        # One shard per day, merged back into a single series
+        assert len(prometheus.queries) == 31
+        assert prometheus.max_in_flight == 3
+        assert [value[0] for value in series["values"]] == [start.timestamp() + i * 3600 for i in range(30 * 24 + 1)]
+
+    def test_merge_deduplicates_samples(self):
+        chunks = [
+            [{"metric": {"job": "api"}, "values": [[1, "1"], [2, "2"]]}],
+            [{"metric": {"job": "api"}, "values": [[2, "2"], [3, "3"]]}, {"metric": {"job": "db"}, "values": []}],
+        ]
+
+        assert merge_series(chunks) == [{"metric": {"job": "api"}, "values": [[1, "1"], [2, "2"], [3, "3"]]}]
@@ -0,0 +1,114 @@
+"""Tests for the batch render of notebooks."""
+
+import asyncio
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from fastapi import HTTPException
+import httpx
+from sqlalchemy.orm import Session
+
+from dashfrog import get_dashfrog_instance
+from dashfrog.api import prometheus
+from dashfrog.api.notebook import NotebookRenderRequest, NotebookRenderResponse, render_notebook
+from dashfrog.api.prometheus import PrometheusClient
+from dashfrog.api.schemas import InstantMetricRequest, LabelFilter
+from dashfrog.models import Notebook
+
+import pytest
+
+START, END = datetime(2024, 1, 1, tzinfo=timezone.utc), datetime(2024, 1, 2, tzinfo=timezone.utc)
+
+
+def make_notebook(is_public: bool) -> Notebook:
+    notebook = Notebook(
+        id=uuid4(),
+        title="Orders",
+        description="",
+        tenant="acme",
+        is_public=is_public,
+        metric_blocks_filters=[{"names": ["orders"], "filters": []}],
+    )
+    with Session(get_dashfrog_instance().db_engine) as session:
+        session.add(notebook)
+        session.commit()
+        session.refresh(notebook)
+    return notebook
+
+
+def instant_block(notebook: Notebook, tenant: str) -> InstantMetricRequest:
+    return InstantMetricRequest(
+        metric_name="orders",
+        transform_metadata=None,
+        time_aggregation="last",
+        group_by=[],
+        group_fn="sum",
+        start_time=START,
+        end_time=END,
+        labels=[LabelFilter(label="tenant", value=tenant)],
+        notebook_id=notebook.id,
+    )
+
+
+@pytest.fixture
+def queries(setup_dashfrog, monkeypatch) -> list[str]:
+    """PromQL of the queries asked to a fake Prometheus, answering one sample to each."""
+    promqls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        promqls.append(request.url.params["query"])
+        result = [{"metric": {}, "value": [END.timestamp(), "3"]}]
+        return httpx.Response(200, json={"status": "success", "data": result})
+
+    client = PrometheusClient("http://prometheus:9090", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(prometheus, "_client", client)
+    get_dashfrog_instance().register_metric("counter", "orders", "Orders", "count", ["region"])
+    return promqls
+
+
+def render(notebook: Notebook, request: NotebookRenderRequest) -> NotebookRenderResponse:
+    async def main():
+        try:
+            return await render_notebook(notebook.id, request)
+        finally:
+            await prometheus.close_prometheus_client()
+            await get_dashfrog_instance().close_async_db_engine()
+
+    return asyncio.run(main())
+
+
+class TestRenderNotebook:
+    """Test that the blocks of a notebook are authorized once and share identical queries."""
+
+    def test_identical_blocks_share_a_query(self, queries):
+        notebook = make_notebook(is_public=True)
+        block = instant_block(notebook, "acme")
+
+        response = render(notebook, NotebookRenderRequest(instant={"a": block, "b": block.model_copy()}))
+
+        assert len(queries) == 1
+        assert response.instant["a"] == response.instant["b"]
+        assert response.instant["a"].scalars[0].value == 3
+        assert response.errors == {}
+
+    def test_block_out_of_scope(self, queries):
+        notebook = make_notebook(is_public=True)
+
+        response = render(
+            notebook,
+            NotebookRenderRequest(
+                instant={"a": instant_block(notebook, "acme"), "b": instant_block(notebook, "other")}
+            ),
+        )
+
+        assert list(response.instant) == ["a"]
+        assert list(response.errors) == ["b"]
+
+    def test_private_notebook(self, queries):
+        notebook = make_notebook(is_public=False)
+
+        with pytest.raises(HTTPException) as error:
+            render(notebook, NotebookRenderRequest(instant={"a": instant_block(notebook, "acme")}))
+
+        assert error.value.status_code == 401
+        assert queries == []
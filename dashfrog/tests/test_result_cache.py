@@ -0,0 +1,219 @@
+"""Tests for the result cache of flow queries."""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from fastapi import Response
+from sqlalchemy import Engine, event
+from sqlalchemy.orm import Session
+
+from dashfrog import get_dashfrog_instance, ingest
+from dashfrog.api.flow import FlowDetailRequest, FlowSearchRequest, get_flow_history, search_flows
+from dashfrog.api.result_cache import ResultCache, get_flow_query_cache, round_window
+from dashfrog.constants import EVENT_FLOW_START, EVENT_FLOW_SUCCESS
+from dashfrog.models import Notebook
+
+import pytest
+
+# Runs started 7s and 22s after the minute, in the cache buckets of 5s starting at 5s and 20s
+MINUTE = datetime(2024, 1, 1, 10, 0)
+
+
+def count_calls(result, delay: float = 0.0):
+    """A computation of `result`, with the number of times it ran."""
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return result
+
+    return compute, calls
+
+
+class TestResultCache:
+    """Test that results are cached until they expire, and that identical queries in flight run once."""
+
+    def test_concurrent_queries_run_once(self):
+        cache = ResultCache()
+        compute, calls = count_calls([1, 2], delay=0.01)
+
+        async def main():
+            return await asyncio.gather(*(cache.get("key", compute, items=len) for _ in range(5)))
+
+        assert asyncio.run(main()) == [[1, 2]] * 5
+        assert len(calls) == 1
+        stats = cache.stats()
+        assert (stats.misses, stats.coalesced, stats.hits, stats.entries, stats.items) == (1, 4, 0, 1, 2)
+
+    def test_hit_until_expired(self):
+        compute, calls = count_calls([1])
+
+        async def main(cache: ResultCache):
+            await cache.get("key", compute, items=len)
+            await cache.get("key", compute, items=len)
+
+        cache = ResultCache(ttl=60)
+        asyncio.run(main(cache))
+        assert len(calls) == 1
+        assert cache.stats().hits == 1
+
+        cache = ResultCache(ttl=0)
+        asyncio.run(main(cache))
+        assert len(calls) == 3
+        assert cache.stats().misses == 2
+
+    def test_least_recently_used_evicted(self):
+        cache = ResultCache(max_items=4)
+
+        async def main():
+            for key in ("a", "b", "a", "c"):
+                compute, _ = count_calls([key] * 2)
+                await cache.get(key, compute, items=len)
+
+        asyncio.run(main())
+        assert list(cache._entries) == ["a", "c"]
+        assert cache.stats().items == 4
+
+    def test_failures_not_cached(self):
+        cache = ResultCache()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            raise ValueError("query failed")
+
+        async def main():
+            for _ in range(2):
+                with pytest.raises(ValueError):
+                    await cache.get("key", compute, items=len)
+
+        asyncio.run(main())
+        assert len(calls) == 2
+        assert cache.stats().entries == 0
+
+
+class TestRoundWindow:
+    """Test that windows are widened to the bucket, keeping their timezone."""
+
+    def test_aware(self):
+        start = datetime(2024, 1, 1, 10, 0, 3, tzinfo=timezone(timedelta(hours=2)))
+        end = datetime(2024, 1, 1, 10, 0, 7, 500, tzinfo=timezone(timedelta(hours=2)))
+
+        assert round_window(start, end, 5) == (start.replace(second=0), end.replace(second=10, microsecond=0))
+
+    def test_naive(self):
+        start, end = datetime(2024, 1, 1, 10, 0, 5), datetime(2024, 1, 1, 10, 0, 10)
+
+        assert round_window(start, end, 5) == (start, end)
+        assert round_window(start, end, 60) == (start.replace(second=0), end.replace(minute=1, second=0))
+
+
+def at(seconds: float) -> datetime:
+    return MINUTE + timedelta(seconds=seconds)
+
+
+@pytest.fixture
+def notebook(setup_dashfrog) -> Notebook:
+    """A public notebook of the import flow, with runs started at 7s and 22s."""
+    event = dict(labels={}, group_id="import$$tenant=acme", tenant="acme", flow_metadata={"flow_name": "import"})
+    ingest.bulk_write(
+        [
+            {**event, "flow_id": str(flow_id), "event_name": event_name, "event_dt": at(started + offset)}
+            for flow_id, started in ((1, 7), (2, 22))
+            for event_name, offset in ((EVENT_FLOW_START, 0), (EVENT_FLOW_SUCCESS, 0.5))
+        ]
+    )
+    notebook = Notebook(
+        id=uuid4(),
+        title="Imports",
+        description="",
+        tenant="acme",
+        is_public=True,
+        flow_blocks_filters=[{"names": ["import"], "filters": []}],
+    )
+    with Session(get_dashfrog_instance().db_engine) as session:
+        session.add(notebook)
+        session.commit()
+        session.refresh(notebook)
+    return notebook
+
+
+@pytest.fixture
+def flow_queries():
+    """Statements run on the flow tables."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        if any(table in statement for table in ("flow_run", "flow_event", "flow_rollup")):
+            statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+
+
+def search(notebook: Notebook, start: float, end: float) -> int:
+    """Run count of a search of the import flow between seconds of the minute."""
+
+    async def main():
+        try:
+            request = FlowSearchRequest(
+                notebook_id=notebook.id, flow_name="import", start=at(start), end=at(end), tenant="acme"
+            )
+            return await search_flows(request, Response())
+        finally:
+            await get_dashfrog_instance().close_async_db_engine()
+
+    return sum(flow.runCount for flow in asyncio.run(main()))
+
+
+def history(notebook: Notebook, start: float, end: float) -> list[str]:
+    """Flow ids of the history of the import flow between seconds of the minute."""
+
+    async def main():
+        try:
+            request = FlowDetailRequest(
+                notebook_id=notebook.id, flow_name="import", start=at(start), end=at(end), tenant="acme"
+            )
+            return await get_flow_history(request)
+        finally:
+            await get_dashfrog_instance().close_async_db_engine()
+
+    response = asyncio.run(main())
+    return [run.flowId for run in response.history]  # pyright: ignore[reportAttributeAccessIssue]
+
+
+class TestFlowQueryCache:
+    """Test that cached flow queries return their exact window, and share entries when widening it adds no runs."""
+
+    def test_search(self, notebook, flow_queries):
+        # Both widened to [0s, 15s], whose first and last buckets hold no run
+        assert search(notebook, 1, 13) == 1
+        queries = len(flow_queries)
+        assert search(notebook, 2, 14) == 1
+        assert len(flow_queries) == queries
+        # Widened to [0s, 25s], whose last bucket holds the run at 22s: the exact window is kept
+        assert search(notebook, 1, 21) == 1
+        queries = len(flow_queries)
+        assert search(notebook, 1, 21) == 1
+        assert len(flow_queries) == queries
+        assert search(notebook, 1, 23) == 2
+
+        stats = get_flow_query_cache().stats()  # pyright: ignore[reportOptionalMemberAccess]
+        assert (stats.misses, stats.hits) == (4, 4)
+
+    def test_history(self, notebook, flow_queries):
+        assert history(notebook, 1, 13) == ["1"]
+        queries = len(flow_queries)
+        assert history(notebook, 2, 14) == ["1"]
+        assert len(flow_queries) == queries
+        assert history(notebook, 1, 21) == ["1"]
+        queries = len(flow_queries)
+        assert history(notebook, 1, 21) == ["1"]
+        assert len(flow_queries) == queries
+        assert history(notebook, 1, 23) == ["2", "1"]
+
+        stats = get_flow_query_cache().stats()  # pyright: ignore[reportOptionalMemberAccess]
+        assert (stats.misses, stats.hits) == (4, 4)
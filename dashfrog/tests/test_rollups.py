@@ -0,0 +1,121 @@
+"""Tests for the time-bucketed flow rollups."""
+
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from dashfrog import get_dashfrog_instance, ingest
+from dashfrog.api.flow import flow_generator
+from dashfrog.constants import EVENT_FLOW_FAIL, EVENT_FLOW_START, EVENT_FLOW_SUCCESS
+from dashfrog.models import FlowRollup
+from dashfrog.rollups import (
+    SKETCH_RELATIVE_ACCURACY,
+    decompose_window,
+    merge_sketches,
+    refresh_rollups,
+    sketch_quantile,
+)
+
+
+def make_run(flow_id: int, started_at: datetime, duration: timedelta, end_event: str = EVENT_FLOW_SUCCESS) -> list:
+    event = dict(
+        flow_id=str(flow_id),
+        labels={},
+        group_id="import$$tenant=acme",
+        tenant="acme",
+        flow_metadata={"flow_name": "import"},
+    )
+    return [
+        {**event, "event_name": EVENT_FLOW_START, "event_dt": started_at},
+        {**event, "event_name": end_event, "event_dt": started_at + duration},
+    ]
+
+
+class TestDecomposeWindow:
+    """Test splitting query windows into rollup buckets."""
+
+    def test_coarsest_buckets(self):
+        watermark = datetime(2024, 1, 10)
+        segments = decompose_window(datetime(2024, 1, 1, 22, 30, 15), datetime(2024, 1, 4, 1, 2), watermark)
+
+        assert segments == [
+            (None, datetime(2024, 1, 1, 22, 30, 15), datetime(2024, 1, 1, 22, 31)),
+            ("minute", datetime(2024, 1, 1, 22, 31), datetime(2024, 1, 1, 23)),
+            ("hour", datetime(2024, 1, 1, 23), datetime(2024, 1, 2)),
+            ("day", datetime(2024, 1, 2), datetime(2024, 1, 4)),
+            ("hour", datetime(2024, 1, 4), datetime(2024, 1, 4, 1)),
+            ("minute", datetime(2024, 1, 4, 1), datetime(2024, 1, 4, 1, 2)),
+        ]
+
+    def test_raw_after_watermark(self):
+        segments = decompose_window(datetime(2024, 1, 1), datetime(2024, 1, 2), datetime(2024, 1, 1, 1, 0, 30))
+
+        assert segments == [
+            ("hour", datetime(2024, 1, 1), datetime(2024, 1, 1, 1)),
+            (None, datetime(2024, 1, 1, 1), datetime(2024, 1, 2)),
+        ]
+
+    def test_never_refreshed(self):
+        assert decompose_window(datetime(2024, 1, 1), datetime(2024, 1, 2), None) == [
+            (None, datetime(2024, 1, 1), datetime(2024, 1, 2))
+        ]
+
+
+class TestSketch:
+    """Test the mergeable duration sketch."""
+
+    def test_quantile_accuracy(self):
+        # Sketches as read from JSONB, with string indexes
+        sketches = [{"58": 2}, {"58": 1, "116": 1}, None]
+        merged = merge_sketches(sketches)
+
+        assert merged == {58: 3, 116: 1}
+        median = sketch_quantile(merged, 0.5)
+        assert median is not None
+        assert abs(median - 10) / 10 <= SKETCH_RELATIVE_ACCURACY
+
+    def test_empty(self):
+        assert sketch_quantile({}, 0.99) is None
+
+
+def search(start: datetime, end: datetime) -> list:
+    """Flow summaries of the acme tenant, as the search endpoint computes them."""
+
+    async def run():
+        dashfrog = get_dashfrog_instance()
+        try:
+            async with AsyncSession(dashfrog.async_db_engine) as session:
+                return [flow async for flow in flow_generator(session, "acme", start, end)]
+        finally:
+            await dashfrog.close_async_db_engine()
+
+    return asyncio.run(run())
+
+
+class TestRefresh:
+    """Test that refreshed rollups answer like raw runs."""
+
+    def test_search_from_rollups(self, setup_dashfrog):
+        engine = get_dashfrog_instance().db_engine
+        day = datetime(2024, 1, 1)
+        events = []
+        for i in range(48):
+            end_event = EVENT_FLOW_FAIL if i % 4 == 0 else EVENT_FLOW_SUCCESS
+            events += make_run(i + 1, day + timedelta(hours=i, minutes=i), timedelta(seconds=i + 1), end_event)
+        ingest.bulk_write(events)
+
+        start, end = day + timedelta(minutes=30), day + timedelta(days=2)
+        [raw] = search(start, end)
+
+        assert refresh_rollups(engine, lag=timedelta(0)) is not None
+        with Session(engine) as session:
+            assert session.execute(select(FlowRollup).where(FlowRollup.resolution == "day")).first() is not None
+        [rolled_up] = search(start, end)
+
+        assert rolled_up == raw
+        assert rolled_up.runCount == 47
+        assert rolled_up.failedCount == 11
+        assert rolled_up.lastRunStatus == "success"
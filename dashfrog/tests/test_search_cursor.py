@@ -0,0 +1,99 @@
+"""Tests for the delta refresh of flow searches."""
+
+import asyncio
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dashfrog import get_dashfrog_instance, ingest
+from dashfrog.api.flow import (
+    FlowSearchRequest,
+    changed_flow_groups_query,
+    decode_search_cursor,
+    encode_search_cursor,
+    flow_generator,
+)
+from dashfrog.api.schemas import LabelFilter
+from dashfrog.constants import EVENT_FLOW_START, EVENT_FLOW_SUCCESS
+
+import pytest
+
+START, END = datetime(2024, 1, 1), datetime(2024, 1, 2)
+
+
+def make_request(**fields) -> FlowSearchRequest:
+    return FlowSearchRequest(notebook_id=uuid4(), start=START, end=END, tenant="acme", **fields)
+
+
+def make_run(flow_id: int, region: str) -> list[dict]:
+    event = dict(
+        flow_id=str(flow_id),
+        labels={"region": region},
+        group_id=f"import$$tenant=acme$$region={region}",
+        tenant="acme",
+        flow_metadata={"flow_name": "import"},
+    )
+    started_at = START + timedelta(hours=flow_id)
+    return [
+        {**event, "event_name": EVENT_FLOW_START, "event_dt": started_at},
+        {**event, "event_name": EVENT_FLOW_SUCCESS, "event_dt": started_at + timedelta(minutes=1)},
+    ]
+
+
+def search(since: datetime | None = None) -> list:
+    async def main():
+        engine = get_dashfrog_instance().async_db_engine
+        try:
+            async with AsyncSession(engine) as session:
+                flow_group_ids = None
+                if since is not None:
+                    flow_group_ids = changed_flow_groups_query("acme", START, END, None, [], since)
+                return [flow async for flow in flow_generator(session, "acme", START, END, None, None, flow_group_ids)]
+        finally:
+            await get_dashfrog_instance().close_async_db_engine()
+
+    return asyncio.run(main())
+
+
+class TestSearchCursor:
+    """Test the opaque search cursors."""
+
+    def test_round_trip(self):
+        watermark = datetime(2024, 1, 1, 12, 30, 15, 123)
+        request = make_request(labels=[LabelFilter(label="region", value="eu")])
+        assert decode_search_cursor(encode_search_cursor(watermark, request), request) == watermark
+
+    def test_other_search(self):
+        cursor = encode_search_cursor(datetime(2024, 1, 1), make_request())
+        with pytest.raises(HTTPException) as error:
+            decode_search_cursor(cursor, make_request(flow_name="import"))
+        assert error.value.status_code == 400
+
+    def test_invalid(self):
+        with pytest.raises(HTTPException) as error:
+            decode_search_cursor("not a cursor", make_request())
+        assert error.value.status_code == 400
+
+
+class TestDeltaSearch:
+    """Test that searches since a cursor only return the flow groups changed since."""
+
+    def test_changed_groups(self, setup_dashfrog):
+        ingest.bulk_write([*make_run(1, "eu"), *make_run(2, "us")])
+        with get_dashfrog_instance().db_engine.connect() as conn:
+            since = conn.execute(select(func.timezone("utc", func.now()))).scalar_one()
+
+        assert search(since) == []
+
+        ingest.bulk_write(make_run(3, "us"))
+        [flow] = search(since)
+
+        assert flow.labels == {"region": "us"}
+        assert flow.runCount == 2
+        assert {flow.groupId for flow in search()} == {
+            "import$$tenant=acme$$region=eu",
+            "import$$tenant=acme$$region=us",
+        }
@@ -0,0 +1,67 @@
+"""Tests for the buffered event writer."""
+
+from sqlalchemy.orm import Session
+
+from dashfrog import flow, flush, get_dashfrog_instance, setup, step
+from dashfrog.config import Config
+from dashfrog.constants import EventKind
+from dashfrog.models import FlowEvent
+
+import pytest
+
+
+@pytest.fixture
+def buffered_dashfrog(setup_dashfrog):
+    """Re-initialize DashFrog with the background writer enabled."""
+    setup(Config(event_write_mode="buffered", event_flush_interval=60))
+    yield get_dashfrog_instance()
+    get_dashfrog_instance().close()
+
+
+class TestBufferedWriter:
+    """Test that buffered events are written in order on flush."""
+
+    def test_events_written_on_flush(self, buffered_dashfrog):
+        with flow.start("buffered_flow", tenant="test_tenant", customer_id="123"):
+            with step.start("validate"):
+                pass
+
+        # Nothing written yet, flush interval is far away
+        with Session(buffered_dashfrog.db_engine) as session:
+            assert session.query(FlowEvent).count() == 0
+
+        assert flush(timeout=10)
+
+        with Session(buffered_dashfrog.db_engine) as session:
+            events = session.query(FlowEvent).order_by(FlowEvent.id).all()
+
+            assert [e.event_kind for e in events] == [
+                EventKind.FLOW_START,
+                EventKind.STEP_START,
+                EventKind.STEP_SUCCESS,
+                EventKind.FLOW_SUCCESS,
+            ]
+            assert len({e.flow_id for e in events}) == 1
+            assert events[0].event_dt <= events[-1].event_dt
+
+    def test_events_written_on_close(self, buffered_dashfrog):
+        with flow.start("buffered_flow", tenant="test_tenant"):
+            pass
+
+        buffered_dashfrog.close()
+
+        with Session(buffered_dashfrog.db_engine) as session:
+            assert session.query(FlowEvent).count() == 2
+
+    def test_drop_on_full_queue(self, setup_dashfrog):
+        setup(Config(event_write_mode="buffered", event_queue_size=1, event_queue_overflow="drop"))
+        dashfrog = get_dashfrog_instance()
+        assert dashfrog._writer is not None
+
+        for _ in range(1000):
+            with flow.start("buffered_flow", tenant="test_tenant"):
+                pass
+        dashfrog.close()
+
+        with Session(dashfrog.db_engine) as session:
+            assert session.query(FlowEvent).count() + dashfrog._writer.dropped == 2000